@@ -0,0 +1,237 @@
+"""
+共享的 Google Ads 客户端和服务客户端
+
+GoogleAdsClient.get_service 每次调用都会新建一个gRPC通道和一组拦截器，在新通道上的第一次请求
+还要重新建立TCP/TLS连接。AdsClientPool 按OAuth凭据缓存客户端，并为每个客户端缓存服务客户端：
+
+    - 同一凭据只创建一个GoogleAdsClient，同一服务只创建一次，之后的调用复用同一个通道和连接
+    - gRPC通道和生成的服务客户端都是线程安全的，可以在多个线程中并发调用
+    - login_customer_id 不绑定在客户端上，而是由调用方随每次请求以元数据发送，
+      因此同一凭据下的多个经理账号共用一个通道
+
+运行本模块可对比每次调用都新建与复用服务客户端的开销，以及在本地gRPC服务上每次请求都新建通道
+与共享通道的并发吞吐（无需Google Ads凭据和网络）：
+
+    python ads_client_pool.py [请求次数]
+"""
+import threading
+from typing import Callable, Dict, Tuple
+
+# 决定能否共用客户端的配置字段，login_customer_id不在其中
+CREDENTIAL_KEYS = ('client_id', 'client_secret', 'developer_token', 'refresh_token')
+
+
+def credentials_key(config: Dict) -> Tuple:
+    """配置中决定能否共用客户端的部分"""
+    return tuple(config.get(key) for key in CREDENTIAL_KEYS)
+
+
+def login_customer_metadata(login_customer_id) -> Tuple[Tuple[str, str], ...]:
+    """
+    构建随请求发送的login-customer-id元数据
+
+    Args:
+        login_customer_id: 经理账号ID，可以包含连字符
+
+    Returns:
+        Tuple[Tuple[str, str], ...]: 可直接传给服务方法metadata参数的元数据
+    """
+    return (('login-customer-id', str(login_customer_id).replace('-', '')),)
+
+
+def load_client(config: Dict):
+    """按配置创建不绑定login_customer_id的GoogleAdsClient"""
+    # 延迟导入，google-ads包含大量protobuf模块，只在创建客户端时加载
+    from google.ads.googleads.client import GoogleAdsClient
+
+    client_config = {key: config[key] for key in CREDENTIAL_KEYS}
+    client_config['use_proto_plus'] = True
+    return GoogleAdsClient.load_from_dict(client_config)
+
+
+class AdsClientPool:
+    """按凭据共享GoogleAdsClient，并缓存每个客户端的服务客户端"""
+
+    def __init__(self, client_factory: Callable[[Dict], object] = load_client):
+        """
+        Args:
+            client_factory: 按配置创建客户端的函数，默认创建GoogleAdsClient
+        """
+        self.client_factory = client_factory
+        self.clients_created = 0
+        self.services_created = 0
+        self._lock = threading.Lock()
+        self._clients: Dict[Tuple, object] = {}
+        self._services: Dict[Tuple[Tuple, str], object] = {}
+        self._types: Dict[Tuple[Tuple, str], type] = {}
+
+    def get_client(self, config: Dict):
+        """
+        获取配置对应的共享客户端，首次调用时创建
+
+        Args:
+            config: Google Ads API配置字典
+
+        Returns:
+            GoogleAdsClient: 共享的客户端
+        """
+        key = credentials_key(config)
+        with self._lock:
+            client = self._clients.get(key)
+            if client is None:
+                client = self.client_factory(config)
+                self._clients[key] = client
+                self.clients_created += 1
+            return client
+
+    def get_service(self, config: Dict, name: str):
+        """
+        获取配置对应的共享服务客户端，首次调用时创建
+
+        Args:
+            config: Google Ads API配置字典
+            name: 服务名称，如 "KeywordPlanIdeaService"
+
+        Returns:
+            服务客户端，可在多个线程中并发调用
+        """
+        client = self.get_client(config)
+        key = (credentials_key(config), name)
+        with self._lock:
+            service = self._services.get(key)
+            if service is None:
+                service = client.get_service(name)
+                self._services[key] = service
+                self.services_created += 1
+            return service
+
+    def new_request(self, config: Dict, name: str):
+        """
+        创建一个新的请求对象，请求类型只查找一次
+
+        Args:
+            config: Google Ads API配置字典
+            name: 请求类型名称，如 "GenerateKeywordIdeasRequest"
+
+        Returns:
+            新的请求对象
+        """
+        key = (credentials_key(config), name)
+        request_type = self._types.get(key)
+        if request_type is None:
+            request_type = type(self.get_client(config).get_type(name))
+            self._types[key] = request_type
+        return request_type()
+
+    def clear(self) -> None:
+        """丢弃全部缓存的客户端"""
+        with self._lock:
+            self._clients = {}
+            self._services = {}
+            self._types = {}
+
+
+# 进程内共享的客户端池
+SHARED_CLIENT_POOL = AdsClientPool()
+
+
+def _benchmark_service_setup(calls: int) -> None:
+    """对比每次调用get_service/get_type与复用池中对象的开销（不发送请求，也不需要网络）"""
+    import time
+
+    from google.ads.googleads.client import GoogleAdsClient
+    from google.oauth2.credentials import Credentials
+
+    # 使用固定的访问令牌，load_from_dict会在创建时联网刷新令牌
+    def benchmark_client(_config):
+        return GoogleAdsClient(Credentials(token='benchmark-token'), 'benchmark-developer-token',
+                               use_proto_plus=True)
+
+    config = {'developer_token': 'benchmark-developer-token'}
+    client = benchmark_client(config)
+    start = time.perf_counter()
+    for _ in range(calls):
+        client.get_service("KeywordPlanIdeaService")
+        client.get_service("GoogleAdsService")
+        client.get_type("GenerateKeywordHistoricalMetricsRequest")
+    per_call_time = (time.perf_counter() - start) / calls
+
+    pool = AdsClientPool(benchmark_client)
+    start = time.perf_counter()
+    for _ in range(calls):
+        pool.get_service(config, "KeywordPlanIdeaService")
+        pool.get_service(config, "GoogleAdsService")
+        pool.new_request(config, "GenerateKeywordHistoricalMetricsRequest")
+    pooled_time = (time.perf_counter() - start) / calls
+
+    print(f"每个分块请求前的准备（{calls} 次）")
+    print(f"  每次新建服务客户端: {per_call_time * 1000:8.3f} ms")
+    print(f"  复用共享服务客户端: {pooled_time * 1000:8.3f} ms  ({per_call_time / pooled_time:.0f}x，"
+          f"创建客户端 {pool.clients_created} 个，服务客户端 {pool.services_created} 个)")
+
+
+def _benchmark_channels(calls: int, workers: int = 8, latency: float = 0.002) -> None:
+    """在本地gRPC服务上对比每次请求新建通道与共享通道的并发吞吐"""
+    import time
+    from concurrent import futures
+
+    import grpc
+
+    def handle(request, context):
+        time.sleep(latency)  # 模拟服务端处理时间
+        return request
+
+    handler = grpc.method_handlers_generic_handler('benchmark.KeywordPlanIdeaService', {
+        'GenerateKeywordHistoricalMetrics': grpc.unary_unary_rpc_method_handler(handle),
+    })
+    server = grpc.server(futures.ThreadPoolExecutor(max_workers=workers))
+    server.add_generic_rpc_handlers((handler,))
+    port = server.add_insecure_port('127.0.0.1:0')
+    server.start()
+    target = f'127.0.0.1:{port}'
+    method = '/benchmark.KeywordPlanIdeaService/GenerateKeywordHistoricalMetrics'
+    payload = b'x' * 1024
+
+    def call_with_new_channel(_):
+        with grpc.insecure_channel(target) as channel:
+            return channel.unary_unary(method)(payload, timeout=10)
+
+    shared_channel = grpc.insecure_channel(target)
+    shared_call = shared_channel.unary_unary(method)
+
+    def call_with_shared_channel(_):
+        return shared_call(payload, timeout=10)
+
+    try:
+        results = []
+        for name, func in (("每次请求新建通道", call_with_new_channel), ("共享通道", call_with_shared_channel)):
+            with futures.ThreadPoolExecutor(max_workers=workers) as executor:
+                list(executor.map(func, range(workers)))  # 预热
+                start = time.perf_counter()
+                list(executor.map(func, range(calls)))
+                results.append((name, time.perf_counter() - start))
+    finally:
+        shared_channel.close()
+        server.stop(None)
+
+    baseline = results[0][1]
+    print(f"本地gRPC服务，{workers} 个线程并发 {calls} 次请求（服务端处理 {latency * 1000:.0f} ms）")
+    for name, elapsed in results:
+        print(f"  {name}: {elapsed * 1000:8.1f} ms，{calls / elapsed:7.0f} 请求/秒  ({baseline / elapsed:.1f}x)")
+
+
+def run_benchmark(calls: int = 500) -> None:
+    """
+    对比每次调用都新建与复用客户端对象的开销
+
+    Args:
+        calls: 请求次数
+    """
+    _benchmark_service_setup(calls)
+    _benchmark_channels(calls)
+
+
+if __name__ == "__main__":
+    import sys
+
+    run_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 500)
@@ -0,0 +1,227 @@
+"""
+进程内的Google Ads API替身，用于在没有凭据和网络的情况下运行服务层的基准和演示
+
+StubAdsClient 使用真实的GoogleAdsClient构建请求对象和枚举，GoogleAdsService只用到资源路径方法，
+不发送请求；KeywordPlanIdeaService 替换为 StubKeywordPlanIdeaService：
+
+    - 每次调用按注入的延迟休眠，模拟网络往返和服务端处理时间
+    - 记录请求次数、每个请求的关键词数量和同时在途请求数的峰值
+    - 包含指定关键词的请求可以第一次返回暂时性错误（UNAVAILABLE），或总是返回非暂时性错误（INVALID_ARGUMENT）
+
+返回的结果对象只包含服务层读取的字段，历史指标由关键词文本确定性地生成。
+"""
+import functools
+import threading
+import time
+import zlib
+from datetime import date
+from types import SimpleNamespace
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import grpc
+
+from ads_client_pool import AdsClientPool
+
+# 替身客户端使用的配置，字段只用于区分客户端，不会发送到任何服务
+STUB_CONFIG = {
+    'client_id': 'stub-client-id',
+    'client_secret': 'stub-client-secret',
+    'developer_token': 'stub-developer-token',
+    'refresh_token': 'stub-refresh-token',
+    'login_customer_id': '1234567890',
+}
+
+
+class StubRpcError(Exception):
+    """带gRPC状态的模拟错误，request_scheduler.error_status 按状态判断是否重试"""
+
+    request_id = 'stub'
+
+    def __init__(self, message: str, status: grpc.StatusCode):
+        super().__init__(message)
+        self.status = status
+
+    def code(self) -> grpc.StatusCode:
+        return self.status
+
+
+@functools.lru_cache(maxsize=None)
+def recent_months(months: int) -> Tuple[Tuple[int, int], ...]:
+    """截止到上个月的最近几个月，月份为MonthOfYear枚举值（月份加1）"""
+    today = date.today()
+    index = today.year * 12 + today.month - 1
+    return tuple((year, month + 2) for year, month in (divmod(index - offset, 12) for offset in range(months, 0, -1)))
+
+
+def stub_metrics(keyword: str, months: int = 12) -> SimpleNamespace:
+    """
+    由关键词文本确定性地生成历史指标
+
+    Args:
+        keyword: 关键词
+        months: 月度搜索量的月数，截止到上个月
+
+    Returns:
+        SimpleNamespace: 与KeywordPlanHistoricalMetrics字段相同的对象
+    """
+    seed = zlib.crc32(keyword.encode('utf-8'))
+    average = 10 + seed % 50_000
+    return SimpleNamespace(
+        monthly_search_volumes=[
+            SimpleNamespace(year=year, month=month, monthly_searches=average * (90 + (seed >> offset) % 21) // 100)
+            for offset, (year, month) in enumerate(recent_months(months))
+        ],
+        avg_monthly_searches=average,
+        competition=SimpleNamespace(name=('LOW', 'MEDIUM', 'HIGH')[seed % 3]),
+        competition_index=seed % 101,
+        low_top_of_page_bid_micros=(seed % 200) * 10_000,
+        high_top_of_page_bid_micros=(seed % 200 + 50) * 30_000,
+    )
+
+
+class StubPager:
+    """关键词创意的分页结果，与GenerateKeywordIdeasPager一样可以逐页或逐条读取"""
+
+    def __init__(self, results: List, page_size: int):
+        self.pages = [SimpleNamespace(results=results[start:start + page_size])
+                      for start in range(0, len(results), page_size)]
+
+    def __iter__(self):
+        for page in self.pages:
+            yield from page.results
+
+
+class StubKeywordPlanIdeaService:
+    """注入延迟和错误的KeywordPlanIdeaService替身，可以在多个线程中并发调用"""
+
+    def __init__(self, latency: float = 0.05, ideas_per_seed: int = 100, page_size: int = 1000,
+                 fail_once: Iterable[str] = (), fail_always: Iterable[str] = ()):
+        """
+        Args:
+            latency: 每次请求的耗时（秒）
+            ideas_per_seed: 每个种子词生成的关键词创意数量
+            page_size: 关键词创意每页的结果数量
+            fail_once: 包含这些关键词的请求第一次返回UNAVAILABLE，重试后成功
+            fail_always: 包含这些关键词的请求总是返回INVALID_ARGUMENT
+        """
+        self.latency = latency
+        self.ideas_per_seed = ideas_per_seed
+        self.page_size = page_size
+        self.fail_always = set(fail_always)
+        self._lock = threading.Lock()
+        self.reset(fail_once)
+
+    def reset(self, fail_once: Iterable[str] = ()) -> None:
+        """清空统计，并重新设置第一次请求失败的关键词"""
+        with self._lock:
+            self.fail_once = set(fail_once)
+            self.requests = 0
+            self.errors = 0
+            self.chunk_sizes: List[int] = []
+            self.active = 0
+            self.peak_active = 0
+
+    def stats(self) -> Dict:
+        """
+        获取调用统计
+
+        Returns:
+            Dict: 请求次数、返回错误的次数、每个历史指标请求的关键词数量和同时在途请求数的峰值
+        """
+        with self._lock:
+            return {
+                'requests': self.requests,
+                'errors': self.errors,
+                'chunk_sizes': list(self.chunk_sizes),
+                'peak_active': self.peak_active,
+            }
+
+    def _call(self, keywords: List[str]) -> None:
+        # 记录在途请求数，休眠模拟耗时，然后按关键词注入错误
+        with self._lock:
+            self.requests += 1
+            self.active += 1
+            self.peak_active = max(self.peak_active, self.active)
+            transient = self.fail_once.intersection(keywords)
+            self.fail_once -= transient
+        try:
+            time.sleep(self.latency)
+        finally:
+            with self._lock:
+                self.active -= 1
+        status = None
+        if transient:
+            status = grpc.StatusCode.UNAVAILABLE
+        elif self.fail_always.intersection(keywords):
+            status = grpc.StatusCode.INVALID_ARGUMENT
+        if status is not None:
+            with self._lock:
+                self.errors += 1
+            raise StubRpcError(f"模拟的{status.name}错误", status)
+
+    def generate_keyword_historical_metrics(self, request=None, metadata=None) -> SimpleNamespace:
+        """返回请求中每个关键词的历史指标"""
+        keywords = list(request.keywords)
+        with self._lock:
+            self.chunk_sizes.append(len(keywords))
+        self._call(keywords)
+        return SimpleNamespace(results=[
+            SimpleNamespace(text=keyword, keyword_metrics=stub_metrics(keyword)) for keyword in keywords
+        ])
+
+    def generate_keyword_ideas(self, request=None, metadata=None) -> StubPager:
+        """
+        为每个种子词生成ideas_per_seed个关键词创意
+
+        关键词创意只取决于种子词的第一个词，模拟相关种子词扩展出的关键词集合互相重叠
+        """
+        seeds = list(request.keyword_seed.keywords) or list(request.keyword_and_url_seed.keywords)
+        self._call(seeds)
+        results = []
+        for topic in dict.fromkeys(seed.split()[0] for seed in seeds if seed.strip()):
+            for index in range(self.ideas_per_seed):
+                text = f"{topic} idea {index}"
+                results.append(SimpleNamespace(
+                    text=text,
+                    keyword_idea_metrics=SimpleNamespace(avg_monthly_searches=stub_metrics(text).avg_monthly_searches),
+                ))
+        return StubPager(results, self.page_size)
+
+
+class StubAdsClient:
+    """只替换KeywordPlanIdeaService的GoogleAdsClient"""
+
+    def __init__(self, idea_service: StubKeywordPlanIdeaService):
+        # 延迟导入，google-ads包含大量protobuf模块；固定的访问令牌不会触发令牌刷新
+        from google.ads.googleads.client import GoogleAdsClient
+        from google.oauth2.credentials import Credentials
+
+        self._client = GoogleAdsClient(Credentials(token='stub-token'), STUB_CONFIG['developer_token'],
+                                       use_proto_plus=True)
+        self.idea_service = idea_service
+
+    @property
+    def enums(self):
+        return self._client.enums
+
+    def get_type(self, name: str):
+        return self._client.get_type(name)
+
+    def get_service(self, name: str):
+        if name == "KeywordPlanIdeaService":
+            return self.idea_service
+        return self._client.get_service(name)
+
+
+def stub_client_pool(idea_service: Optional[StubKeywordPlanIdeaService] = None) -> AdsClientPool:
+    """
+    创建使用替身客户端的客户端池，配合STUB_CONFIG传给服务的client_pool参数
+
+    Args:
+        idea_service: KeywordPlanIdeaService替身，默认使用默认参数创建
+
+    Returns:
+        AdsClientPool: 客户端池
+    """
+    idea_service = idea_service or StubKeywordPlanIdeaService()
+    return AdsClientPool(lambda _config: StubAdsClient(idea_service))
@@ -0,0 +1,244 @@
+"""
+基于asyncio的Google Ads关键词创意服务
+
+运行本模块可在注入延迟的API替身（ads_stub）上并发获取多组种子词的关键词创意，
+对比并发上限为1和默认并发上限时的耗时、请求次数和在途请求合并（无需凭据和网络）：
+
+    python async_keyword_ideas_service.py [主题数量]
+
+使用真实凭据的示例（需先填写示例中的配置）：
+
+    python async_keyword_ideas_service.py --example
+"""
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from keyword_ideas_service import (
+    DEFAULT_BATCH_SIZE,
+    DEFAULT_MAX_RETRIES,
+    KeywordIdea,
+    KeywordIdeasService,
+)
+from request_scheduler import KeywordFailure, MetricsResult
+
+# 默认的最大并发请求数
+DEFAULT_MAX_CONCURRENCY = 16
+
+
+class AsyncKeywordIdeasService:
+    """基于asyncio的Google Ads关键词创意服务
+
+    协程负责调度和合并结果，阻塞的gRPC调用在一个大小等于并发上限的共享线程池中执行，
+    由信号量限制同时在途的请求数。因此一个进程可以用协程同时驱动大量种子词，
+    线程数只取决于并发上限，而不是在途的种子数量。
+    """
+
+    def __init__(self, config_dict: Dict, max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+                 batch_size: int = DEFAULT_BATCH_SIZE, max_retries: int = DEFAULT_MAX_RETRIES,
+                 cache=None, client_pool=None, scheduler=None, store=None):
+        """
+        初始化服务
+
+        Args:
+            config_dict: Google Ads API配置字典，包含必要的认证信息
+            max_concurrency: 同时在途的API请求上限
+            batch_size: 每个历史指标请求包含的关键词数量
+            max_retries: 暂时性错误的最大重试次数
+            cache: 可选的历史指标缓存（如cache.KeywordMetricsCache）
+            client_pool: 客户端池（ads_client_pool.AdsClientPool），默认使用进程内共享的池
+            scheduler: 请求调度器（request_scheduler.RequestScheduler），默认使用开发者令牌对应的共享调度器
+            store: 可选的本地关键词库（keyword_store.KeywordStore），配置后以增量刷新代替cache
+        """
+        if max_concurrency <= 0:
+            raise ValueError("max_concurrency必须大于0")
+
+        # 每个分块由一个线程交给同步服务，分块内不再使用线程池
+        self.service = KeywordIdeasService(
+            config_dict, batch_size=batch_size, max_workers=1, max_retries=max_retries, cache=cache,
+            client_pool=client_pool, scheduler=scheduler, store=store
+        )
+        self.max_concurrency = max_concurrency
+        self.max_retries = self.service.max_retries
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self) -> None:
+        """关闭线程池"""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    async def _run_blocking(self, func, *args, **kwargs):
+        """在共享线程池中执行阻塞调用，受并发信号量限制"""
+        async with self._semaphore:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, functools.partial(func, *args, **kwargs))
+
+    async def _fetch_chunk(self, keywords: List[str], language_id: str) -> MetricsResult:
+        """
+        通过同步服务获取单个分块的历史指标
+
+        缓存或关键词库、在途请求合并、并发控制、退避和重试都由同步服务的get_historical_metrics_batch负责，
+        与同步服务在同一进程中并发请求相同的关键词时也只请求一次。
+
+        Args:
+            keywords: 关键词分块
+            language_id: 语言ID
+
+        Returns:
+            MetricsResult: 该分块的关键词到历史指标的映射，最终获取失败的关键词记录在failures中
+        """
+        try:
+            return await self._run_blocking(self.service.get_historical_metrics_batch, keywords, language_id)
+        except Exception as e:
+            self.service.log_request_error(e)
+            return MetricsResult(failures=[KeywordFailure.from_error(keywords, e)])
+
+    async def get_historical_metrics_batch(self, keywords: List[str], language_id: str = "1000") -> MetricsResult:
+        """
+        批量获取关键词的历史指标数据
+
+        关键词按batch_size切分，每个分块在共享线程池中交给同步服务的get_historical_metrics_batch，
+        各分块并发执行，同时在途的分块数受max_concurrency限制。
+
+        Args:
+            keywords: 关键词列表
+            language_id: 语言ID，默认为1000（英语）
+
+        Returns:
+            MetricsResult: 关键词到历史指标的映射，包含月度搜索量和其他指标；
+                           最终获取失败的关键词记录在failures中
+        """
+        metrics_map = MetricsResult()
+        if not keywords:
+            return metrics_map
+
+        chunks = self.service.split_into_chunks(list(dict.fromkeys(keywords)))
+        for result in await asyncio.gather(*(self._fetch_chunk(chunk, language_id) for chunk in chunks)):
+            metrics_map.update(result)
+            metrics_map.failures.extend(result.failures)
+        return metrics_map
+
+    async def generate_keyword_ideas(self, keywords: Optional[List[str]] = None, url: Optional[str] = None,
+                                     language_id: str = "1000", clusterer=None) -> List[KeywordIdea]:
+        """
+        获取关键词创意
+
+        Args:
+            keywords: 关键词列表，可选
+            url: 网页URL，可选
+            language_id: 语言ID，默认为1000（英语）
+            clusterer: 可选的近似变体聚类器（keyword_clusters.KeywordClusterer），提供时近似变体只请求每组的代表
+
+        Returns:
+            List[KeywordIdea]: 关键词创意列表
+
+        Raises:
+            ValueError: 参数错误或生成的关键词列表为空
+            GoogleAdsException: API调用错误
+        """
+        if not keywords and not url:
+            raise ValueError("关键词列表和URL不能同时为空")
+
+        generated_keywords = await self._run_blocking(
+            self.service.collect_generated_keywords, keywords, url, language_id, clusterer
+        )
+
+        if not generated_keywords:
+            raise ValueError("生成的关键词列表为空")
+
+        historical_metrics = await self.get_historical_metrics_batch(generated_keywords, language_id)
+        return self.service.build_keyword_ideas(list(historical_metrics.values()))
+
+
+def run_benchmark(topics: int = 4, seeds_per_topic: int = 3, ideas_per_seed: int = 500, batch_size: int = 250,
+                  latency: float = 0.1, max_concurrency: int = 8) -> None:
+    """
+    在注入延迟的KeywordPlanIdeaService替身（ads_stub）上并发获取多组种子词的关键词创意（无需凭据和网络）
+
+    同一主题的种子词扩展出相同的关键词，并发请求时由同步服务的在途请求合并只请求一次；
+    第一个历史指标请求返回UNAVAILABLE，由调度器退避后重试成功。
+
+    Args:
+        topics: 主题数量
+        seeds_per_topic: 每个主题的种子词数量
+        ideas_per_seed: 每个主题扩展出的关键词数量
+        batch_size: 每个历史指标请求包含的关键词数量
+        latency: 每次请求的耗时（秒）
+        max_concurrency: 同时在途的API请求上限
+    """
+    import time
+
+    from ads_stub import STUB_CONFIG, StubKeywordPlanIdeaService, stub_client_pool
+    from request_scheduler import RequestScheduler
+
+    seed_lists = [[f"topic{topic} seed {seed}"] for topic in range(topics) for seed in range(seeds_per_topic)]
+    idea_service = StubKeywordPlanIdeaService(latency=latency, ideas_per_seed=ideas_per_seed)
+    client_pool = stub_client_pool(idea_service)
+    # 预先加载请求类型，计时不包含首次创建客户端和导入protobuf模块的开销
+    KeywordIdeasService(STUB_CONFIG, client_pool=client_pool, scheduler=RequestScheduler()).fetch_metrics_chunk(["warmup"])
+
+    async def run(concurrency: int):
+        scheduler = RequestScheduler(max_concurrency=concurrency, base_delay=latency, max_delay=latency * 4)
+        async with AsyncKeywordIdeasService(STUB_CONFIG, max_concurrency=concurrency, batch_size=batch_size,
+                                            client_pool=client_pool, scheduler=scheduler) as service:
+            results = await asyncio.gather(*(service.generate_keyword_ideas(seeds) for seeds in seed_lists))
+        return results, scheduler.stats(), service.service.dedup_stats()
+
+    print(f"{len(seed_lists)} 组种子词（{topics} 个主题，每个主题扩展出 {ideas_per_seed} 个关键词），"
+          f"每块 {batch_size} 个，每次请求耗时 {latency * 1000:.0f} ms")
+    for concurrency in (1, max_concurrency):
+        idea_service.reset(fail_once=["topic0 idea 0"])
+        start = time.perf_counter()
+        results, scheduler_stats, dedup = asyncio.run(run(concurrency))
+        elapsed = time.perf_counter() - start
+        stub_stats = idea_service.stats()
+        print(f"  并发上限 {concurrency}: 耗时 {elapsed * 1000:.0f} ms，返回 {sum(map(len, results))} 个关键词创意，"
+              f"请求 {stub_stats['requests']} 次（历史指标 {sum(stub_stats['chunk_sizes'])} 个关键词，"
+              f"合并 {dedup['coalesced']} 个），在途峰值 {stub_stats['peak_active']}，重试 {scheduler_stats['retries']} 次")
+
+
+def run_example() -> None:
+    """使用真实凭据并发获取多组种子词关键词创意的示例"""
+    async def run_example_async():
+        # 示例配置
+        config = {
+            'client_id': 'YOUR_CLIENT_ID',
+            'client_secret': 'YOUR_CLIENT_SECRET',
+            'developer_token': 'YOUR_DEVELOPER_TOKEN',
+            'login_customer_id': 'YOUR_LOGIN_CUSTOMER_ID',
+            'refresh_token': 'YOUR_REFRESH_TOKEN',
+        }
+
+        seed_lists = [["python programming"], ["rust programming"], ["go programming"]]
+        async with AsyncKeywordIdeasService(config, max_concurrency=8) as service:
+            results = await asyncio.gather(
+                *(service.generate_keyword_ideas(seeds) for seeds in seed_lists),
+                return_exceptions=True
+            )
+
+        for seeds, ideas in zip(seed_lists, results):
+            if isinstance(ideas, Exception):
+                print(f"{seeds}: 错误: {str(ideas)}")
+                continue
+            print(f"{seeds}: 获取到 {len(ideas)} 个关键词创意")
+
+    try:
+        asyncio.run(run_example_async())
+    except Exception as e:
+        print(f"错误: {str(e)}")
+
+
+if __name__ == "__main__":
+    import sys
+
+    if sys.argv[1:] == ["--example"]:
+        run_example()
+    else:
+        run_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 4)
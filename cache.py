@@ -0,0 +1,436 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from keyword_ideas_service import MonthlySearchVolume, normalize_keyword
+
+# 默认缓存条目上限
+DEFAULT_MAX_ENTRIES = 200_000
+# Google Ads 通常在每月初的几天内发布上个月的数据
+DEFAULT_REFRESH_DELAY_DAYS = 3
+# 默认的搜索网络
+DEFAULT_NETWORK = "GOOGLE_SEARCH"
+# SQLite单条语句中IN列表的关键词数量，避免超过参数数量限制
+SQL_BATCH_SIZE = 500
+
+
+def next_monthly_refresh(now: Optional[float] = None, refresh_delay_days: int = DEFAULT_REFRESH_DELAY_DAYS) -> float:
+    """
+    计算下一次月度数据刷新的时间戳
+
+    Args:
+        now: 当前时间戳，默认为time.time()
+        refresh_delay_days: 每月数据发布相对月初的延迟天数
+
+    Returns:
+        float: 下一次数据刷新的时间戳
+    """
+    current = datetime.fromtimestamp(time.time() if now is None else now)
+    refresh = current.replace(day=1 + refresh_delay_days, hour=0, minute=0, second=0, microsecond=0)
+    if refresh <= current:
+        # 本月的刷新时间已过，顺延到下个月
+        if current.month == 12:
+            refresh = refresh.replace(year=current.year + 1, month=1)
+        else:
+            refresh = refresh.replace(month=current.month + 1)
+    return refresh.timestamp()
+
+
+class KeywordMetricsCache:
+    """基于SQLite的关键词历史指标持久化缓存
+
+    缓存键为 (规范化后的关键词, language_id, network)，仅大小写或空白不同的关键词共用一个条目。
+    条目默认在下一次月度数据刷新时过期，超过max_entries时先删除过期条目，再按最近访问时间淘汰最久未使用的条目。
+    条目数随写入和删除维护，写入时不需要统计全表。
+    """
+
+    def __init__(self, db_path: str, max_entries: int = DEFAULT_MAX_ENTRIES,
+                 ttl_seconds: Optional[float] = None,
+                 refresh_delay_days: int = DEFAULT_REFRESH_DELAY_DAYS):
+        """
+        初始化缓存
+
+        Args:
+            db_path: SQLite数据库文件路径，传入":memory:"时使用内存数据库
+            max_entries: 缓存条目上限
+            ttl_seconds: 固定的条目有效期（秒），为None时对齐到月度数据刷新时间
+            refresh_delay_days: 每月数据发布相对月初的延迟天数
+        """
+        if max_entries <= 0:
+            raise ValueError("max_entries必须大于0")
+
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.refresh_delay_days = refresh_delay_days
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        if db_path != ":memory:":
+            directory = os.path.dirname(os.path.abspath(db_path))
+            os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS keyword_metrics (
+                keyword TEXT NOT NULL,
+                language_id TEXT NOT NULL,
+                network TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                expires_at REAL NOT NULL,
+                last_access REAL NOT NULL,
+                PRIMARY KEY (keyword, language_id, network)
+            )
+        """)
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_keyword_metrics_last_access ON keyword_metrics (last_access)"
+        )
+        self._conn.commit()
+        # 当前条目数（包括尚未删除的过期条目）
+        self._entries = self._conn.execute("SELECT COUNT(*) FROM keyword_metrics").fetchone()[0]
+
+    def _expires_at(self, now: float) -> float:
+        """计算新写入条目的过期时间"""
+        if self.ttl_seconds is not None:
+            return now + self.ttl_seconds
+        return next_monthly_refresh(now, self.refresh_delay_days)
+
+    @staticmethod
+    def _serialize(metrics: Dict) -> str:
+        """将指标字典序列化为JSON"""
+        data = dict(metrics)
+        data['monthly_searches'] = [
+            [monthly.year_month, monthly.monthly_searches] for monthly in metrics.get('monthly_searches', [])
+        ]
+        return json.dumps(data, ensure_ascii=False)
+
+    @staticmethod
+    def _deserialize(payload: str) -> Dict:
+        """将JSON反序列化为指标字典"""
+        data = json.loads(payload)
+        data['monthly_searches'] = [
+            MonthlySearchVolume(year_month=year_month, monthly_searches=searches)
+            for year_month, searches in data.get('monthly_searches', [])
+        ]
+        return data
+
+    def get_many(self, keywords: List[str], language_id: str = "1000",
+                 network: str = DEFAULT_NETWORK) -> Dict[str, Dict]:
+        """
+        批量查询缓存
+
+        Args:
+            keywords: 关键词列表
+            language_id: 语言ID
+            network: 搜索网络
+
+        Returns:
+            Dict[str, Dict]: 命中的关键词（原始文本）到历史指标的映射
+        """
+        if not keywords:
+            return {}
+
+        now = time.time()
+        normalized = {}
+        for keyword in keywords:
+            normalized.setdefault(normalize_keyword(keyword), []).append(keyword)
+
+        found = {}
+        with self._lock:
+            keys = list(normalized)
+            for i in range(0, len(keys), SQL_BATCH_SIZE):
+                batch = keys[i:i + SQL_BATCH_SIZE]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT keyword, payload FROM keyword_metrics "
+                    f"WHERE language_id = ? AND network = ? AND expires_at > ? AND keyword IN ({placeholders})",
+                    [language_id, network, now, *batch]
+                ).fetchall()
+                for key, payload in rows:
+                    found[key] = payload
+
+            if found:
+                self._conn.executemany(
+                    "UPDATE keyword_metrics SET last_access = ? WHERE keyword = ? AND language_id = ? AND network = ?",
+                    [(now, key, language_id, network) for key in found]
+                )
+                self._conn.commit()
+
+            self.hits += len(found)
+            self.misses += len(normalized) - len(found)
+
+        return {keyword: self._deserialize(payload) for key, payload in found.items() for keyword in normalized[key]}
+
+    def put_many(self, metrics_map: Dict[str, Dict], language_id: str = "1000",
+                 network: str = DEFAULT_NETWORK) -> None:
+        """
+        批量写入缓存
+
+        Args:
+            metrics_map: 关键词到历史指标的映射
+            language_id: 语言ID
+            network: 搜索网络
+        """
+        if not metrics_map:
+            return
+
+        now = time.time()
+        expires_at = self._expires_at(now)
+        rows = {}
+        for keyword, metrics in metrics_map.items():
+            key = normalize_keyword(keyword)
+            rows[key] = (key, language_id, network, self._serialize(metrics), expires_at, now)
+
+        with self._lock:
+            existing = self._count_existing(list(rows), language_id, network)
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO keyword_metrics "
+                "(keyword, language_id, network, payload, expires_at, last_access) VALUES (?, ?, ?, ?, ?, ?)",
+                rows.values()
+            )
+            self._entries += len(rows) - existing
+            if self._entries > self.max_entries:
+                self._evict(now)
+            self._conn.commit()
+
+    def _count_existing(self, keys: List[str], language_id: str, network: str) -> int:
+        """统计已有条目的键数量，按主键查询（调用方需持有锁）"""
+        existing = 0
+        for i in range(0, len(keys), SQL_BATCH_SIZE):
+            batch = keys[i:i + SQL_BATCH_SIZE]
+            placeholders = ",".join("?" * len(batch))
+            existing += self._conn.execute(
+                f"SELECT COUNT(*) FROM keyword_metrics "
+                f"WHERE language_id = ? AND network = ? AND keyword IN ({placeholders})",
+                [language_id, network, *batch]
+            ).fetchone()[0]
+        return existing
+
+    def _evict(self, now: float) -> None:
+        """删除过期条目，并按最近访问时间淘汰超出上限的条目（调用方需持有锁）"""
+        self._entries -= self._conn.execute("DELETE FROM keyword_metrics WHERE expires_at <= ?", (now,)).rowcount
+        overflow = self._entries - self.max_entries
+        if overflow > 0:
+            self._entries -= self._conn.execute(
+                "DELETE FROM keyword_metrics WHERE rowid IN "
+                "(SELECT rowid FROM keyword_metrics ORDER BY last_access ASC LIMIT ?)",
+                (overflow,)
+            ).rowcount
+
+    def stats(self) -> Dict:
+        """
+        获取缓存统计信息
+
+        Returns:
+            Dict: 包含命中数、未命中数、命中率和条目数
+        """
+        with self._lock:
+            # 顺便校正条目数，其他进程也可能写入同一个数据库
+            entries = self._entries = self._conn.execute("SELECT COUNT(*) FROM keyword_metrics").fetchone()[0]
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0,
+                'entries': entries
+            }
+
+    def clear(self) -> None:
+        """清空缓存和统计计数"""
+        with self._lock:
+            self._conn.execute("DELETE FROM keyword_metrics")
+            self._conn.commit()
+            self._entries = 0
+            self.hits = 0
+            self.misses = 0
+
+    def close(self) -> None:
+        """关闭数据库连接"""
+        with self._lock:
+            self._conn.close()
+
+
+# allintitle 数量的默认有效期（秒）
+DEFAULT_ALLINTITLE_TTL = 7 * 24 * 3600
+# 结果为0或获取失败时的默认有效期（秒）
+DEFAULT_ALLINTITLE_NEGATIVE_TTL = 24 * 3600
+# allintitle 缓存的默认条目上限
+DEFAULT_ALLINTITLE_MAX_ENTRIES = 100_000
+
+
+class AllintitleCache:
+    """基于SQLite的allintitle结果数量缓存
+
+    缓存键为规范化后的关键词。结果为0或获取失败的条目使用较短的有效期（负缓存），
+    失败条目的数量保存为NULL。超过max_entries时先删除过期条目，再按最近访问时间淘汰。
+    与KeywordMetricsCache一样，条目数随写入和删除维护，写入时不需要统计全表。
+    """
+
+    def __init__(self, db_path: str, ttl_seconds: float = DEFAULT_ALLINTITLE_TTL,
+                 negative_ttl_seconds: float = DEFAULT_ALLINTITLE_NEGATIVE_TTL,
+                 max_entries: int = DEFAULT_ALLINTITLE_MAX_ENTRIES):
+        """
+        初始化缓存
+
+        Args:
+            db_path: SQLite数据库文件路径，传入":memory:"时使用内存数据库
+            ttl_seconds: 正常结果的有效期（秒）
+            negative_ttl_seconds: 结果为0或获取失败时的有效期（秒）
+            max_entries: 缓存条目上限
+        """
+        if max_entries <= 0:
+            raise ValueError("max_entries必须大于0")
+
+        self.db_path = db_path
+        self.ttl_seconds = ttl_seconds
+        self.negative_ttl_seconds = negative_ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        if db_path != ":memory:":
+            directory = os.path.dirname(os.path.abspath(db_path))
+            os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS allintitle_counts (
+                keyword TEXT PRIMARY KEY,
+                count INTEGER,
+                expires_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+        """)
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_allintitle_counts_last_access ON allintitle_counts (last_access)"
+        )
+        self._conn.commit()
+        # 当前条目数（包括尚未删除的过期条目）
+        self._entries = self._conn.execute("SELECT COUNT(*) FROM allintitle_counts").fetchone()[0]
+
+    def get_many(self, keywords: List[str]) -> Dict[str, Optional[int]]:
+        """
+        批量查询缓存
+
+        Args:
+            keywords: 关键词列表
+
+        Returns:
+            Dict[str, Optional[int]]: 命中的关键词（原始文本）到allintitle数量的映射，
+                                      数量为None表示最近一次获取失败
+        """
+        if not keywords:
+            return {}
+
+        now = time.time()
+        normalized = {}
+        for keyword in keywords:
+            normalized.setdefault(normalize_keyword(keyword), []).append(keyword)
+
+        found = {}
+        with self._lock:
+            keys = list(normalized)
+            for i in range(0, len(keys), SQL_BATCH_SIZE):
+                batch = keys[i:i + SQL_BATCH_SIZE]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT keyword, count FROM allintitle_counts "
+                    f"WHERE expires_at > ? AND keyword IN ({placeholders})",
+                    [now, *batch]
+                ).fetchall()
+                for key, count in rows:
+                    found[key] = count
+
+            if found:
+                self._conn.executemany(
+                    "UPDATE allintitle_counts SET last_access = ? WHERE keyword = ?",
+                    [(now, key) for key in found]
+                )
+                self._conn.commit()
+
+            self.hits += len(found)
+            self.misses += len(normalized) - len(found)
+
+        return {keyword: count for key, count in found.items() for keyword in normalized[key]}
+
+    def get(self, keyword: str):
+        """
+        查询单个关键词
+
+        Args:
+            keyword: 关键词
+
+        Returns:
+            tuple: (是否命中, allintitle数量)，数量为None表示最近一次获取失败
+        """
+        found = self.get_many([keyword])
+        if keyword in found:
+            return True, found[keyword]
+        return False, None
+
+    def put(self, keyword: str, count: Optional[int]) -> None:
+        """
+        写入缓存
+
+        Args:
+            keyword: 关键词
+            count: allintitle数量，获取失败时传入None
+        """
+        now = time.time()
+        ttl = self.ttl_seconds if count else self.negative_ttl_seconds
+
+        key = normalize_keyword(keyword)
+
+        with self._lock:
+            exists = self._conn.execute("SELECT 1 FROM allintitle_counts WHERE keyword = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO allintitle_counts (keyword, count, expires_at, last_access) VALUES (?, ?, ?, ?)",
+                (key, count, now + ttl, now)
+            )
+            if not exists:
+                self._entries += 1
+                if self._entries > self.max_entries:
+                    self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now: float) -> None:
+        """删除过期条目，并按最近访问时间淘汰超出上限的条目（调用方需持有锁）"""
+        self._entries -= self._conn.execute("DELETE FROM allintitle_counts WHERE expires_at <= ?", (now,)).rowcount
+        overflow = self._entries - self.max_entries
+        if overflow > 0:
+            self._entries -= self._conn.execute(
+                "DELETE FROM allintitle_counts WHERE rowid IN "
+                "(SELECT rowid FROM allintitle_counts ORDER BY last_access ASC LIMIT ?)",
+                (overflow,)
+            ).rowcount
+
+    def stats(self) -> Dict:
+        """
+        获取缓存统计信息
+
+        Returns:
+            Dict: 包含命中数、未命中数、命中率和条目数
+        """
+        with self._lock:
+            # 顺便校正条目数，其他进程也可能写入同一个数据库
+            entries = self._entries = self._conn.execute("SELECT COUNT(*) FROM allintitle_counts").fetchone()[0]
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0,
+                'entries': entries
+            }
+
+    def close(self) -> None:
+        """关闭数据库连接"""
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,304 @@
+"""
+命令行模式：无需图形界面，批量处理种子并流式导出结果
+
+种子文件每行一个任务，用逗号分隔多个关键词，以 http:// 或 https:// 开头的项作为URL，例如：
+
+    python programming, python tutorial
+    https://www.python.org
+    django, https://www.djangoproject.com
+
+使用示例：
+
+    python cli.py --seeds seeds.txt --output results.jsonl
+    cat seeds.txt | python cli.py --seeds - --output results.csv --workers 8
+    python cli.py --seeds seeds.txt --output results.jsonl --store .cache/keywords.db
+    python cli.py --seeds seeds.txt --output results.jsonl --merge-variants
+
+已完成的种子会在结果写入文件后记录到检查点文件，任务中断后使用相同参数重新运行即可从中断处继续。
+Parquet/Arrow 输出每积累 CHECKPOINT_FLUSH_ROWS 行关闭一个分片文件（out.parquet、out.1.parquet ...），
+中断时只丢失未关闭的分片，其中的种子重新运行时会再次处理。
+"""
+import argparse
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Iterator, Optional, Set, Tuple
+
+import yaml
+
+from cache import KeywordMetricsCache
+from exporters import EXPORT_FORMATS, create_exporter, idea_to_record
+from keyword_clusters import KeywordClusterer
+from keyword_ideas_service import KeywordIdeasService
+from keyword_store import KeywordStore
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+# Parquet/Arrow输出缓冲的行数达到这个数量时关闭当前分片文件，其中的种子随后才记录到检查点
+CHECKPOINT_FLUSH_ROWS = 50_000
+
+
+def load_config(config_path: str, token_path: str) -> dict:
+    """
+    加载YAML配置和refresh token
+
+    Args:
+        config_path: YAML配置文件路径
+        token_path: refresh token文件路径
+
+    Returns:
+        dict: KeywordIdeasService所需的配置字典
+
+    Raises:
+        FileNotFoundError: 配置文件不存在
+        ValueError: 配置信息不完整
+    """
+    if not os.path.exists(config_path):
+        raise FileNotFoundError(f"找不到配置文件: {config_path}")
+    if not os.path.exists(token_path):
+        raise FileNotFoundError(f"找不到refresh token文件: {token_path}")
+
+    with open(config_path, 'r') as f:
+        yaml_config = yaml.safe_load(f) or {}
+
+    with open(token_path, 'r') as f:
+        refresh_token = f.read().strip()
+
+    config_dict = {
+        'client_id': yaml_config.get('client_id'),
+        'client_secret': yaml_config.get('client_secret'),
+        'developer_token': yaml_config.get('developer_token'),
+        'login_customer_id': yaml_config.get('login_customer_id'),
+        'refresh_token': refresh_token
+    }
+
+    missing_keys = [k for k, v in config_dict.items() if not v]
+    if missing_keys:
+        raise ValueError(f"配置文件中缺少必要字段: {', '.join(missing_keys)}")
+
+    return config_dict
+
+
+def parse_seed(line: str) -> Tuple[list, Optional[str]]:
+    """
+    解析一行种子
+
+    Args:
+        line: 种子行
+
+    Returns:
+        Tuple[list, Optional[str]]: (关键词列表, URL)
+
+    Raises:
+        ValueError: 一行中包含多个URL
+    """
+    keywords = []
+    url = None
+    for part in line.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        if part.startswith(('http://', 'https://')):
+            if url:
+                raise ValueError(f"每行只能包含一个URL: {line}")
+            url = part
+        else:
+            keywords.append(part)
+    return keywords, url
+
+
+def iter_seeds(stream, completed: Set[str]) -> Iterator[str]:
+    """
+    逐行读取种子，跳过空行、注释和已完成的种子
+
+    Args:
+        stream: 种子输入流
+        completed: 已完成的种子集合
+
+    Yields:
+        str: 种子行
+    """
+    for line in stream:
+        seed = line.strip()
+        if not seed or seed.startswith('#') or seed in completed:
+            continue
+        # 同一次运行中重复的种子只处理一次
+        completed.add(seed)
+        yield seed
+
+
+def load_checkpoint(path: str) -> Set[str]:
+    """
+    读取检查点中已完成的种子
+
+    Args:
+        path: 检查点文件路径
+
+    Returns:
+        Set[str]: 已完成的种子集合
+    """
+    if not os.path.exists(path):
+        return set()
+    with open(path, 'r', encoding='utf-8') as f:
+        return {line.rstrip('\n') for line in f if line.strip()}
+
+
+def run(args) -> int:
+    """
+    执行命令行批处理
+
+    Args:
+        args: 命令行参数
+
+    Returns:
+        int: 进程退出码
+    """
+    config = load_config(args.config, args.refresh_token)
+    store = KeywordStore(args.store) if args.store else None
+    cache = None if args.no_cache or store else KeywordMetricsCache(args.cache)
+    service = KeywordIdeasService(config, cache=cache, store=store)
+
+    checkpoint_path = args.checkpoint or f"{args.output}.checkpoint"
+    completed = load_checkpoint(checkpoint_path)
+    resuming = bool(completed)
+    if resuming and not os.path.exists(args.output):
+        # 已完成种子的结果不在新的输出中，跳过它们会丢失数据
+        raise FileNotFoundError(f"检查点 {checkpoint_path} 中有 {len(completed)} 个已完成的种子，"
+                                f"但输出文件 {args.output} 不存在；如需重新处理全部种子，请先删除检查点文件")
+    if resuming:
+        print(f"从检查点恢复，跳过 {len(completed)} 个已完成的种子", file=sys.stderr)
+
+    seed_stream = sys.stdin if args.seeds == '-' else open(args.seeds, 'r', encoding='utf-8')
+    processed = 0
+    failed = 0
+    exported = 0
+    # 各种子的近似变体聚类统计，由工作线程追加
+    cluster_stats = []
+
+    def process(seed: str):
+        keywords, url = parse_seed(seed)
+        failures = []
+        # 每个种子使用独立的聚类器，不同种子的结果互不影响
+        clusterer = KeywordClusterer() if args.merge_variants else None
+        ideas = list(service.iter_keyword_ideas(keywords or None, url, args.language_id,
+                                                failure_callback=failures.append, clusterer=clusterer))
+        if clusterer is not None:
+            cluster_stats.append(clusterer.stats())
+        if failures:
+            # 部分关键词获取失败时整个种子按失败处理，不写入检查点，重新运行时会再次处理
+            raise Exception("; ".join(str(failure) for failure in failures))
+        if store:
+            # 指标已在增量刷新时写入本地关键词库，这里只记录种子来源，之后可在库中按条件查询
+            store.save_seeds([idea.text for idea in ideas], seed, args.language_id)
+        return ideas
+
+    try:
+        with create_exporter(args.output, args.format, append=resuming) as exporter, \
+                open(checkpoint_path, 'a', encoding='utf-8') as checkpoint, \
+                ThreadPoolExecutor(max_workers=args.workers) as executor:
+            seeds = iter_seeds(seed_stream, completed)
+            pending = {}
+            # 结果已交给导出器但尚未完整写入文件的种子
+            unflushed = []
+
+            def commit():
+                # 结果落盘后才记录检查点，中断后重新运行时未落盘的种子会被再次处理
+                exporter.flush()
+                checkpoint.writelines(seed + "\n" for seed in unflushed)
+                checkpoint.flush()
+                unflushed.clear()
+
+            def fill():
+                # 限制在途任务数量，避免一次性读入全部种子
+                while len(pending) < args.workers * 2:
+                    seed = next(seeds, None)
+                    if seed is None:
+                        return
+                    pending[executor.submit(process, seed)] = seed
+
+            fill()
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    seed = pending.pop(future)
+                    processed += 1
+                    try:
+                        ideas = future.result()
+                    except Exception as e:
+                        # 失败的种子不写入检查点，重新运行时会再次处理
+                        failed += 1
+                        print(f"种子处理失败 [{seed}]: {str(e)}", file=sys.stderr)
+                        continue
+
+                    # 先写出结果再记录检查点，中断时最多重复导出一个种子的结果；
+                    # Parquet/Arrow在关闭分片文件前数据不可读，积累一定行数后才关闭分片并记录检查点
+                    exporter.write(idea_to_record(idea, seed) for idea in ideas)
+                    exported += len(ideas)
+                    unflushed.append(seed)
+                    if exporter.buffered_rows == 0 or exporter.buffered_rows >= CHECKPOINT_FLUSH_ROWS:
+                        commit()
+
+                    if processed % args.progress_interval == 0:
+                        print(f"已处理 {processed} 个种子，导出 {exported} 个关键词", file=sys.stderr)
+                fill()
+            commit()
+    finally:
+        if seed_stream is not sys.stdin:
+            seed_stream.close()
+
+    print(f"完成：处理 {processed} 个种子（失败 {failed} 个），导出 {exported} 个关键词", file=sys.stderr)
+    if cache:
+        stats = cache.stats()
+        print(f"缓存命中 {stats['hits']} 次，未命中 {stats['misses']} 次，命中率 {stats['hit_rate']:.1%}", file=sys.stderr)
+    if store:
+        stats = service.refresh_stats()
+        print(f"本地数据 {stats['fresh']} 个，增量刷新 {stats['incremental']} 个，完整请求 {stats['full']} 个关键词，"
+              f"避免 {stats['api_calls_avoided']} / {stats['baseline_calls']} 次API调用", file=sys.stderr)
+    if cluster_stats:
+        merged = sum(stats['merged'] for stats in cluster_stats)
+        total = sum(stats['keywords'] for stats in cluster_stats)
+        print(f"合并近似变体 {merged} / {total} 个关键词，这些关键词未请求历史数据", file=sys.stderr)
+    stats = service.dedup_stats()
+    print(f"合并重复请求 {stats['coalesced']} / {stats['requested']} 个关键词（{stats['coalesce_rate']:.1%}）", file=sys.stderr)
+    return 1 if failed else 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """构建命令行参数解析器"""
+    parser = argparse.ArgumentParser(description="Google Ads 关键词工具命令行模式")
+    parser.add_argument('--seeds', required=True, help="种子文件路径，'-' 表示从标准输入读取")
+    parser.add_argument('--output', required=True, help="输出文件路径（.csv/.jsonl/.parquet）")
+    parser.add_argument('--format', choices=sorted(set(EXPORT_FORMATS.values())),
+                        help="输出格式，默认根据输出文件扩展名判断")
+    parser.add_argument('--checkpoint', help="检查点文件路径，默认为 <output>.checkpoint")
+    parser.add_argument('--workers', type=int, default=4, help="并发处理的种子数量")
+    parser.add_argument('--language-id', default="1000", help="语言ID，默认为1000（英语）")
+    parser.add_argument('--config', default=os.path.join(CURRENT_DIR, 'config.yaml'), help="YAML配置文件路径")
+    parser.add_argument('--refresh-token', default=os.path.join(CURRENT_DIR, '.refresh_token'),
+                        help="refresh token文件路径")
+    parser.add_argument('--cache', default=os.path.join(CURRENT_DIR, '.cache', 'keyword_metrics.db'),
+                        help="历史指标缓存数据库路径")
+    parser.add_argument('--no-cache', action='store_true', help="不使用历史指标缓存")
+    parser.add_argument('--store', help="本地关键词库路径，指定后以增量刷新代替缓存，跨月后只请求新发布的月份，结果和种子来源也会保存到库中")
+    parser.add_argument('--merge-variants', action='store_true',
+                        help="合并单复数、词序、标点和拼写不同的近似变体，每组只请求和导出代表关键词")
+    parser.add_argument('--progress-interval', type=int, default=10, help="每处理多少个种子输出一次进度")
+    return parser
+
+
+def main(argv=None) -> int:
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.workers <= 0:
+        parser.error("--workers必须大于0")
+    if args.progress_interval <= 0:
+        parser.error("--progress-interval必须大于0")
+
+    try:
+        return run(args)
+    except Exception as e:
+        print(f"错误: {str(e)}", file=sys.stderr)
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,505 @@
+"""
+关键词结果的流式导出
+
+支持CSV、JSONL、Parquet和Arrow（Feather）四种格式，按扩展名或显式指定的格式选择导出器（见EXPORT_FORMATS），
+Parquet和Arrow需要安装pyarrow。导出器逐批写入，不在内存中保存全部结果：
+
+    - CSV和JSONL每批写入后即可读取，append为True时接着已有内容写入（CSV不重复写表头），配合命令行的检查点断点续传
+    - Parquet和Arrow无法追加，写入中的文件使用 .partial 后缀，flush 时关闭并重命名为正式文件，
+      之后写入新的分片（如 out.1.parquet）；续传时同样从新的分片开始，已重命名的文件都是完整可读的
+
+export_results 供桌面工具导出当前结果集，按EXPORT_CHUNK_SIZE分批转换，包含完整的月度搜索量列和KGR列。
+
+运行本模块可测量导出合成结果集的耗时和峰值内存：
+
+    python exporters.py [关键词数量] [输出文件路径]
+"""
+import csv
+import json
+import math
+import os
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from keyword_ideas_service import KeywordIdea
+
+# 导出字段，按输出列顺序排列
+EXPORT_FIELDS = [
+    'seed',
+    'keyword',
+    'avg_monthly_searches',
+    'competition',
+    'competition_index',
+    'recent_growth_percentage',
+    'growth_percentage',
+    'low_cpc',
+    'high_cpc',
+    'monthly_searches',
+]
+
+# 结果导出的固定列及类型，其后依次为KGR列和每个月份一列的搜索量
+RESULT_EXPORT_COLUMNS = [
+    ('keyword', 'string'),
+    ('avg_monthly_searches', 'int'),
+    ('competition', 'string'),
+    ('competition_index', 'float'),
+    ('recent_growth_percentage', 'float'),
+    ('growth_percentage', 'float'),
+    ('low_cpc', 'float'),
+    ('high_cpc', 'float'),
+    ('kgr_avg', 'float'),
+    ('kgr_latest', 'float'),
+    ('allintitle_count', 'int'),
+]
+
+# 支持的导出格式及对应的文件扩展名
+EXPORT_FORMATS = {
+    '.csv': 'csv',
+    '.jsonl': 'jsonl',
+    '.parquet': 'parquet',
+    '.arrow': 'arrow',
+    '.feather': 'arrow',
+}
+
+# Parquet 每个 row group 缓冲的行数
+PARQUET_ROW_GROUP_SIZE = 10_000
+# 结果导出时每批转换和写入的行数
+EXPORT_CHUNK_SIZE = 5_000
+
+
+def finite_or_none(value):
+    """
+    把非有限的浮点数（如起始月搜索量为0时的增长率inf）转换为None
+
+    严格的JSON不支持Infinity和NaN；None在JSON和Parquet中为null，在CSV中为空单元格，三种格式的空值一致。
+
+    Args:
+        value: 导出的值
+
+    Returns:
+        原值，非有限浮点数时为None
+    """
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    return value
+
+
+def idea_to_record(idea: KeywordIdea, seed: Optional[str] = None) -> Dict:
+    """
+    将关键词创意转换为导出记录
+
+    Args:
+        idea: 关键词创意
+        seed: 产生该关键词的种子，可选
+
+    Returns:
+        Dict: 导出记录
+    """
+    return {
+        'seed': seed,
+        'keyword': idea.text,
+        'avg_monthly_searches': idea.avg_monthly_searches,
+        'competition': idea.competition,
+        'competition_index': finite_or_none(idea.competition_index),
+        'recent_growth_percentage': finite_or_none(idea.recent_growth_percentage),
+        'growth_percentage': finite_or_none(idea.growth_percentage),
+        'low_cpc': finite_or_none(idea.low_cpc),
+        'high_cpc': finite_or_none(idea.high_cpc),
+        'monthly_searches': [
+            {'year_month': monthly.year_month, 'monthly_searches': monthly.monthly_searches}
+            for monthly in idea.monthly_searches
+        ],
+    }
+
+
+def detect_format(path: str) -> str:
+    """
+    根据文件扩展名判断导出格式
+
+    Args:
+        path: 输出文件路径
+
+    Returns:
+        str: 导出格式
+
+    Raises:
+        ValueError: 不支持的文件扩展名
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in EXPORT_FORMATS:
+        raise ValueError(f"不支持的导出格式: {extension}，支持: {', '.join(EXPORT_FORMATS)}")
+    return EXPORT_FORMATS[extension]
+
+
+class CsvExporter:
+    """流式CSV导出，默认列中的月度搜索量以JSON字符串保存在一列中"""
+
+    def __init__(self, path: str, append: bool = False, columns: Optional[Sequence[Tuple[str, str]]] = None):
+        """
+        Args:
+            path: 输出文件路径
+            append: 是否追加到已有文件
+            columns: (列名, 类型) 列表，为None时使用EXPORT_FIELDS
+        """
+        write_header = not (append and os.path.exists(path) and os.path.getsize(path) > 0)
+        # 使用 utf-8-sig 以支持Excel正确显示中文，追加写入时不重复写BOM
+        encoding = 'utf-8-sig' if write_header else 'utf-8'
+        fieldnames = [name for name, _ in columns] if columns else EXPORT_FIELDS
+        self._encode_monthly = 'monthly_searches' in fieldnames
+        self._file = open(path, 'a' if append else 'w', newline='', encoding=encoding)
+        self._writer = csv.DictWriter(self._file, fieldnames=fieldnames)
+        if write_header:
+            self._writer.writeheader()
+
+    def write(self, records: Iterable[Dict]) -> None:
+        if not self._encode_monthly:
+            self._writer.writerows(records)
+        else:
+            for record in records:
+                row = dict(record)
+                row['monthly_searches'] = json.dumps(row['monthly_searches'], ensure_ascii=False, allow_nan=False)
+                self._writer.writerow(row)
+        self._file.flush()
+
+    # 每次write后数据都已写入文件，没有缓冲的行
+    buffered_rows = 0
+
+    def flush(self) -> None:
+        """把已写入的行落盘"""
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self) -> None:
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class JsonlExporter:
+    """流式JSON Lines导出，每行一个关键词"""
+
+    def __init__(self, path: str, append: bool = False, columns: Optional[Sequence[Tuple[str, str]]] = None):
+        self._file = open(path, 'a' if append else 'w', encoding='utf-8')
+
+    def write(self, records: Iterable[Dict]) -> None:
+        for record in records:
+            # 非有限浮点数应在转换记录时处理为None，遗漏时直接报错而不是写出无效的JSON
+            self._file.write(json.dumps(record, ensure_ascii=False, allow_nan=False) + "\n")
+        self._file.flush()
+
+    buffered_rows = 0
+
+    def flush(self) -> None:
+        """把已写入的行落盘"""
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self) -> None:
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class ParquetExporter:
+    """流式Parquet导出，按row group分批写入，需要安装pyarrow
+
+    Parquet文件只有在关闭时写入文件尾后才能读取，也无法追加。写入中的文件使用 .partial 后缀，
+    关闭后才重命名为正式的文件名；flush 关闭当前文件，之后写入的行进入新的分片文件（如 out.1.parquet）。
+    进程中断时只会留下 .partial 文件，已重命名的文件都是完整可读的。
+    """
+
+    format_name = 'Parquet'
+
+    def __init__(self, path: str, append: bool = False, columns: Optional[Sequence[Tuple[str, str]]] = None):
+        """
+        Args:
+            path: 输出文件路径
+            append: 是否追加（写入新的分片文件）
+            columns: (列名, 类型) 列表，类型为string/int/float，为None时使用EXPORT_FIELDS对应的结构
+        """
+        try:
+            import pyarrow as pa
+        except ImportError:
+            raise ImportError(f"导出{self.format_name}需要安装pyarrow: pip install pyarrow")
+
+        self._pa = pa
+        self.base_path = path
+        self._schema = self._build_schema(columns) if columns else pa.schema([
+            ('seed', pa.string()),
+            ('keyword', pa.string()),
+            ('avg_monthly_searches', pa.int64()),
+            ('competition', pa.string()),
+            ('competition_index', pa.float64()),
+            ('recent_growth_percentage', pa.float64()),
+            ('growth_percentage', pa.float64()),
+            ('low_cpc', pa.float64()),
+            ('high_cpc', pa.float64()),
+            ('monthly_searches', pa.list_(pa.struct([
+                ('year_month', pa.string()),
+                ('monthly_searches', pa.int64()),
+            ]))),
+        ])
+        # 追加时第一个文件也写入新的分片；已完成的分片文件路径
+        self._append = append
+        self.paths: List[str] = []
+        # 当前写入中的分片文件路径及其writer，尚未写入任何行时为None
+        self.path: Optional[str] = None
+        self._writer = None
+        self._buffer: List[Dict] = []
+        # 当前分片中尚未完成（关闭并重命名）的行数
+        self.buffered_rows = 0
+
+    def _build_schema(self, columns: Sequence[Tuple[str, str]]):
+        """根据 (列名, 类型) 列表构建schema"""
+        pa = self._pa
+        types = {'string': pa.string(), 'int': pa.int64(), 'float': pa.float64()}
+        return pa.schema([(name, types[kind]) for name, kind in columns])
+
+    def _open_writer(self, path: str):
+        import pyarrow.parquet as pq
+
+        return pq.ParquetWriter(path, self._schema)
+
+    def _next_part_path(self) -> str:
+        """下一个分片文件的路径：第一个分片使用原路径（追加时除外），之后依次编号"""
+        path = self.base_path
+        if not self.paths and not (self._append and os.path.exists(path)):
+            return path
+        stem, extension = os.path.splitext(path)
+        part = 1
+        while os.path.exists(f"{stem}.{part}{extension}") or f"{stem}.{part}{extension}" in self.paths:
+            part += 1
+        return f"{stem}.{part}{extension}"
+
+    def write(self, records: Iterable[Dict]) -> None:
+        records = list(records)
+        self._buffer.extend(records)
+        self.buffered_rows += len(records)
+        if len(self._buffer) >= PARQUET_ROW_GROUP_SIZE:
+            self._write_buffer()
+
+    def _write_buffer(self) -> None:
+        if self._writer is None:
+            self.path = self._next_part_path()
+            self._writer = self._open_writer(self.path + ".partial")
+        if not self._buffer:
+            return
+        table = self._pa.Table.from_pylist(self._buffer, schema=self._schema)
+        self._writer.write_table(table)
+        self._buffer = []
+
+    def flush(self) -> None:
+        """写出缓冲的行并关闭当前分片文件，之后写入的行进入新的分片"""
+        if not self.buffered_rows:
+            return
+        self._finish_part()
+
+    def _finish_part(self) -> None:
+        self._write_buffer()
+        self._writer.close()
+        os.replace(self.path + ".partial", self.path)
+        self.paths.append(self.path)
+        self._writer = None
+        self.path = None
+        self.buffered_rows = 0
+
+    def close(self) -> None:
+        # 没有任何数据时也写出一个只有表结构的文件
+        if self.buffered_rows or not self.paths:
+            self._finish_part()
+
+    def discard(self) -> None:
+        """丢弃当前分片中尚未flush的行，删除写入中的文件"""
+        if self._writer is not None:
+            self._writer.close()
+            os.remove(self.path + ".partial")
+        self._writer = None
+        self.path = None
+        self._buffer = []
+        self.buffered_rows = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        # 出错时未flush的行不写入正式文件，与调用方记录的完成进度保持一致
+        if exc_type is not None:
+            self.discard()
+        else:
+            self.close()
+
+
+class ArrowExporter(ParquetExporter):
+    """流式Arrow IPC（Feather v2）导出，按批写入record batch，需要安装pyarrow
+
+    与Parquet相同，追加模式下会写入一个新的分片文件。
+    """
+
+    format_name = 'Arrow'
+
+    def _open_writer(self, path: str):
+        import pyarrow.ipc as ipc
+
+        return ipc.new_file(path, self._schema)
+
+
+def create_exporter(path: str, export_format: Optional[str] = None, append: bool = False,
+                    columns: Optional[Sequence[Tuple[str, str]]] = None):
+    """
+    创建流式导出器
+
+    Args:
+        path: 输出文件路径
+        export_format: 导出格式（csv/jsonl/parquet/arrow），为None时根据扩展名判断
+        append: 是否追加到已有输出
+        columns: (列名, 类型) 列表，为None时使用EXPORT_FIELDS
+
+    Returns:
+        导出器对象，提供write(records)、flush()和close()方法；buffered_rows为尚未完整写入文件的行数，
+        flush后已写入的行在进程中断后仍然可读
+    """
+    export_format = export_format or detect_format(path)
+    exporters = {
+        'csv': CsvExporter,
+        'jsonl': JsonlExporter,
+        'parquet': ParquetExporter,
+        'arrow': ArrowExporter,
+    }
+    if export_format not in exporters:
+        raise ValueError(f"不支持的导出格式: {export_format}")
+    return exporters[export_format](path, append=append, columns=columns)
+
+
+def collect_months(rows: Sequence, count: Optional[int] = None) -> List[str]:
+    """
+    收集结果中出现过的全部月份
+
+    Args:
+        rows: 关键词创意序列（KeywordIdea、KeywordIdeaTable等）
+        count: 只处理前count行，为None时处理全部
+
+    Returns:
+        List[str]: 按正序排列的月份
+    """
+    months = getattr(rows, 'months', None)
+    if months is not None:
+        return list(months)
+    count = len(rows) if count is None else count
+    return sorted({monthly.year_month for i in range(count) for monthly in rows[i].monthly_searches})
+
+
+def result_columns(months: Sequence[str]) -> List[Tuple[str, str]]:
+    """结果导出的完整列：固定列、KGR列，以及每个月份一列的搜索量"""
+    return RESULT_EXPORT_COLUMNS + [(month, 'int') for month in months]
+
+
+def idea_to_result_record(idea, months: Sequence[str], kgr: Optional[Tuple[float, float, int]] = None) -> Dict:
+    """
+    将关键词创意转换为宽表记录，每个月份一列，缺失的月份和非有限的数值为None
+
+    Args:
+        idea: 关键词创意
+        months: 导出的月份
+        kgr: (kgr_avg, kgr_latest, allintitle_count)，未计算时为None
+
+    Returns:
+        Dict: 导出记录
+    """
+    kgr_avg, kgr_latest, allintitle_count = kgr if kgr else (None, None, None)
+    record = {
+        'keyword': idea.text,
+        'avg_monthly_searches': idea.avg_monthly_searches,
+        'competition': idea.competition,
+        'competition_index': finite_or_none(idea.competition_index),
+        'recent_growth_percentage': finite_or_none(idea.recent_growth_percentage),
+        'growth_percentage': finite_or_none(idea.growth_percentage),
+        'low_cpc': finite_or_none(idea.low_cpc),
+        'high_cpc': finite_or_none(idea.high_cpc),
+        # 搜索量为0的关键词KGR为inf，与增长率一样导出为空值
+        'kgr_avg': finite_or_none(kgr_avg),
+        'kgr_latest': finite_or_none(kgr_latest),
+        'allintitle_count': allintitle_count,
+    }
+    volumes = {monthly.year_month: monthly.monthly_searches for monthly in idea.monthly_searches}
+    for month in months:
+        record[month] = volumes.get(month)
+    return record
+
+
+def export_results(rows: Sequence, path: str, export_format: Optional[str] = None,
+                   kgr_values: Optional[Dict[str, Tuple[float, float, int]]] = None,
+                   chunk_size: int = EXPORT_CHUNK_SIZE,
+                   progress_callback: Optional[Callable[[int, int], None]] = None) -> int:
+    """
+    分批导出结果集，包含完整的月度搜索量矩阵和KGR列
+
+    每次只转换chunk_size行并立即写出，不会在内存中构建整个结果集的副本，适合在后台线程中调用。
+    调用期间rows可以继续追加数据，只导出调用时已有的行。
+
+    Args:
+        rows: 关键词创意序列（list、KeywordIndex、KeywordIdeaTable等）
+        path: 输出文件路径
+        export_format: 导出格式，为None时根据扩展名判断
+        kgr_values: 关键词到 (kgr_avg, kgr_latest, allintitle_count) 的映射，可选
+        chunk_size: 每批的行数
+        progress_callback: 进度回调，每写完一批以 (已导出行数, 总行数) 调用，可选
+
+    Returns:
+        int: 导出的行数
+    """
+    total = len(rows)
+    months = collect_months(rows, total)
+    kgr_values = kgr_values or {}
+
+    with create_exporter(path, export_format, columns=result_columns(months)) as exporter:
+        for start in range(0, total, chunk_size):
+            end = min(start + chunk_size, total)
+            exporter.write([
+                idea_to_result_record(rows[i], months, kgr_values.get(rows[i].text)) for i in range(start, end)
+            ])
+            if progress_callback:
+                progress_callback(end, total)
+    return total
+
+
+def run_benchmark(count: int = 100_000, path: Optional[str] = None) -> None:
+    """
+    导出合成结果集，测量耗时和导出期间的峰值内存
+
+    Args:
+        count: 关键词数量
+        path: 输出文件路径，默认写入临时目录中的CSV文件
+    """
+    import tempfile
+    import time
+    import tracemalloc
+
+    from keyword_table import build_synthetic_ideas
+
+    ideas = build_synthetic_ideas(count)
+    kgr_values = {idea.text: (0.1, 0.2, 10) for idea in ideas[::10]}
+    with tempfile.TemporaryDirectory() as directory:
+        output = path or os.path.join(directory, 'results.csv')
+        tracemalloc.start()
+        start = time.perf_counter()
+        export_results(ideas, output, kgr_values=kgr_values)
+        elapsed = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        size = os.path.getsize(output)
+
+    print(f"{count:,} 个关键词 -> {os.path.basename(output)} ({size / 1024 / 1024:.1f} MB)")
+    print(f"  耗时 {elapsed:.2f} s，峰值额外内存 {peak / 1024 / 1024:.1f} MB")
+
+
+if __name__ == "__main__":
+    import sys
+
+    run_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000, sys.argv[2] if len(sys.argv) > 2 else None)
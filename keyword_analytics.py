@@ -0,0 +1,326 @@
+"""
+基于 关键词×月份 搜索量矩阵的批量趋势分析
+
+所有函数都接收按月份正序排列的二维矩阵（缺失值为NaN），一次性计算全部关键词的指标。
+增长率的语义与 KeywordIdeasService.calculate_growth_percentage /
+calculate_recent_growth_percentage 完全一致：基期为0时，当期大于0返回inf，否则返回0。
+
+运行本模块可对比逐个关键词计算与批量计算的耗时：
+
+    python keyword_analytics.py
+"""
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+
+
+def volumes_matrix(monthly_lists: Iterable[Iterable]) -> Tuple[List[str], np.ndarray]:
+    """
+    将多个关键词的月度搜索量列表转换为矩阵
+
+    同一批关键词的月份序列通常完全相同，按月份序列分组后每组只计算一次列位置，
+    搜索量一次性转换为数组后按组整块写入矩阵。
+
+    Args:
+        monthly_lists: 每个关键词的MonthlySearchVolume列表
+
+    Returns:
+        Tuple[List[str], np.ndarray]: (按正序排列的月份, 关键词×月份的搜索量矩阵，缺失值为NaN)
+    """
+    monthly_lists = [monthly_searches if isinstance(monthly_searches, list) else list(monthly_searches)
+                     for monthly_searches in monthly_lists]
+    patterns: Dict[Tuple[str, ...], List[int]] = {}
+    for row, monthly_searches in enumerate(monthly_lists):
+        patterns.setdefault(tuple([monthly.year_month for monthly in monthly_searches]), []).append(row)
+    months = sorted({month for pattern in patterns for month in pattern})
+    positions = {month: i for i, month in enumerate(months)}
+
+    values = np.array([monthly.monthly_searches for monthly_searches in monthly_lists for monthly in monthly_searches],
+                      dtype=np.float64)
+    offsets = np.zeros(len(monthly_lists) + 1, dtype=np.intp)
+    np.cumsum([len(monthly_searches) for monthly_searches in monthly_lists], out=offsets[1:])
+    matrix = np.full((len(monthly_lists), len(months)), np.nan)
+    for pattern, rows in patterns.items():
+        if pattern:
+            rows = np.array(rows)
+            matrix[rows[:, None], [positions[month] for month in pattern]] = \
+                values[offsets[rows][:, None] + np.arange(len(pattern))]
+    return months, matrix
+
+
+def stack_volume_matrices(parts: Iterable[Tuple[List[str], np.ndarray]]) -> Tuple[List[str], np.ndarray]:
+    """
+    按行拼接多批搜索量矩阵，各批的月份可能不同，按全部月份的并集对齐
+
+    Args:
+        parts: 每批的 (月份, 搜索量矩阵)
+
+    Returns:
+        Tuple[List[str], np.ndarray]: (按正序排列的月份, 拼接后的搜索量矩阵，缺失值为NaN)
+    """
+    parts = list(parts)
+    months = sorted({month for part_months, _ in parts for month in part_months})
+    positions = {month: i for i, month in enumerate(months)}
+    matrix = np.full((sum(len(part_matrix) for _, part_matrix in parts), len(months)), np.nan)
+    start = 0
+    for part_months, part_matrix in parts:
+        matrix[start:start + len(part_matrix), [positions[month] for month in part_months]] = part_matrix
+        start += len(part_matrix)
+    return months, matrix
+
+
+def _growth(base: np.ndarray, current: np.ndarray) -> np.ndarray:
+    """按 (current - base) / base * 100 计算增长率，base为0时当期大于0返回inf，否则返回0"""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        growth = (current - base) / base * 100
+    zero_base = base == 0
+    growth[zero_base] = np.where(current[zero_base] > 0, np.inf, 0.0)
+    return growth
+
+
+def _present_positions(volumes: np.ndarray):
+    """返回每行有效值的数量、第一个有效值位置和最后一个有效值位置"""
+    present = ~np.isnan(volumes)
+    counts = present.sum(axis=1)
+    m = volumes.shape[1]
+    first = np.argmax(present, axis=1)
+    last = m - 1 - np.argmax(present[:, ::-1], axis=1)
+    return present, counts, first, last
+
+
+def _nth_latest_position(present: np.ndarray, n: int) -> np.ndarray:
+    """返回每行从最新月份往前数第n个有效值的位置（n从1开始）"""
+    reversed_present = present[:, ::-1]
+    reversed_rank = np.cumsum(reversed_present, axis=1)
+    m = present.shape[1]
+    return m - 1 - np.argmax(reversed_present & (reversed_rank == n), axis=1)
+
+
+def yoy_growth(volumes: np.ndarray) -> np.ndarray:
+    """
+    计算年增长百分比（最早月份到最新月份）
+
+    Args:
+        volumes: 关键词×月份的搜索量矩阵
+
+    Returns:
+        np.ndarray: 每个关键词的增长百分比，少于2个月数据时为0
+    """
+    n = volumes.shape[0]
+    if volumes.shape[1] == 0:
+        return np.zeros(n)
+    present, counts, first, last = _present_positions(volumes)
+    rows = np.arange(n)
+    growth = _growth(volumes[rows, first], volumes[rows, last])
+    growth[counts < 2] = 0.0
+    return growth
+
+
+def recent_growth(volumes: np.ndarray) -> np.ndarray:
+    """
+    计算近三个月增长百分比（倒数第三个月到最新月份）
+
+    Args:
+        volumes: 关键词×月份的搜索量矩阵
+
+    Returns:
+        np.ndarray: 每个关键词的增长百分比，少于3个月数据时为0
+    """
+    n = volumes.shape[0]
+    if volumes.shape[1] == 0:
+        return np.zeros(n)
+    present, counts, _, last = _present_positions(volumes)
+    rows = np.arange(n)
+    third = _nth_latest_position(present, 3)
+    growth = _growth(volumes[rows, third], volumes[rows, last])
+    growth[counts < 3] = 0.0
+    return growth
+
+
+def mom_growth(volumes: np.ndarray) -> np.ndarray:
+    """
+    计算环比增长百分比矩阵
+
+    Args:
+        volumes: 关键词×月份的搜索量矩阵
+
+    Returns:
+        np.ndarray: 与volumes同形状的矩阵，第j列为第j个月相对第j-1个月的增长，
+                    第一列及任一月份缺失时为NaN
+    """
+    growth = np.full(volumes.shape, np.nan)
+    if volumes.shape[1] < 2:
+        return growth
+    growth[:, 1:] = _growth(volumes[:, :-1], volumes[:, 1:])
+    missing = np.isnan(volumes[:, :-1]) | np.isnan(volumes[:, 1:])
+    growth[:, 1:][missing] = np.nan
+    return growth
+
+
+def cagr(volumes: np.ndarray) -> np.ndarray:
+    """
+    计算年化复合增长率百分比
+
+    Args:
+        volumes: 关键词×月份的搜索量矩阵
+
+    Returns:
+        np.ndarray: 每个关键词的年化复合增长率，基期为0时当期大于0返回inf，少于2个月数据时为0
+    """
+    n = volumes.shape[0]
+    if volumes.shape[1] == 0:
+        return np.zeros(n)
+    present, counts, first, last = _present_positions(volumes)
+    rows = np.arange(n)
+    base = volumes[rows, first]
+    current = volumes[rows, last]
+    span = np.maximum(last - first, 1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rate = (np.power(current / base, 12.0 / span) - 1) * 100
+    zero_base = base == 0
+    rate[zero_base] = np.where(current[zero_base] > 0, np.inf, 0.0)
+    rate[counts < 2] = 0.0
+    return rate
+
+
+def volatility(volumes: np.ndarray) -> np.ndarray:
+    """
+    计算波动率（变异系数，标准差/均值，百分比）
+
+    Args:
+        volumes: 关键词×月份的搜索量矩阵
+
+    Returns:
+        np.ndarray: 每个关键词的波动率，均值为0或没有数据时为0
+    """
+    n = volumes.shape[0]
+    present = ~np.isnan(volumes)
+    counts = present.sum(axis=1)
+    if volumes.shape[1] == 0:
+        return np.zeros(n)
+    filled = np.where(present, volumes, 0.0)
+    safe_counts = np.maximum(counts, 1)
+    mean = filled.sum(axis=1) / safe_counts
+    variance = (np.where(present, volumes - mean[:, None], 0.0) ** 2).sum(axis=1) / safe_counts
+    with np.errstate(divide='ignore', invalid='ignore'):
+        result = np.sqrt(variance) / mean * 100
+    result[(mean == 0) | (counts == 0)] = 0.0
+    return result
+
+
+def seasonality_index(volumes: np.ndarray) -> np.ndarray:
+    """
+    计算季节性指数矩阵（每月搜索量 / 该关键词的月均搜索量）
+
+    Args:
+        volumes: 关键词×月份的搜索量矩阵
+
+    Returns:
+        np.ndarray: 与volumes同形状的矩阵，1表示与月均持平，均值为0时为0，缺失月份为NaN
+    """
+    present = ~np.isnan(volumes)
+    counts = np.maximum(present.sum(axis=1), 1)
+    mean = np.where(present, volumes, 0.0).sum(axis=1) / counts
+    with np.errstate(divide='ignore', invalid='ignore'):
+        index = volumes / mean[:, None]
+    index[(mean == 0)[:, None] & present] = 0.0
+    return index
+
+
+def seasonality_strength(volumes: np.ndarray) -> np.ndarray:
+    """
+    计算季节性强度（季节性指数的最大值减最小值），0表示完全没有季节性
+
+    Args:
+        volumes: 关键词×月份的搜索量矩阵
+
+    Returns:
+        np.ndarray: 每个关键词的季节性强度
+    """
+    if volumes.shape[1] == 0:
+        return np.zeros(volumes.shape[0])
+    index = seasonality_index(volumes)
+    present = ~np.isnan(index)
+    highest = np.where(present, index, -np.inf).max(axis=1)
+    lowest = np.where(present, index, np.inf).min(axis=1)
+    strength = highest - lowest
+    strength[~present.any(axis=1)] = 0.0
+    return strength
+
+
+def compute_trend_metrics(volumes: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    一次性计算全部趋势指标
+
+    Args:
+        volumes: 关键词×月份的搜索量矩阵
+
+    Returns:
+        Dict[str, np.ndarray]: 指标名称到结果的映射
+    """
+    return {
+        'growth_percentage': yoy_growth(volumes),
+        'recent_growth_percentage': recent_growth(volumes),
+        'mom_growth': mom_growth(volumes),
+        'cagr': cagr(volumes),
+        'volatility': volatility(volumes),
+        'seasonality_index': seasonality_index(volumes),
+        'seasonality_strength': seasonality_strength(volumes),
+    }
+
+
+def run_benchmark(counts=(10_000, 100_000), months: int = 12) -> None:
+    """
+    对比逐个关键词计算与批量计算增长率的耗时，并校验两者结果一致
+
+    Args:
+        counts: 关键词数量列表
+        months: 月份数量
+    """
+    import time
+
+    from keyword_ideas_service import KeywordIdeasService, MonthlySearchVolume
+
+    rng = np.random.default_rng(0)
+    month_labels = [f"{2024 + (i // 12)}-{(i % 12) + 1:02d}" for i in range(months)]
+
+    for count in counts:
+        data = rng.integers(0, 1000, size=(count, months)).astype(np.float64)
+        # 加入一些0值以覆盖inf的情况
+        data[rng.random(data.shape) < 0.05] = 0
+        monthly_lists = [
+            [MonthlySearchVolume(year_month=month, monthly_searches=int(volume))
+             for month, volume in zip(month_labels, row)]
+            for row in data
+        ]
+
+        start = time.perf_counter()
+        loop_growth = [KeywordIdeasService.calculate_growth_percentage(None, ms) for ms in monthly_lists]
+        loop_recent = [KeywordIdeasService.calculate_recent_growth_percentage(None, ms) for ms in monthly_lists]
+        loop_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        _, matrix = volumes_matrix(monthly_lists)
+        build_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        vector_growth = yoy_growth(matrix)
+        vector_recent = recent_growth(matrix)
+        growth_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        compute_trend_metrics(matrix)
+        vector_time = time.perf_counter() - start
+
+        assert np.array_equal(np.asarray(loop_growth), vector_growth)
+        assert np.array_equal(np.asarray(loop_recent), vector_recent)
+
+        print(f"{count:,} 个关键词 × {months} 个月")
+        print(f"  逐个计算（年增长+近三月）: {loop_time * 1000:9.1f} ms")
+        print(f"  构建矩阵:                   {build_time * 1000:9.1f} ms")
+        print(f"  批量计算（年增长+近三月）: {growth_time * 1000:9.1f} ms")
+        print(f"  批量计算（全部指标）:       {vector_time * 1000:9.1f} ms")
+
+
+if __name__ == "__main__":
+    run_benchmark()
@@ -0,0 +1,341 @@
+"""
+关键词近似变体的规范化与聚类
+
+关键词创意中有大量几乎相同的关键词（单复数、词序不同、标点不同、拼写略有差异），
+它们的历史指标和KGR几乎相同，逐个请求浪费API配额和抓取次数。KeywordClusterer 把这些变体归为一组：
+
+    - 词元集合规范化：转为小写、去掉标点、把复数还原为单数，再对去重后的词元排序，
+      "Python Tutorials"、"tutorial python"、"python-tutorial" 的规范化形式都是 "python tutorial"，
+      规范化形式相同的关键词直接归入同一组
+    - MinHash/LSH：规范化形式不同的关键词按去掉空格后的字符三元组计算MinHash签名，签名分段（band）后放入哈希桶，
+      只有落入同一个桶的关键词才计算Jaccard相似度，相似度达到阈值时归入同一组（"wordpress theme" 与
+      "word press themes"、"learn python onlin" 与 "learn python online"）；
+      包含的数字不同（"iphone 14 case" 与 "iphone 15 case"）、去掉s后意思不同（"news app" 与 "new app"）
+      或多出修饰词（"best python course" 与 "python course"）的关键词搜索意图不同，不会合并
+
+每组的第一个关键词作为代表，只有代表需要请求历史指标和计算KGR。每组汇总各变体在关键词创意结果中的搜索量：
+规范化形式相同的变体按最大值计（Google对近似变体合并统计搜索量，相加会重复计算），其余变体相加。
+
+运行本模块可模拟一组带变体的关键词创意，对比聚类前后需要请求的关键词数量和聚类耗时：
+
+    python keyword_clusters.py [关键词数量]
+"""
+import re
+import zlib
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from keyword_index import normalize_keyword
+
+# 判断为近似变体的字符三元组Jaccard相似度阈值
+DEFAULT_THRESHOLD = 0.75
+# MinHash签名长度，按BAND_COUNT段分桶，每段NUM_PERM / BAND_COUNT个值
+NUM_PERM = 32
+BAND_COUNT = 8
+# 近似变体的字符三元组数量最多相差的个数（约等于去掉空格后的长度差），超过时视为多了修饰词
+MAX_LENGTH_DIFFERENCE = 2
+# 每个哈希桶中最多比较的关键词数量，避免常见片段形成的大桶使比较次数变为平方级
+MAX_BUCKET_CANDIDATES = 8
+# MinHash使用的梅森素数，哈希值和系数都小于它，乘积不会超出uint64
+_MERSENNE_PRIME = (1 << 31) - 1
+
+# 以s结尾但去掉s后意思不同（或不是复数）的词，单数化时原样保留
+# （"news app" 与 "new app"、"windows 10" 与 "window 10"、"glasses" 与 "glass" 搜索意图不同）
+SINGULAR_EXCEPTIONS = frozenset({
+    'news', 'windows', 'ios', 'macos', 'series', 'species', 'sales', 'goods', 'means', 'thanks', 'arms',
+    'customs', 'premises', 'glasses', 'shorts', 'pants', 'jeans', 'clothes', 'lens', 'canvas', 'atlas',
+    'bias', 'alias', 'christmas', 'texas', 'vegas', 'kansas', 'arkansas', 'dallas', 'wales', 'athens',
+    'mars', 'physics', 'economics', 'mathematics', 'politics', 'ethics',
+})
+
+_PUNCTUATION = re.compile(r"[^\w]+")
+_APOSTROPHES = re.compile(r"['’]")
+_NUMBER = re.compile(r"\S*\d\S*")
+
+
+def singularize(token: str) -> str:
+    """
+    把英文复数词元还原为单数的规范形式，只处理常见的规则变化
+
+    规范形式只用于比较，单复数得到相同的结果即可，不一定是正确的单词：
+    以ie和y结尾的词都规范为y（"movie"、"movies" 都是 "movy"），
+    以use和uses结尾的词都规范为us（"bus"、"buses" 都是 "bus"，"house"、"houses" 都是 "hous"）。
+
+    Args:
+        token: 小写词元
+
+    Returns:
+        str: 单数的规范形式，无法判断时原样返回
+    """
+    if len(token) <= 3 or not token.isalpha() or token in SINGULAR_EXCEPTIONS:
+        return token
+    if token.endswith('ies') and len(token) > 4:
+        return token[:-3] + 'y'
+    if token.endswith('ie'):
+        return token[:-2] + 'y'
+    if len(token) > 4 and token.endswith(('uses', 'use')):
+        return token[:token.rindex('us') + 2]
+    if token.endswith(('sses', 'ches', 'shes', 'xes', 'zes')):
+        return token[:-2]
+    if token.endswith('s') and not token.endswith(('ss', 'us', 'is')):
+        return token[:-1]
+    return token
+
+
+def keyword_tokens(keyword: str) -> List[str]:
+    """关键词的词元：小写、去标点，复数还原为单数，保持原有顺序"""
+    text = _PUNCTUATION.sub(' ', _APOSTROPHES.sub('', keyword.lower()))
+    return [singularize(token) for token in text.split()]
+
+
+def canonical_key(keyword: str) -> str:
+    """
+    词元集合规范化：小写、去标点、复数还原为单数，词元去重后排序
+
+    Args:
+        keyword: 关键词
+
+    Returns:
+        str: 规范化形式，没有任何字母或数字时返回规范化的原关键词
+    """
+    tokens = sorted(set(keyword_tokens(keyword)))
+    return " ".join(tokens) if tokens else normalize_keyword(keyword)
+
+
+def shingles(keyword: str) -> List[str]:
+    """
+    关键词去掉空格后的字符三元组，拆分或连写的同一个词（"word press" 与 "wordpress"）得到相同的结果
+
+    Args:
+        keyword: 关键词
+
+    Returns:
+        List[str]: 不重复的字符三元组，首尾补空格，短关键词也至少有一个
+    """
+    padded = f" {''.join(keyword_tokens(keyword)) or normalize_keyword(keyword)} "
+    return list({padded[i:i + 3] for i in range(len(padded) - 2)})
+
+
+@dataclass
+class KeywordCluster:
+    """一组近似变体"""
+    representative: str
+    # 规范化形式 -> {关键词: 关键词创意结果中的月均搜索量}
+    variants: Dict[str, Dict[str, int]] = field(default_factory=dict)
+
+    @property
+    def members(self) -> List[str]:
+        """全部变体，代表排在最前"""
+        return [keyword for group in self.variants.values() for keyword in group]
+
+    @property
+    def size(self) -> int:
+        return sum(len(group) for group in self.variants.values())
+
+    @property
+    def total_volume(self) -> int:
+        """汇总的月均搜索量：规范化形式相同的变体取最大值，不同的相加"""
+        return sum(max(group.values()) for group in self.variants.values())
+
+
+class KeywordClusterer:
+    """增量地把关键词归入近似变体组，只有每组的代表需要请求指标"""
+
+    def __init__(self, threshold: float = DEFAULT_THRESHOLD, num_perm: int = NUM_PERM,
+                 band_count: int = BAND_COUNT, seed: int = 1):
+        """
+        Args:
+            threshold: 判断为近似变体的Jaccard相似度阈值，大于1时只合并规范化形式相同的关键词
+            num_perm: MinHash签名长度
+            band_count: LSH分段数量，必须整除num_perm；段越多越容易成为候选，比较次数也越多
+            seed: 生成MinHash哈希函数的随机种子
+
+        Raises:
+            ValueError: 参数无效
+        """
+        if num_perm <= 0 or band_count <= 0 or num_perm % band_count:
+            raise ValueError("band_count必须为正数且整除num_perm")
+        self.threshold = threshold
+        self.band_count = band_count
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, _MERSENNE_PRIME, size=(num_perm, 1), dtype=np.uint64)
+        self._b = rng.integers(0, _MERSENNE_PRIME, size=(num_perm, 1), dtype=np.uint64)
+        # 把一段签名合并为一个桶键的系数
+        self._band_weights = rng.integers(1, 1 << 61, size=num_perm // band_count, dtype=np.uint64)
+        self.clusters: List[KeywordCluster] = []
+        # 规范化关键词 -> 所属组，规范化形式 -> 所属组
+        self._by_keyword: Dict[str, KeywordCluster] = {}
+        self._by_key: Dict[str, KeywordCluster] = {}
+        # (段序号, 桶键) -> 落入该桶的规范化形式
+        self._buckets: Dict[tuple, List[str]] = {}
+        # 规范化形式 -> (字符三元组集合, 包含的数字, 字符三元组数量)
+        self._features: Dict[str, tuple] = {}
+
+    def __len__(self) -> int:
+        """已加入的关键词数量"""
+        return len(self._by_keyword)
+
+    def add_batch(self, keywords: Sequence[str], volumes: Optional[Sequence[int]] = None) -> List[str]:
+        """
+        加入一批关键词
+
+        Args:
+            keywords: 关键词
+            volumes: 对应的月均搜索量（关键词创意结果中的值），用于汇总和选择代表，可选
+
+        Returns:
+            List[str]: 成为新组代表的关键词，即需要请求指标的关键词，按输入顺序排列
+        """
+        volumes = list(volumes) if volumes is not None else [0] * len(keywords)
+        # 搜索量高的变体优先成为代表
+        entries = sorted(zip(keywords, volumes), key=lambda entry: -entry[1])
+        pending: Dict[str, List[tuple]] = {}
+        for keyword, volume in entries:
+            if normalize_keyword(keyword) in self._by_keyword:
+                continue
+            key = canonical_key(keyword)
+            cluster = self._by_key.get(key)
+            if cluster is not None:
+                self._add_member(cluster, key, keyword, volume)
+            else:
+                pending.setdefault(key, []).append((keyword, volume))
+
+        representatives = set()
+        if pending:
+            keys = list(pending)
+            # 每个规范化形式以搜索量最高的关键词计算签名
+            for key, band_keys in zip(keys, self._band_keys(keys, [pending[key][0][0] for key in keys])):
+                cluster = self._find_similar(key, band_keys)
+                if cluster is None:
+                    cluster = KeywordCluster(pending[key][0][0])
+                    self.clusters.append(cluster)
+                    representatives.add(cluster.representative)
+                self._by_key[key] = cluster
+                for band in enumerate(band_keys):
+                    self._buckets.setdefault(band, []).append(key)
+                for keyword, volume in pending[key]:
+                    self._add_member(cluster, key, keyword, volume)
+        return [keyword for keyword in keywords if keyword in representatives]
+
+    def cluster_of(self, keyword: str) -> Optional[KeywordCluster]:
+        """关键词所属的组，未加入时返回None"""
+        return self._by_keyword.get(normalize_keyword(keyword))
+
+    def stats(self) -> Dict:
+        """
+        获取聚类统计
+
+        Returns:
+            Dict: keywords（关键词数）、clusters（组数）、merged（被合并而无需请求的关键词数）
+        """
+        return {'keywords': len(self), 'clusters': len(self.clusters), 'merged': len(self) - len(self.clusters)}
+
+    def _add_member(self, cluster: KeywordCluster, key: str, keyword: str, volume: int) -> None:
+        cluster.variants.setdefault(key, {})[keyword] = volume
+        self._by_keyword[normalize_keyword(keyword)] = cluster
+
+    def _band_keys(self, keys: List[str], keywords: List[str]) -> List[List[int]]:
+        """批量计算MinHash签名，返回每个规范化形式各段的桶键"""
+        key_shingles = [shingles(keyword) for keyword in keywords]
+        lengths = [len(grams) for grams in key_shingles]
+        hashes = np.fromiter((zlib.crc32(gram.encode()) for grams in key_shingles for gram in grams),
+                             dtype=np.uint64, count=sum(lengths))
+        hashed = (self._a * (hashes % np.uint64(_MERSENNE_PRIME)) + self._b) % np.uint64(_MERSENNE_PRIME)
+        starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+        signatures = np.minimum.reduceat(hashed, starts, axis=1).T
+        rows = signatures.shape[1] // self.band_count
+        bands = signatures.reshape(len(keys), self.band_count, rows)
+        # 溢出按2^64取模，只用作桶键
+        with np.errstate(over='ignore'):
+            band_keys = (bands * self._band_weights).sum(axis=2, dtype=np.uint64)
+        for key, grams in zip(keys, key_shingles):
+            # 数字和单数化例外词必须完全相同，"windows 10 download" 不会因字符相似与 "window 10 download" 合并
+            protected = [token for token in key.split() if token in SINGULAR_EXCEPTIONS or _NUMBER.fullmatch(token)]
+            self._features[key] = (set(grams), protected, len(grams))
+        return band_keys.tolist()
+
+    def _find_similar(self, key: str, band_keys: List[int]) -> Optional[KeywordCluster]:
+        """在同桶的规范化形式中找出相似度最高且达到阈值的组"""
+        grams, protected, length = self._features[key]
+        best, best_similarity = None, self.threshold
+        checked = set()
+        for band in enumerate(band_keys):
+            for candidate in self._buckets.get(band, ())[:MAX_BUCKET_CANDIDATES]:
+                if candidate in checked:
+                    continue
+                checked.add(candidate)
+                other, other_protected, other_length = self._features[candidate]
+                if other_protected != protected or abs(other_length - length) > MAX_LENGTH_DIFFERENCE:
+                    continue
+                similarity = len(grams & other) / len(grams | other)
+                if similarity >= best_similarity:
+                    best, best_similarity = self._by_key[candidate], similarity
+        return best
+
+
+def run_benchmark(count: int = 20_000) -> None:
+    """
+    模拟带近似变体的关键词创意，对比聚类前后需要请求指标的关键词数量
+
+    Args:
+        count: 关键词数量
+    """
+    import random
+    import time
+
+    rng = random.Random(0)
+    words = [f"{rng.choice('bcdfghklmnprstvw')}{rng.choice('aeiou')}{rng.choice('bcdfghklmnprstvw')}"
+             f"{rng.choice('aeiou')}{rng.choice('bcdfghklmnprstvw')}{rng.choice(['', 'er', 'ing', 'ion'])}"
+             for _ in range(3_000)]
+    modifiers = ["best", "free", "online", "how to", "for beginners", "near me", "2024", "cheap", "review"]
+
+    def variant(phrase: List[str]) -> str:
+        # 复数、词序、标点和大小写变化
+        tokens = [token + 's' if rng.random() < 0.3 else token for token in phrase]
+        if rng.random() < 0.3:
+            rng.shuffle(tokens)
+        text = rng.choice([" ", "-", " "]).join(tokens)
+        return text.title() if rng.random() < 0.1 else text
+
+    keywords = []
+    while len(keywords) < count:
+        phrase = [rng.choice(words) for _ in range(rng.randint(1, 3))]
+        if rng.random() < 0.5:
+            phrase.insert(0, rng.choice(modifiers))
+        keywords.extend(variant(phrase) for _ in range(rng.randint(1, 4)))
+    keywords = list(dict.fromkeys(keywords[:count]))
+    volumes = [rng.randint(10, 10_000) for _ in keywords]
+
+    # 常见的真实变体：前四组应合并，后三组搜索意图不同，不应合并
+    pairs = [("movie", "movies"), ("horror movie", "horror movies"), ("cookie recipe", "cookies recipe"),
+             ("bus schedule", "buses schedule"), ("news app", "new app"), ("windows 10", "window 10"),
+             ("best python course", "python course")]
+    keywords += [keyword for pair in pairs for keyword in pair]
+    volumes += [rng.randint(10, 10_000) for _ in range(2 * len(pairs))]
+
+    clusterer = KeywordClusterer()
+    start = time.perf_counter()
+    representatives = []
+    for i in range(0, len(keywords), 1_000):
+        # 按关键词创意的分页逐批加入
+        representatives += clusterer.add_batch(keywords[i:i + 1_000], volumes[i:i + 1_000])
+    elapsed = time.perf_counter() - start
+
+    exact = len({canonical_key(keyword) for keyword in keywords})
+    stats = clusterer.stats()
+    largest = max(clusterer.clusters, key=lambda cluster: cluster.size)
+    print(f"{len(keywords):,} 个关键词（去除大小写和空白重复后）")
+    print(f"  规范化后: {exact:,} 个，聚类后: {stats['clusters']:,} 组，需要请求指标 {len(representatives):,} 个")
+    print(f"  减少请求: {stats['merged'] / len(keywords):.1%}，聚类耗时 {elapsed * 1000:.1f} ms")
+    print(f"  最大的组: {largest.members[:6]}，汇总搜索量 {largest.total_volume:,}")
+    for first, second in pairs:
+        merged = clusterer.cluster_of(first) is clusterer.cluster_of(second)
+        print(f"  {first!r} 与 {second!r}: {'合并' if merged else '不合并'}")
+
+
+if __name__ == "__main__":
+    import sys
+
+    run_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 20_000)
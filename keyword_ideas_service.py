@@ -1,8 +1,31 @@
-from dataclasses import dataclass
-from typing import List, Optional, Dict
-from google.ads.googleads.client import GoogleAdsClient
-from google.ads.googleads.errors import GoogleAdsException
+"""
+Google Ads关键词创意服务：读取关键词创意，分块并发请求历史指标
+
+运行本模块可在注入延迟的API替身（ads_stub）上演示分块、并发请求和失败分块的重试（无需凭据和网络）：
+
+    python keyword_ideas_service.py [关键词数量]
+
+使用真实凭据请求关键词创意的示例（需先填写示例中的配置）：
+
+    python keyword_ideas_service.py --example
+"""
+import math
+import threading
+from dataclasses import dataclass, replace
+from typing import Callable, Iterator, List, Optional, Dict, Tuple
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED
 from datetime import datetime, timedelta
+from keyword_index import KeywordIndex, normalize_keyword
+from ads_client_pool import SHARED_CLIENT_POOL, login_customer_metadata
+from single_flight import SingleFlight
+from request_scheduler import KeywordFailure, MetricsResult, get_scheduler
+
+# 单个历史指标请求的默认关键词数量（API上限为10000）
+DEFAULT_BATCH_SIZE = 1000
+# 并发请求的默认线程数
+DEFAULT_MAX_WORKERS = 4
+# 暂时性错误（限流、服务不可用等）的默认重试次数
+DEFAULT_MAX_RETRIES = 4
 
 @dataclass
 class MonthlySearchVolume:
@@ -23,19 +46,102 @@ class KeywordIdea:
     growth_percentage: float  # 年增长百分比
     recent_growth_percentage: float  # 近三个月增长百分比
 
+class KeywordIdeaBatch(list):
+    """
+    一批关键词创意，附带构建时算出的整批搜索量矩阵
+
+    保存、趋势序列和列式表都可以直接使用 (months, volumes)，同一批结果不再重复解析月度数据。
+    """
+
+    def __init__(self, ideas: List[KeywordIdea] = (), months: Optional[List[str]] = None, volumes=None):
+        """
+        Args:
+            ideas: 关键词创意
+            months: 按正序排列的月份
+            volumes: 关键词×月份的搜索量矩阵（np.ndarray），行与ideas一一对应，缺失值为NaN
+        """
+        super().__init__(ideas)
+        self.months = months
+        self.volumes = volumes
+
+    @property
+    def matrix(self) -> Tuple[List[str], object]:
+        """(月份, 搜索量矩阵)"""
+        return self.months, self.volumes
+
+    def subset(self, ideas: List[KeywordIdea]) -> 'KeywordIdeaBatch':
+        """
+        取出本批中的部分关键词创意，矩阵只保留对应的行
+
+        Args:
+            ideas: 本批中的关键词创意（同一对象），保持本批中的顺序
+
+        Returns:
+            KeywordIdeaBatch: 子批次
+        """
+        kept = {id(idea) for idea in ideas}
+        rows = [row for row, idea in enumerate(self) if id(idea) in kept]
+        return KeywordIdeaBatch([self[row] for row in rows], self.months, self.volumes[rows])
+
+    @classmethod
+    def concat(cls, batches: List['KeywordIdeaBatch']) -> 'KeywordIdeaBatch':
+        """
+        按顺序合并多批关键词创意，矩阵按月份的并集对齐
+
+        Args:
+            batches: 关键词创意批次
+
+        Returns:
+            KeywordIdeaBatch: 合并后的批次
+        """
+        if len(batches) == 1:
+            return batches[0]
+        from keyword_analytics import stack_volume_matrices
+
+        months, volumes = stack_volume_matrices(batch.matrix for batch in batches)
+        return cls([idea for batch in batches for idea in batch], months, volumes)
+
 class KeywordIdeasService:
     """Google Ads关键词创意服务"""
     
-    def __init__(self, config_dict: Dict):
+    def __init__(self, config_dict: Dict, batch_size: int = DEFAULT_BATCH_SIZE,
+                 max_workers: int = DEFAULT_MAX_WORKERS, max_retries: int = DEFAULT_MAX_RETRIES,
+                 cache=None, client_pool=None, scheduler=None, store=None):
         """
         初始化服务
         
         Args:
             config_dict: Google Ads API配置字典，包含必要的认证信息
+            batch_size: 每个历史指标请求包含的关键词数量
+            max_workers: 并发请求的最大线程数
+            max_retries: 暂时性错误的最大重试次数
+            cache: 可选的历史指标缓存（如cache.KeywordMetricsCache），只有未命中的关键词才会请求API
+            client_pool: 客户端池（ads_client_pool.AdsClientPool），默认使用进程内共享的池
+            scheduler: 请求调度器（request_scheduler.RequestScheduler），默认使用开发者令牌对应的共享调度器
+            store: 可选的本地关键词库（keyword_store.KeywordStore），配置后以增量刷新代替cache：
+                   数据已是最新的关键词不再请求，数据落后的关键词只请求缺少的月份
         """
+        if batch_size <= 0:
+            raise ValueError("batch_size必须大于0")
+        if max_workers <= 0:
+            raise ValueError("max_workers必须大于0")
+            
         self.client = None
         self.customer_id = None
+        self.client_pool = client_pool or SHARED_CLIENT_POOL
+        # 在途的历史指标请求，键为 (规范化关键词, 语言ID)，并发请求同一关键词时只请求一次
+        self.inflight = SingleFlight()
+        self.batch_size = batch_size
+        self.max_workers = max_workers
+        self.max_retries = max(0, max_retries)
+        self.cache = cache
+        self.store = store
+        # 增量刷新的统计
+        self.refresh_counts = {'fresh': 0, 'incremental': 0, 'full': 0, 'api_calls': 0, 'baseline_calls': 0}
+        self.refresh_lock = threading.Lock()
         self.initialize_client(config_dict)
+        # 同一开发者令牌共用配额，并发控制和重试在该令牌的所有服务实例间共享
+        self.scheduler = scheduler or get_scheduler(config_dict['developer_token'])
     
     def initialize_client(self, config_dict: Dict) -> None:
         """
@@ -67,77 +173,301 @@ class KeywordIdeasService:
             raise ValueError(f"配置信息不完整，缺少以下字段: {', '.join(missing_keys)}")
             
         try:
-            # 添加use_proto_plus配置
-            config = dict(config_dict)
-            config['use_proto_plus'] = True
-            
-            self.client = GoogleAdsClient.load_from_dict(config)
-            self.customer_id = config['login_customer_id']
-                
+            self.customer_id = config_dict['login_customer_id']
             if not self.customer_id:
                 raise ValueError("配置中未找到login_customer_id")
                 
+            # 相同凭据的服务实例共用客户端、服务客户端和gRPC通道，login_customer_id随每次请求发送
+            self.client_config = dict(config_dict)
+            self.client = self.client_pool.get_client(self.client_config)
+            self.request_metadata = login_customer_metadata(self.customer_id)
+            self.keyword_plan_idea_service = self.client_pool.get_service(self.client_config, "KeywordPlanIdeaService")
+            self.googleads_service = self.client_pool.get_service(self.client_config, "GoogleAdsService")
+            self.search_network = self.client.enums.KeywordPlanNetworkEnum.GOOGLE_SEARCH
+                
         except Exception as e:
             raise Exception(f"初始化Google Ads客户端失败: {str(e)}")
     
+    def split_into_chunks(self, keywords: List[str]) -> List[List[str]]:
+        """
+        按batch_size将关键词列表切分为多个分块
+        
+        Args:
+            keywords: 关键词列表
+            
+        Returns:
+            List[List[str]]: 关键词分块列表
+        """
+        return [keywords[i:i + self.batch_size] for i in range(0, len(keywords), self.batch_size)]
+    
+    def build_metrics_entry(self, result) -> Dict:
+        """
+        将单个历史指标结果转换为metrics_map中的条目
+        
+        Args:
+            result: GenerateKeywordHistoricalMetricsResult对象
+            
+        Returns:
+            Dict: 包含月度搜索量和其他指标的字典
+        """
+        metrics = result.keyword_metrics
+        return {
+            'keyword': result.text,
+            'monthly_searches': [
+                MonthlySearchVolume(
+                    year_month = f"{point.year}-{(point.month-1):02d}",
+                    monthly_searches=point.monthly_searches
+                ) for point in metrics.monthly_search_volumes
+            ],
+            'avg_monthly_searches': metrics.avg_monthly_searches,
+            'competition': metrics.competition.name,
+            'competition_index': metrics.competition_index,
+            'low_cpc': metrics.low_top_of_page_bid_micros / 1_000_000,
+            'high_cpc': metrics.high_top_of_page_bid_micros / 1_000_000
+        }
+    
+    def fetch_metrics_chunk(self, keywords: List[str], language_id: str = "1000",
+                            month_range: Optional[Tuple[str, str]] = None) -> Dict[str, Dict]:
+        """
+        发送单个历史指标请求
+        
+        Args:
+            keywords: 关键词分块
+            language_id: 语言ID，默认为1000（英语）
+            month_range: 可选的 (起始月份, 结束月份)，格式为 YYYY-MM，默认请求API默认的最近12个月
+            
+        Returns:
+            Dict[str, Dict]: 该分块的关键词到历史指标的映射
+            
+        Raises:
+            GoogleAdsException: API调用错误
+        """
+        request = self.client_pool.new_request(self.client_config, "GenerateKeywordHistoricalMetricsRequest")
+        request.customer_id = self.customer_id
+        request.keywords.extend(keywords)
+        request.language = self.googleads_service.language_constant_path(language_id)
+        request.keyword_plan_network = self.search_network
+        if month_range:
+            year_month_range = request.historical_metrics_options.year_month_range
+            for point, year_month in zip((year_month_range.start, year_month_range.end), month_range):
+                year, month = map(int, year_month.split('-'))
+                point.year = year
+                point.month = month + 1  # MonthOfYear枚举值为月份加1
+        
+        response = self.keyword_plan_idea_service.generate_keyword_historical_metrics(
+            request=request, metadata=self.request_metadata
+        )
+        
+        # 创建关键词到指标的映射
+        return {result.text: self.build_metrics_entry(result) for result in response.results}
+    
+    def log_request_error(self, error: Exception) -> None:
+        """
+        打印请求失败的详细信息
+        
+        Args:
+            error: 请求抛出的异常
+        """
+        from google.ads.googleads.errors import GoogleAdsException
+
+        if not isinstance(error, GoogleAdsException):
+            print(f"请求失败: {str(error)}")
+            return
+            
+        print(
+            f'Request with ID "{error.request_id}" failed with status '
+            f'"{error.error.code().name}" and includes the following errors:'
+        )
+        for err in error.failure.errors:
+            print(f'\tError with message "{err.message}".')
+            if err.location:
+                for field_path_element in err.location.field_path_elements:
+                    print(f"\t\tOn field: {field_path_element.field_name}")
+    
     def get_historical_metrics_batch(self, keywords: List[str], language_id: str = "1000") -> Dict[str, Dict]:
         """
         批量获取关键词的历史指标数据
         
+        配置了缓存时先查询缓存，只有未命中的关键词才会请求API，请求结果会写回缓存。
+        配置了关键词库时改为增量刷新：数据已是最新的关键词直接使用，数据落后的关键词只请求缺少的月份。
+        其他线程正在请求的关键词不会重复请求，而是等待那次请求的结果。
+        
         Args:
             keywords: 关键词列表
             language_id: 语言ID，默认为1000（英语）
             
         Returns:
-            Dict[str, Dict]: 关键词到历史指标的映射，包含月度搜索量和其他指标
+            MetricsResult: 关键词到历史指标的映射，包含月度搜索量和其他指标；
+                           最终获取失败的关键词记录在failures中
         """
         if not keywords:
-            return {}
+            return MetricsResult()
+            
+        plan = self.store.plan_refresh(keywords, language_id) if self.store is not None else None
+        if plan is not None:
+            metrics_map = MetricsResult(plan.fresh)
+        else:
+            metrics_map = MetricsResult(self.cache.get_many(keywords, language_id) if self.cache else {})
+        known = {normalize_keyword(text) for text in metrics_map}
+        missing_keywords = {}
+        for keyword in keywords:
+            key = normalize_keyword(keyword)
+            if key not in known:
+                missing_keywords.setdefault((key, language_id), keyword)
+        if plan is not None:
+            with self.refresh_lock:
+                self.refresh_counts['fresh'] += len(plan.fresh)
+                self.refresh_counts['baseline_calls'] += math.ceil((len(known) + len(missing_keywords)) / self.batch_size)
+        if not missing_keywords:
+            return metrics_map
             
+        owned, waiting = self.inflight.claim(missing_keywords)
         try:
-            keyword_plan_idea_service = self.client.get_service("KeywordPlanIdeaService")
-            googleads_service = self.client.get_service("GoogleAdsService")
-            
-            request = self.client.get_type("GenerateKeywordHistoricalMetricsRequest")
-            request.customer_id = self.customer_id
-            request.keywords.extend(keywords)
-            request.language = googleads_service.language_constant_path(language_id)
-            request.keyword_plan_network = self.client.enums.KeywordPlanNetworkEnum.GOOGLE_SEARCH
-            
-            response = keyword_plan_idea_service.generate_keyword_historical_metrics(request=request)
-            
-            # 创建关键词到指标的映射
-            metrics_map = {}
-            for result in response.results:
-                metrics = result.keyword_metrics
-                metrics_map[result.text] = {
-                    'keyword': result.text,
-                    'monthly_searches': [
-                        MonthlySearchVolume(
-                            year_month = f"{point.year}-{(point.month-1):02d}",
-                            monthly_searches=point.monthly_searches
-                        ) for point in metrics.monthly_search_volumes
-                    ],
-                    'avg_monthly_searches': metrics.avg_monthly_searches,
-                    'competition': metrics.competition.name,
-                    'competition_index': metrics.competition_index,
-                    'low_cpc': metrics.low_top_of_page_bid_micros / 1_000_000,
-                    'high_cpc': metrics.high_top_of_page_bid_micros / 1_000_000
-                }
+            owned_keywords = [missing_keywords[key] for key in owned]
+            if plan is not None:
+                fetched = self.fetch_metrics_incrementally(owned_keywords, language_id, plan)
+            else:
+                fetched = self.fetch_metrics_concurrently(owned_keywords, language_id)
+                if self.cache:
+                    self.cache.put_many(fetched, language_id)
+        except BaseException as e:
+            self.inflight.fail(owned, e)
+            raise
+            
+        # 先交付自己负责的结果再等待其他请求，多个线程互相等待时不会死锁，失败的关键词交付对应的KeywordFailure
+        results = {(normalize_keyword(keyword), language_id): failure
+                   for failure in fetched.failures for keyword in failure.keywords}
+        results.update(((normalize_keyword(text), language_id), metrics) for text, metrics in fetched.items())
+        self.inflight.resolve(owned, results)
+        metrics_map.update(fetched)
+        metrics_map.failures.extend(fetched.failures)
+        
+        shared_failures = {}
+        for key, future in waiting.items():
+            result = future.result()
+            if isinstance(result, KeywordFailure):
+                shared_failures.setdefault(id(result), (result, []))[1].append(missing_keywords[key])
+            elif result is not None:
+                metrics_map[result['keyword']] = result
+        metrics_map.failures.extend(replace(failure, keywords=failed) for failure, failed in shared_failures.values())
+                
+        return metrics_map
+        
+    def dedup_stats(self, since: Optional[Dict] = None) -> Dict:
+        """
+        获取重复请求合并的统计，计数覆盖服务的整个生命周期
+        
+        Args:
+            since: 之前调用本方法得到的快照，提供时只统计快照之后的请求（如单次搜索）
+        
+        Returns:
+            Dict: requested（请求API前登记的关键词数）、coalesced（等待在途请求而未重复请求的关键词数）、
+                  coalesce_rate（合并比例）、inflight（当前在途的关键词数）
+        """
+        stats = self.inflight.stats()
+        if since:
+            stats['requested'] -= since['requested']
+            stats['coalesced'] -= since['coalesced']
+            stats['coalesce_rate'] = stats['coalesced'] / stats['requested'] if stats['requested'] else 0.0
+        return stats
+    
+    def refresh_stats(self, since: Optional[Dict] = None) -> Dict:
+        """
+        获取增量刷新的统计，只统计配置了关键词库时的请求，计数覆盖服务的整个生命周期
+        
+        Args:
+            since: 之前调用本方法得到的快照，提供时只统计快照之后的请求（如单次搜索）
+        
+        Returns:
+            Dict: fresh（直接使用本地数据的关键词数）、incremental（只请求缺少月份的关键词数）、
+                  full（请求完整历史的关键词数）、api_calls（实际的请求次数，不含重试）、
+                  baseline_calls（全部重新请求所需的次数）、api_calls_avoided（节省的请求次数）
+        """
+        with self.refresh_lock:
+            stats = dict(self.refresh_counts)
+        if since:
+            for key in self.refresh_counts:
+                stats[key] -= since[key]
+        stats['api_calls_avoided'] = max(0, stats['baseline_calls'] - stats['api_calls'])
+        return stats
+    
+    def fetch_metrics_incrementally(self, keywords: List[str], language_id: str, plan) -> MetricsResult:
+        """
+        按刷新计划请求历史指标，并把结果合并后写回关键词库
+        
+        数据落后的关键词按缺少的起始月份分组，每组只请求缺少的月份；没有数据的关键词请求完整历史。
+        API没有返回数据或请求失败的落后关键词沿用已保存的数据，请求失败的同时记录在failures中。
+        
+        Args:
+            keywords: 需要请求的关键词列表
+            language_id: 语言ID
+            plan: 关键词库生成的刷新计划（keyword_store.RefreshPlan）
+            
+        Returns:
+            MetricsResult: 关键词到合并后历史指标的映射，failures记录最终失败的关键词
+        """
+        groups = {}
+        for keyword in keywords:
+            groups.setdefault(plan.start_month(keyword), []).append(keyword)
+            
+        metrics_map = MetricsResult()
+        for start_month, group in groups.items():
+            month_range = (start_month, plan.target_month) if start_month else None
+            fetched = self.fetch_metrics_concurrently(group, language_id, month_range)
+            metrics_map.update(plan.merge(fetched))
+            metrics_map.failures.extend(fetched.failures)
+        self.store.save_metrics(metrics_map, language_id)
+        
+        with self.refresh_lock:
+            for start_month, group in groups.items():
+                self.refresh_counts['incremental' if start_month else 'full'] += len(group)
+                self.refresh_counts['api_calls'] += math.ceil(len(group) / self.batch_size)
                 
+        # 请求失败的落后关键词同样沿用已保存的数据，失败仍记录在failures中
+        returned = {normalize_keyword(text) for text in metrics_map}
+        for keyword in keywords:
+            stored = plan.stale.get(normalize_keyword(keyword))
+            if stored and normalize_keyword(keyword) not in returned:
+                metrics_map[stored['keyword']] = stored
+        return metrics_map
+    
+    def fetch_metrics_concurrently(self, keywords: List[str], language_id: str = "1000",
+                                   month_range: Optional[Tuple[str, str]] = None) -> MetricsResult:
+        """
+        分块并发请求关键词的历史指标数据
+        
+        关键词按batch_size切分后在线程池中并发请求，实际的并发数、退避和重试由调度器控制，
+        最终失败的分块不影响其他分块的结果，记录在返回值的failures中。
+        
+        Args:
+            keywords: 关键词列表
+            language_id: 语言ID，默认为1000（英语）
+            month_range: 可选的 (起始月份, 结束月份)，只请求这段时间的数据
+            
+        Returns:
+            MetricsResult: 关键词到历史指标的映射，failures记录最终失败的关键词
+        """
+        metrics_map = MetricsResult()
+        if not keywords:
             return metrics_map
             
-        except GoogleAdsException as ex:
-            print(
-                f'Request with ID "{ex.request_id}" failed with status '
-                f'"{ex.error.code().name}" and includes the following errors:'
-            )
-            for error in ex.failure.errors:
-                print(f'\tError with message "{error.message}".')
-                if error.location:
-                    for field_path_element in error.location.field_path_elements:
-                        print(f"\t\tOn field: {field_path_element.field_name}")
-            return {}
+        chunks = self.split_into_chunks(keywords)
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(chunks))) as executor:
+            futures = {
+                executor.submit(self.scheduler.call, self.fetch_metrics_chunk, chunk, language_id, month_range,
+                                max_retries=self.max_retries): chunk
+                for chunk in chunks
+            }
+            for future in as_completed(futures):
+                try:
+                    metrics_map.update(future.result())
+                except Exception as e:
+                    self.log_request_error(e)
+                    metrics_map.failures.append(KeywordFailure.from_error(futures[future], e))
+                    
+        if metrics_map.failures:
+            print(f"{len(metrics_map.failed_keywords)} 个关键词的历史数据获取失败")
+        return metrics_map
     
     def calculate_growth_percentage(self, monthly_searches: List[MonthlySearchVolume]) -> float:
         """
@@ -188,9 +518,9 @@ class KeywordIdeasService:
             
         return ((latest_month - third_month) / third_month) * 100
 
-    def generate_keyword_ideas(self, keywords: List[str] = None, url: str = None, language_id: str = "1000") -> List[KeywordIdea]:
+    def build_keyword_ideas_request(self, keywords: List[str] = None, url: str = None, language_id: str = "1000"):
         """
-        获取关键词创意
+        构建关键词创意请求
         
         Args:
             keywords: 关键词列表，可选
@@ -198,94 +528,305 @@ class KeywordIdeasService:
             language_id: 语言ID，默认为1000（英语）
             
         Returns:
-            List[KeywordIdea]: 关键词创意列表
+            GenerateKeywordIdeasRequest: 关键词创意请求
+        """
+        request = self.client_pool.new_request(self.client_config, "GenerateKeywordIdeasRequest")
+        request.customer_id = self.customer_id
+        request.language = self.googleads_service.language_constant_path(language_id)
+        request.include_adult_keywords = False
+        request.keyword_plan_network = self.search_network
+        
+        # 处理关键词和URL
+        keyword_texts = keywords if keywords else []
+        
+        # 只有URL，没有关键词
+        if not keyword_texts and url:
+            request.url_seed.url = url
+        
+        # 只有关键词，没有URL
+        elif keyword_texts and not url:
+            request.keyword_seed.keywords.extend(keyword_texts)
+        
+        # 同时有关键词和URL
+        elif keyword_texts and url:
+            request.keyword_and_url_seed.url = url
+            request.keyword_and_url_seed.keywords.extend(keyword_texts)
             
+        return request
+    
+    def collect_generated_keywords(self, keywords: List[str] = None, url: str = None, language_id: str = "1000",
+                                   clusterer=None) -> List[str]:
+        """
+        读取全部关键词创意，并合并未出现在结果中的用户输入关键词
+
+        Args:
+            keywords: 关键词列表，可选
+            url: 网页URL，可选
+            language_id: 语言ID，默认为1000（英语）
+            clusterer: 可选的近似变体聚类器（keyword_clusters.KeywordClusterer），提供时只返回每组的代表
+
+        Returns:
+            List[str]: 去重后的关键词列表
+
         Raises:
-            ValueError: 参数错误
             GoogleAdsException: API调用错误
         """
-        if not keywords and not url:
-            raise ValueError("关键词列表和URL不能同时为空")
-            
         if not self.client or not self.customer_id:
             raise Exception("客户端未初始化")
+
+        request = self.build_keyword_ideas_request(keywords, url, language_id)
+        ideas = self.scheduler.call(self.keyword_plan_idea_service.generate_keyword_ideas, request=request,
+                                    metadata=self.request_metadata, max_retries=self.max_retries)
+
+        # 按规范化文本保持顺序去重，与生成结果仅大小写或空白不同的种子词不再重复加入
+        generated_keywords = KeywordIndex(self.merge_variants(list(ideas), clusterer), key=str)
+        generated_keywords.extend(keywords or [])
+
+        return generated_keywords.keywords()
+
+    def merge_variants(self, results, clusterer=None) -> List[str]:
+        """
+        把一批关键词创意的文本交给近似变体聚类器，只保留需要请求历史指标的关键词
+        
+        Args:
+            results: GenerateKeywordIdeaResult列表
+            clusterer: 近似变体聚类器，为None时不合并
             
-        try:
-            keyword_plan_idea_service = self.client.get_service("KeywordPlanIdeaService")
-            language_rn = self.client.get_service("GoogleAdsService").language_constant_path(language_id)
-            
-            request = self.client.get_type("GenerateKeywordIdeasRequest")
-            request.customer_id = self.customer_id
-            request.language = language_rn
-            request.include_adult_keywords = False
-            request.keyword_plan_network = self.client.enums.KeywordPlanNetworkEnum.GOOGLE_SEARCH
-            
-            # 处理关键词和URL
-            keyword_texts = keywords if keywords else []
-            
-            # 只有URL，没有关键词
-            if not keyword_texts and url:
-                request.url_seed.url = url
+        Returns:
+            List[str]: 关键词文本，合并时只包含新出现的组的代表
+        """
+        texts = [result.text for result in results]
+        if clusterer is None:
+            return texts
+        # 关键词创意结果自带月均搜索量，用于选择代表和汇总，不需要额外请求
+        volumes = [result.keyword_idea_metrics.avg_monthly_searches for result in results]
+        return clusterer.add_batch(texts, volumes)
+    
+    def build_keyword_ideas(self, metrics_list: List[Dict]) -> KeywordIdeaBatch:
+        """
+        批量构建关键词创意对象，增长率基于搜索量矩阵一次性计算
+        
+        Args:
+            metrics_list: 历史指标列表
             
-            # 只有关键词，没有URL
-            elif keyword_texts and not url:
-                request.keyword_seed.keywords.extend(keyword_texts)
+        Returns:
+            KeywordIdeaBatch: 关键词创意列表，附带整批的搜索量矩阵
+        """
+        # 延迟导入，导入本模块（包括桌面工具启动时）不加载numpy
+        from keyword_analytics import recent_growth, volumes_matrix, yoy_growth
+        
+        months, volumes = volumes_matrix(metrics.get('monthly_searches', []) for metrics in metrics_list)
+        growth = yoy_growth(volumes).tolist()
+        recent = recent_growth(volumes).tolist()
+        
+        return KeywordIdeaBatch([
+            KeywordIdea(
+                text=metrics['keyword'],
+                avg_monthly_searches=metrics.get('avg_monthly_searches', 0),
+                competition=metrics.get('competition', 'N/A'),
+                competition_index=metrics.get('competition_index', 0),
+                low_cpc=metrics.get('low_cpc', 0),
+                high_cpc=metrics.get('high_cpc', 0),
+                monthly_searches=metrics.get('monthly_searches', []),
+                growth_percentage=growth[i],
+                recent_growth_percentage=recent[i]
+            )
+            for i, metrics in enumerate(metrics_list)
+        ], months, volumes)
+    
+    def iter_keyword_ideas(self, keywords: List[str] = None, url: str = None, language_id: str = "1000",
+                           progress_callback: Optional[Callable[[str], None]] = None,
+                           failure_callback: Optional[Callable[[KeywordFailure], None]] = None,
+                           clusterer=None) -> Iterator[KeywordIdea]:
+        """
+        以流水线方式获取关键词创意，逐个产出结果，参数和异常同iter_keyword_idea_batches
+        
+        Yields:
+            KeywordIdea: 关键词创意
+        """
+        batches = self.iter_keyword_idea_batches(keywords, url, language_id, progress_callback, failure_callback,
+                                                 clusterer)
+        try:
+            for batch in batches:
+                yield from batch
+        finally:
+            batches.close()
+    
+    def iter_keyword_idea_batches(self, keywords: List[str] = None, url: str = None, language_id: str = "1000",
+                                  progress_callback: Optional[Callable[[str], None]] = None,
+                                  failure_callback: Optional[Callable[[KeywordFailure], None]] = None,
+                                  clusterer=None) -> Iterator[KeywordIdeaBatch]:
+        """
+        以流水线方式获取关键词创意，每个历史数据分块返回后产出一批结果
+        
+        每读取一页关键词创意就提交该页关键词的历史数据请求，无需等待全部分页读取完毕，
+        历史数据返回后立即产出对应的KeywordIdeaBatch，结果顺序为历史数据返回的顺序。
+        每批附带构建时算出的搜索量矩阵，调用方保存结果、计算趋势序列或构建列式表时可以直接使用。
+        提供聚类器时，单复数、词序、标点和拼写不同的近似变体只请求并产出每组的代表，
+        各组的成员和汇总搜索量记录在聚类器中；用户输入的关键词总是单独请求。
+        
+        Args:
+            keywords: 关键词列表，可选
+            url: 网页URL，可选
+            language_id: 语言ID，默认为1000（英语）
+            progress_callback: 进度回调，接收进度描述文本，可选
+            failure_callback: 失败回调，接收最终获取失败的关键词（KeywordFailure），可选；
+                              未提供时失败的关键词只打印日志
+            clusterer: 可选的近似变体聚类器（keyword_clusters.KeywordClusterer），每次搜索使用新的聚类器
             
-            # 同时有关键词和URL
-            elif keyword_texts and url:
-                request.keyword_and_url_seed.url = url
-                request.keyword_and_url_seed.keywords.extend(keyword_texts)
+        Yields:
+            KeywordIdeaBatch: 一个历史数据分块的关键词创意
             
-            # 获取关键词创意
-            keyword_ideas = keyword_plan_idea_service.generate_keyword_ideas(request=request)
+        Raises:
+            ValueError: 参数错误或生成的关键词列表为空
+            GoogleAdsException: API调用错误
+        """
+        if not keywords and not url:
+            raise ValueError("关键词列表和URL不能同时为空")
             
-            # 提取所有生成的关键词
-            generated_keywords = [idea.text for idea in keyword_ideas]
+        if not self.client or not self.customer_id:
+            raise Exception("客户端未初始化")
             
+        request = self.build_keyword_ideas_request(keywords, url, language_id)
+        
+        seen_keywords = KeywordIndex(key=str)
+        pending = set()
+        executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        
+        def submit(texts: List[str]) -> None:
+            for chunk in self.split_into_chunks(texts):
+                pending.add(executor.submit(self.get_historical_metrics_batch, chunk, language_id))
+                
+        def drain(timeout: Optional[float]) -> Iterator[KeywordIdeaBatch]:
+            # 产出已完成分块的结果，timeout为0时不阻塞
+            if not pending:
+                return
+            done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            for future in done:
+                pending.discard(future)
+                result = future.result()
+                if failure_callback:
+                    for failure in result.failures:
+                        failure_callback(failure)
+                if result:
+                    yield self.build_keyword_ideas(list(result.values()))
+                    
+        try:
+            # 获取关键词创意，每页结果到达后立即提交历史数据请求
+            pager = self.scheduler.call(self.keyword_plan_idea_service.generate_keyword_ideas, request=request,
+                                        metadata=self.request_metadata, max_retries=self.max_retries)
+            for page in pager.pages:
+                submit(seen_keywords.extend(self.merge_variants(page.results, clusterer)))
+                
+                if progress_callback:
+                    progress_callback(f"已生成 {len(seen_keywords)} 个关键词，正在获取历史数据...")
+                    
+                yield from drain(0)
+                
             # 检查用户输入的关键词是否在生成的关键词列表中，如果不在则添加
-            if keywords:
-                for keyword in keywords:
-                    if keyword not in generated_keywords:
-                        generated_keywords.append(keyword)
-
-            if not generated_keywords:
-                raise ValueError("生成的关键词列表为空")
+            submit(seen_keywords.extend(keywords or []))
             
-            # 批量获取历史数据
-            historical_metrics = self.get_historical_metrics_batch(generated_keywords, language_id)
-            
-            results = []
-            for metrics in historical_metrics.values():
-                # 从历史数据映射中获取数据
-                monthly_searches = metrics.get('monthly_searches', [])
-                
-                # 计算年增长率和近三个月增长率
-                growth_percentage = self.calculate_growth_percentage(monthly_searches)
-                recent_growth_percentage = self.calculate_recent_growth_percentage(monthly_searches)
+            if not seen_keywords:
+                raise ValueError("生成的关键词列表为空")
                 
-                keyword_idea = KeywordIdea(
-                    text=metrics['keyword'],
-                    avg_monthly_searches=metrics.get('avg_monthly_searches', 0),
-                    competition=metrics.get('competition', 'N/A'),
-                    competition_index=metrics.get('competition_index', 0),
-                    low_cpc=metrics.get('low_cpc', 0),
-                    high_cpc=metrics.get('high_cpc', 0),
-                    monthly_searches=monthly_searches,
-                    growth_percentage=growth_percentage,
-                    recent_growth_percentage=recent_growth_percentage
-                )
-                results.append(keyword_idea)
+            while pending:
+                yield from drain(None)
                 
-            return results
+        finally:
+            # 调用方提前停止迭代时取消尚未开始的请求
+            executor.shutdown(wait=False, cancel_futures=True)
+    
+    def generate_keyword_ideas(self, keywords: List[str] = None, url: str = None, language_id: str = "1000",
+                               progress_callback: Optional[Callable[[str], None]] = None,
+                               as_table: bool = False,
+                               failure_callback: Optional[Callable[[KeywordFailure], None]] = None,
+                               clusterer=None):
+        """
+        获取关键词创意
+        
+        Args:
+            keywords: 关键词列表，可选
+            url: 网页URL，可选
+            language_id: 语言ID，默认为1000（英语）
+            progress_callback: 进度回调，接收进度描述文本，可选
+            as_table: 为True时返回列式的KeywordIdeaTable，适合大结果集
+            failure_callback: 失败回调，接收最终获取失败的关键词（KeywordFailure），可选
+            clusterer: 可选的近似变体聚类器，提供时近似变体只返回每组的代表
+            
+        Returns:
+            List[KeywordIdea] 或 KeywordIdeaTable: 关键词创意
             
-        except GoogleAdsException as ex:
-            raise GoogleAdsException(ex.error)
+        Raises:
+            ValueError: 参数错误
+            GoogleAdsException: API调用错误
+        """
+        if not keywords and not url:
+            raise ValueError("关键词列表和URL不能同时为空")
+            
+        from google.ads.googleads.errors import GoogleAdsException
+
+        try:
+            batches = self.iter_keyword_idea_batches(keywords, url, language_id, progress_callback, failure_callback,
+                                                     clusterer)
+            if as_table:
+                # 延迟导入，避免与keyword_table循环导入
+                from keyword_table import KeywordIdeaTable
+                return KeywordIdeaTable.from_batches(batches)
+            return [idea for batch in batches for idea in batch]
+            
+        except GoogleAdsException:
+            # 原样抛出，保留请求ID和错误详情
+            raise
             
         except Exception as e:
             raise Exception(f"获取关键词创意失败: {str(e)}")
 
-# 使用示例
-if __name__ == "__main__":
+def run_benchmark(keyword_count: int = 4000, batch_size: int = 500, latency: float = 0.2, workers: int = 4) -> None:
+    """
+    在注入延迟的KeywordPlanIdeaService替身上演示分块、并发和失败分块的重试（无需凭据和网络）
+
+    第二个分块的第一次请求返回UNAVAILABLE，由调度器退避后重试成功；
+    最后一个分块总是返回INVALID_ARGUMENT，记录在failures中，不影响其他分块。
+
+    Args:
+        keyword_count: 关键词数量
+        batch_size: 每个分块的关键词数量
+        latency: 每次请求的耗时（秒）
+        workers: 并发请求的线程数
+    """
+    import time
+
+    from ads_stub import STUB_CONFIG, StubKeywordPlanIdeaService, stub_client_pool
+    from request_scheduler import RequestScheduler
+
+    keywords = [f"benchmark keyword {i}" for i in range(keyword_count)]
+    retried_chunk = keywords[batch_size:batch_size + 1]
+    idea_service = StubKeywordPlanIdeaService(latency=latency, fail_always=keywords[-1:])
+    client_pool = stub_client_pool(idea_service)
+
+    # 预先加载请求类型，计时不包含首次创建客户端和导入protobuf模块的开销
+    KeywordIdeasService(STUB_CONFIG, client_pool=client_pool, scheduler=RequestScheduler()).fetch_metrics_chunk(keywords[:1])
+
+    chunk_count = math.ceil(keyword_count / batch_size)
+    print(f"{keyword_count} 个关键词，每块 {batch_size} 个（{chunk_count} 块），每次请求耗时 {latency * 1000:.0f} ms")
+    for name, max_workers in (("顺序请求", 1), (f"{workers} 线程并发", workers)):
+        scheduler = RequestScheduler(max_concurrency=max_workers, base_delay=latency, max_delay=latency * 4)
+        service = KeywordIdeasService(STUB_CONFIG, batch_size=batch_size, max_workers=max_workers,
+                                      client_pool=client_pool, scheduler=scheduler)
+        idea_service.reset(fail_once=retried_chunk)
+        start = time.perf_counter()
+        metrics = service.get_historical_metrics_batch(keywords)
+        elapsed = time.perf_counter() - start
+        stub_stats = idea_service.stats()
+        scheduler_stats = scheduler.stats()
+        print(f"  {name}: 耗时 {elapsed * 1000:.0f} ms，请求 {stub_stats['requests']} 次"
+              f"（分块大小 {min(stub_stats['chunk_sizes'])}-{max(stub_stats['chunk_sizes'])}），"
+              f"在途峰值 {stub_stats['peak_active']}，重试 {scheduler_stats['retries']} 次，"
+              f"获取 {len(metrics)} 个，失败 {len(metrics.failed_keywords)} 个")
+
+
+def run_example() -> None:
+    """使用真实凭据请求关键词创意的示例"""
     try:
         # 示例配置
         config = {
@@ -316,3 +857,12 @@ if __name__ == "__main__":
             
     except Exception as e:
         print(f"错误: {str(e)}")
+
+
+if __name__ == "__main__":
+    import sys
+
+    if sys.argv[1:] == ["--example"]:
+        run_example()
+    else:
+        run_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 4000)
@@ -0,0 +1,145 @@
+"""
+按规范化关键词索引的结果容器
+
+KeywordIndex 按插入顺序保存行数据，同时维护 规范化关键词 -> 行下标 的字典，
+查找、去重和判断是否存在都是O(1)。大小写或空白不同的同一关键词（如用户输入的种子词
+"Python  Programming" 与API返回的 "python programming"）视为同一行，只保留先加入的一行。
+
+容器实现了序列接口（len、下标访问、迭代），可以直接作为 VirtualTreeview 和 ResultSorter 的数据。
+
+运行本模块可对比线性查找与索引查找的耗时：
+
+    python keyword_index.py [关键词数量]
+"""
+from typing import Callable, Dict, Generic, Iterable, Iterator, List, Optional, TypeVar
+
+T = TypeVar('T')
+
+
+def normalize_keyword(keyword: str) -> str:
+    """
+    规范化关键词文本：去除首尾空白、转为小写并合并连续空白
+
+    Args:
+        keyword: 关键词
+
+    Returns:
+        str: 规范化后的关键词
+    """
+    return " ".join(keyword.lower().split())
+
+
+def _idea_text(row) -> str:
+    return row.text
+
+
+class KeywordIndex(Generic[T]):
+    """按规范化关键词去重和查找的有序容器"""
+
+    def __init__(self, rows: Iterable[T] = (), key: Callable[[T], str] = _idea_text):
+        """
+        Args:
+            rows: 初始数据
+            key: 从一行数据中取出关键词文本的函数，默认取 .text 属性；保存字符串时传入str
+        """
+        self.key = key
+        self.rows: List[T] = []
+        self._positions: Dict[str, int] = {}
+        self.extend(rows)
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def __getitem__(self, index: int) -> T:
+        return self.rows[index]
+
+    def __iter__(self) -> Iterator[T]:
+        return iter(self.rows)
+
+    def __contains__(self, keyword: str) -> bool:
+        return normalize_keyword(keyword) in self._positions
+
+    def add(self, row: T) -> bool:
+        """
+        加入一行数据
+
+        Args:
+            row: 行数据
+
+        Returns:
+            bool: 是否加入，关键词已存在时返回False
+        """
+        normalized = normalize_keyword(self.key(row))
+        if normalized in self._positions:
+            return False
+        self._positions[normalized] = len(self.rows)
+        self.rows.append(row)
+        return True
+
+    def extend(self, rows: Iterable[T]) -> List[T]:
+        """
+        批量加入数据，已存在的关键词被跳过
+
+        Args:
+            rows: 行数据
+
+        Returns:
+            List[T]: 实际加入的行
+        """
+        return [row for row in rows if self.add(row)]
+
+    def index_of(self, keyword: str) -> Optional[int]:
+        """关键词对应的行下标，不存在时返回None"""
+        return self._positions.get(normalize_keyword(keyword))
+
+    def get(self, keyword: str, default: Optional[T] = None) -> Optional[T]:
+        """关键词对应的行数据，不存在时返回default"""
+        index = self._positions.get(normalize_keyword(keyword))
+        return self.rows[index] if index is not None else default
+
+    def keywords(self) -> List[str]:
+        """按插入顺序返回全部关键词文本"""
+        return [self.key(row) for row in self.rows]
+
+    def clear(self) -> None:
+        """清空容器"""
+        self.rows = []
+        self._positions = {}
+
+
+def run_benchmark(count: int = 50_000, lookups: int = 1_000) -> None:
+    """
+    对比在结果列表中线性查找与通过索引查找关键词的耗时
+
+    Args:
+        count: 关键词数量
+        lookups: 查找次数
+    """
+    import random
+    import time
+
+    from keyword_table import build_synthetic_ideas
+
+    ideas = build_synthetic_ideas(count)
+    index = KeywordIndex(ideas)
+    targets = [ideas[i].text for i in random.Random(0).choices(range(count), k=lookups)]
+
+    start = time.perf_counter()
+    for keyword in targets:
+        next((idea for idea in ideas if idea.text == keyword), None)
+    scan_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for keyword in targets:
+        index.get(keyword)
+    index_time = time.perf_counter() - start
+
+    print(f"{count:,} 个关键词，查找 {lookups:,} 次")
+    print(f"  线性查找: {scan_time * 1000:9.2f} ms")
+    print(f"  索引查找: {index_time * 1000:9.2f} ms  ({scan_time / index_time:.0f}x)")
+
+
+if __name__ == "__main__":
+    import sys
+
+    run_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 50_000)
@@ -0,0 +1,814 @@
+"""
+本地关键词库与增量刷新
+
+历史指标每月只更新一次。KeywordStore 在SQLite中按关键词保存最近的月度搜索量序列和其他指标，
+并记录每个关键词已有数据的最新月份（latest_month）：
+
+    - plan_refresh 按最新发布月份把关键词分为三类：数据已是最新的直接使用，
+      数据落后的只需请求缺少的月份，从未保存过的需要完整请求
+    - merge_metrics 把新请求到的月份合并进已保存的序列，只保留最近 HISTORY_MONTHS 个月，
+      月均搜索量按合并后的序列重新计算，竞争度和出价使用新数据
+    - 数据不会因为跨月而被删除，跨月后只需补充新发布的月份
+
+同一个库也是本地的关键词研究数据库：每次搜索的结果、allintitle数量和产生关键词的种子都会保存下来。
+增长率在写入时计算，月均搜索量、竞争指数、出价和近三个月增长都有索引，
+query 可以在不访问API的情况下按这些条件在数百万个关键词中查询。
+
+运行本模块可模拟跨月后的刷新，对比完整重新请求与增量刷新需要的API调用次数，
+并在大量关键词上测量条件查询的耗时：
+
+    python keyword_store.py [刷新基准的关键词数量] [查询基准的关键词数量]
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from keyword_analytics import recent_growth, yoy_growth
+from keyword_ideas_service import KeywordIdea, KeywordIdeaBatch, MonthlySearchVolume, normalize_keyword
+
+# 每个关键词保留的月份数量，与API默认返回的历史长度一致
+HISTORY_MONTHS = 12
+# Google Ads 通常在每月初的几天内发布上个月的数据
+DEFAULT_REFRESH_DELAY_DAYS = 3
+# 默认的搜索网络
+DEFAULT_NETWORK = "GOOGLE_SEARCH"
+# 单条SQL语句中的参数数量上限
+SQL_BATCH_SIZE = 500
+# 查询默认返回的关键词数量上限
+DEFAULT_QUERY_LIMIT = 1000
+# 可用于排序的列
+ORDER_COLUMNS = ('avg_monthly_searches', 'competition_index', 'low_cpc', 'high_cpc', 'growth_percentage',
+                 'recent_growth_percentage', 'allintitle_count', 'text', 'updated_at')
+# 可按索引筛选的列及其索引
+INDEXED_COLUMNS = {
+    'avg_monthly_searches': 'idx_keywords_volume',
+    'competition_index': 'idx_keywords_competition_index',
+    'low_cpc': 'idx_keywords_low_cpc',
+    'high_cpc': 'idx_keywords_high_cpc',
+    'recent_growth_percentage': 'idx_keywords_recent_growth',
+}
+# 选择索引时在每个索引上最多检查的行数
+PROBE_LIMIT = 20_000
+# 在最初的表结构之后增加的列及其类型，打开旧版本创建的库时自动补充
+ADDED_COLUMNS = {
+    'growth_percentage': 'REAL',
+    'recent_growth_percentage': 'REAL',
+    'allintitle_count': 'INTEGER',
+}
+
+
+def month_offset(year_month: str, delta: int) -> str:
+    """
+    计算相对某个月份偏移若干个月后的月份
+
+    Args:
+        year_month: 月份，格式为 YYYY-MM
+        delta: 偏移的月数，可以为负
+
+    Returns:
+        str: 偏移后的月份
+    """
+    year, month = map(int, year_month.split('-'))
+    index = year * 12 + (month - 1) + delta
+    return f"{index // 12}-{index % 12 + 1:02d}"
+
+
+def months_between(start: str, end: str) -> int:
+    """两个月份之间相差的月数（end - start）"""
+    start_year, start_month = map(int, start.split('-'))
+    end_year, end_month = map(int, end.split('-'))
+    return (end_year - start_year) * 12 + (end_month - start_month)
+
+
+def latest_published_month(now: Optional[float] = None,
+                           refresh_delay_days: int = DEFAULT_REFRESH_DELAY_DAYS) -> str:
+    """
+    推算API已发布数据的最新月份
+
+    每月初的refresh_delay_days天之后上个月的数据才会发布，在此之前最新的是上上个月。
+
+    Args:
+        now: 当前时间戳，默认为time.time()
+        refresh_delay_days: 每月数据发布相对月初的延迟天数
+
+    Returns:
+        str: 最新月份，格式为 YYYY-MM
+    """
+    current = datetime.fromtimestamp(time.time() if now is None else now)
+    this_month = f"{current.year}-{current.month:02d}"
+    return month_offset(this_month, -1 if current.day > refresh_delay_days else -2)
+
+
+def merge_metrics(stored: Optional[Dict], fetched: Dict) -> Dict:
+    """
+    把新请求到的指标合并进已保存的指标
+
+    Args:
+        stored: 已保存的指标，没有时直接返回fetched
+        fetched: 新请求到的指标，可能只包含部分月份
+
+    Returns:
+        Dict: 合并后的指标，月度序列按时间正序、最多HISTORY_MONTHS个月
+    """
+    if not stored:
+        return fetched
+    months = {monthly.year_month: monthly.monthly_searches for monthly in stored['monthly_searches']}
+    months.update((monthly.year_month, monthly.monthly_searches) for monthly in fetched['monthly_searches'])
+    series = [MonthlySearchVolume(year_month=year_month, monthly_searches=months[year_month])
+              for year_month in sorted(months)[-HISTORY_MONTHS:]]
+
+    merged = dict(stored)
+    merged.update(fetched)
+    merged['monthly_searches'] = series
+    if series:
+        merged['avg_monthly_searches'] = round(sum(monthly.monthly_searches for monthly in series) / len(series))
+    return merged
+
+
+def refresh_start(metrics: Optional[Dict], target_month: str) -> Optional[str]:
+    """
+    增量刷新时需要请求的起始月份
+
+    Args:
+        metrics: 已保存的指标，没有时为None
+        target_month: 需要具备的最新月份
+
+    Returns:
+        Optional[str]: 已有数据最新月份的下一个月；没有数据或缺少的月份超过HISTORY_MONTHS时返回None，
+            表示请求完整的历史
+    """
+    if not metrics or not metrics['monthly_searches']:
+        return None
+    latest_month = metrics['monthly_searches'][-1].year_month
+    if months_between(latest_month, target_month) >= HISTORY_MONTHS:
+        return None
+    return month_offset(latest_month, 1)
+
+
+def series_matrix(series_list: List[List[Tuple[str, int]]]) -> np.ndarray:
+    """
+    把 (月份, 搜索量) 序列转换为 关键词×月份 的搜索量矩阵，效果同keyword_analytics.volumes_matrix
+
+    Args:
+        series_list: 每个关键词的 (月份, 搜索量) 列表
+
+    Returns:
+        np.ndarray: 按月份正序排列的搜索量矩阵，缺失值为NaN
+    """
+    months = sorted({year_month for series in series_list for year_month, _ in series})
+    positions = {month: i for i, month in enumerate(months)}
+    matrix = np.full((len(series_list), len(months)), np.nan)
+    for row, series in enumerate(series_list):
+        for year_month, searches in series:
+            matrix[row, positions[year_month]] = searches
+    return matrix
+
+
+def keep_latest(volumes: np.ndarray, count: int) -> np.ndarray:
+    """
+    每行只保留最近count个有效值，更早的值置为NaN，与只保存最近HISTORY_MONTHS个月的序列一致
+
+    Args:
+        volumes: 按月份正序排列的搜索量矩阵
+        count: 每行保留的有效值数量
+
+    Returns:
+        np.ndarray: 新的搜索量矩阵
+    """
+    present = ~np.isnan(volumes)
+    # 从最新月份往前数的有效值序号
+    rank = np.cumsum(present[:, ::-1], axis=1)[:, ::-1]
+    return np.where(rank <= count, volumes, np.nan)
+
+
+def compute_kgr(allintitle_count: int, latest_searches: int, avg_monthly_searches: int) -> Tuple[float, float]:
+    """
+    计算KGR，与KGRCalculator.compute_kgr一致（这里不导入kgr_calculator，以免加载requests）
+
+    Returns:
+        Tuple[float, float]: (kgr_avg, kgr_latest)，搜索量为0时为inf
+    """
+    kgr_avg = allintitle_count / avg_monthly_searches if avg_monthly_searches else float('inf')
+    kgr_latest = allintitle_count / latest_searches if latest_searches else float('inf')
+    return kgr_avg, kgr_latest
+
+
+@dataclass
+class RefreshPlan:
+    """关键词的刷新计划"""
+    target_month: str  # 需要具备的最新月份
+    fresh: Dict[str, Dict] = field(default_factory=dict)  # 数据已是最新的关键词，键为保存的关键词文本
+    stale: Dict[str, Dict] = field(default_factory=dict)  # 数据落后的关键词，键为规范化关键词
+    missing: List[str] = field(default_factory=list)  # 从未保存过的关键词
+
+    def start_month(self, keyword: str) -> Optional[str]:
+        """关键词需要请求的起始月份，None表示请求完整的历史"""
+        return refresh_start(self.stale.get(normalize_keyword(keyword)), self.target_month)
+
+    def merge(self, fetched: Dict[str, Dict]) -> Dict[str, Dict]:
+        """
+        把请求到的指标与已保存的指标合并
+
+        Args:
+            fetched: 关键词到新请求的指标的映射
+
+        Returns:
+            Dict[str, Dict]: 关键词到合并后指标的映射
+        """
+        return {text: merge_metrics(self.stale.get(normalize_keyword(text)), metrics)
+                for text, metrics in fetched.items()}
+
+
+class KeywordStore:
+    """基于SQLite的本地关键词库，按规范化关键词保存月度序列、指标、allintitle数量和种子来源"""
+
+    def __init__(self, db_path: str):
+        """
+        Args:
+            db_path: SQLite数据库文件路径，传入":memory:"时使用内存数据库
+        """
+        self.db_path = db_path
+        self._lock = threading.Lock()
+
+        if db_path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        # 月度序列以JSON保存在关键词所在行中，读取一个关键词只需一行；
+        # 增长率在写入时计算，和搜索量、竞争指数、出价一样可以直接按索引查询
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS keywords (
+                keyword TEXT NOT NULL,
+                language_id TEXT NOT NULL,
+                network TEXT NOT NULL,
+                text TEXT NOT NULL,
+                avg_monthly_searches INTEGER,
+                competition TEXT,
+                competition_index REAL,
+                low_cpc REAL,
+                high_cpc REAL,
+                monthly_searches TEXT NOT NULL,
+                latest_month TEXT,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (keyword, language_id, network)
+            )
+        """)
+        # 旧版本创建的库缺少后来增加的列
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(keywords)")}
+        for name, column_type in ADDED_COLUMNS.items():
+            if name not in columns:
+                self._conn.execute(f"ALTER TABLE keywords ADD COLUMN {name} {column_type}")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS keyword_seeds (
+                keyword TEXT NOT NULL,
+                language_id TEXT NOT NULL,
+                network TEXT NOT NULL,
+                seed TEXT NOT NULL,
+                added_at REAL NOT NULL,
+                PRIMARY KEY (keyword, language_id, network, seed)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS idx_keyword_seeds_seed ON keyword_seeds (seed);
+            CREATE INDEX IF NOT EXISTS idx_keywords_text ON keywords (text);
+        """)
+        # 每个筛选列的索引都带上其他筛选列，扫描索引时先用索引中的值过滤，只为匹配的行读取表
+        for column, index in INDEXED_COLUMNS.items():
+            covered = ", ".join(other for other in INDEXED_COLUMNS if other != column)
+            self._conn.execute(
+                f"CREATE INDEX IF NOT EXISTS {index} ON keywords (language_id, network, {column}, {covered})"
+            )
+        self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM keywords").fetchone()[0]
+
+    def load_metrics(self, keywords: List[str], language_id: str = "1000",
+                     network: str = DEFAULT_NETWORK) -> Dict[str, Dict]:
+        """
+        读取已保存的指标
+
+        Args:
+            keywords: 关键词列表
+            language_id: 语言ID
+            network: 搜索网络
+
+        Returns:
+            Dict[str, Dict]: 规范化关键词到指标的映射，指标格式与API返回的历史指标相同，
+                月度序列按时间正序
+        """
+        normalized = list(dict.fromkeys(normalize_keyword(keyword) for keyword in keywords))
+        metrics_map = {}
+        with self._lock:
+            for i in range(0, len(normalized), SQL_BATCH_SIZE):
+                batch = normalized[i:i + SQL_BATCH_SIZE]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT keyword, text, avg_monthly_searches, competition, competition_index, low_cpc, high_cpc, "
+                    f"monthly_searches FROM keywords "
+                    f"WHERE language_id = ? AND network = ? AND keyword IN ({placeholders})",
+                    [language_id, network, *batch]
+                ).fetchall()
+                for keyword, text, avg, competition, competition_index, low_cpc, high_cpc, series in rows:
+                    metrics_map[keyword] = {
+                        'keyword': text,
+                        'monthly_searches': [MonthlySearchVolume(year_month, searches)
+                                             for year_month, searches in json.loads(series)],
+                        'avg_monthly_searches': avg,
+                        'competition': competition,
+                        'competition_index': competition_index,
+                        'low_cpc': low_cpc,
+                        'high_cpc': high_cpc,
+                    }
+        return metrics_map
+
+    def plan_refresh(self, keywords: List[str], language_id: str = "1000", network: str = DEFAULT_NETWORK,
+                     target_month: Optional[str] = None) -> RefreshPlan:
+        """
+        按已有数据的最新月份制定刷新计划
+
+        Args:
+            keywords: 关键词列表
+            language_id: 语言ID
+            network: 搜索网络
+            target_month: 需要具备的最新月份，默认为latest_published_month()
+
+        Returns:
+            RefreshPlan: 刷新计划
+        """
+        target_month = target_month or latest_published_month()
+        stored = self.load_metrics(keywords, language_id, network)
+        plan = RefreshPlan(target_month)
+        seen = set()
+        for keyword in keywords:
+            key = normalize_keyword(keyword)
+            if key in seen:
+                continue
+            seen.add(key)
+            metrics = stored.get(key)
+            if metrics is None:
+                plan.missing.append(keyword)
+            elif metrics['monthly_searches'] and metrics['monthly_searches'][-1].year_month >= target_month:
+                plan.fresh[metrics['keyword']] = metrics
+            else:
+                plan.stale[key] = metrics
+        return plan
+
+    def save_metrics(self, metrics_map: Dict[str, Dict], language_id: str = "1000",
+                     network: str = DEFAULT_NETWORK, matrix: Optional[Tuple[List[str], np.ndarray]] = None) -> None:
+        """
+        保存指标，覆盖同一关键词已保存的指标，保留allintitle数量和种子来源；
+        月度序列只保留最近HISTORY_MONTHS个月
+
+        Args:
+            metrics_map: 关键词到指标的映射，已保存的月份需先用merge_metrics合并
+            language_id: 语言ID
+            network: 搜索网络
+            matrix: 可选的预先计算的 (月份, 搜索量矩阵)，行与metrics_map的值一一对应，未提供时按序列计算
+        """
+        if not metrics_map:
+            return
+        now = time.time()
+        entries = list(metrics_map.values())
+        series_list = [sorted((monthly.year_month, monthly.monthly_searches)
+                              for monthly in metrics.get('monthly_searches', []))[-HISTORY_MONTHS:]
+                       for metrics in entries]
+        # 与KeywordIdeasService.calculate_growth_percentage / calculate_recent_growth_percentage 的语义一致
+        volumes = keep_latest(matrix[1], HISTORY_MONTHS) if matrix is not None else series_matrix(series_list)
+        growth = yoy_growth(volumes).tolist()
+        recent = recent_growth(volumes).tolist()
+        rows = [(
+            normalize_keyword(metrics['keyword']), language_id, network, metrics['keyword'],
+            metrics.get('avg_monthly_searches'), metrics.get('competition'), metrics.get('competition_index'),
+            metrics.get('low_cpc'), metrics.get('high_cpc'), json.dumps(series, separators=(',', ':')),
+            series[-1][0] if series else None, growth[i], recent[i], now
+        ) for i, (metrics, series) in enumerate(zip(entries, series_list))]
+
+        with self._lock:
+            self._conn.executemany(
+                "INSERT INTO keywords (keyword, language_id, network, text, avg_monthly_searches, competition, "
+                "competition_index, low_cpc, high_cpc, monthly_searches, latest_month, growth_percentage, "
+                "recent_growth_percentage, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (keyword, language_id, network) DO UPDATE SET text = excluded.text, "
+                "avg_monthly_searches = excluded.avg_monthly_searches, competition = excluded.competition, "
+                "competition_index = excluded.competition_index, low_cpc = excluded.low_cpc, "
+                "high_cpc = excluded.high_cpc, monthly_searches = excluded.monthly_searches, "
+                "latest_month = excluded.latest_month, growth_percentage = excluded.growth_percentage, "
+                "recent_growth_percentage = excluded.recent_growth_percentage, updated_at = excluded.updated_at",
+                rows
+            )
+            self._conn.commit()
+
+    def save_ideas(self, ideas: List[KeywordIdea], seed: Optional[str] = None, language_id: str = "1000",
+                   network: str = DEFAULT_NETWORK) -> None:
+        """
+        保存关键词创意，并记录产生这些关键词的种子
+
+        Args:
+            ideas: 关键词创意列表，KeywordIdeaBatch直接使用附带的搜索量矩阵计算增长率
+            seed: 种子（关键词或网址），为None时不记录来源
+            language_id: 语言ID
+            network: 搜索网络
+        """
+        if not ideas:
+            return
+        metrics_map = {idea.text: {
+            'keyword': idea.text,
+            'monthly_searches': idea.monthly_searches,
+            'avg_monthly_searches': idea.avg_monthly_searches,
+            'competition': idea.competition,
+            'competition_index': idea.competition_index,
+            'low_cpc': idea.low_cpc,
+            'high_cpc': idea.high_cpc,
+        } for idea in ideas}
+        # 文本重复时映射与矩阵的行不再对应，改为按序列计算
+        matrix = ideas.matrix if isinstance(ideas, KeywordIdeaBatch) and len(metrics_map) == len(ideas) else None
+        self.save_metrics(metrics_map, language_id, network, matrix)
+        if seed is not None:
+            self.save_seeds([idea.text for idea in ideas], seed, language_id, network)
+
+    def save_seeds(self, keywords: List[str], seed: str, language_id: str = "1000",
+                   network: str = DEFAULT_NETWORK) -> None:
+        """
+        只记录产生这些关键词的种子，用于指标已由增量刷新（使用本库的KeywordIdeasService）写入的结果
+
+        Args:
+            keywords: 关键词列表
+            seed: 种子（关键词或网址）
+            language_id: 语言ID
+            network: 搜索网络
+        """
+        if not keywords:
+            return
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO keyword_seeds (keyword, language_id, network, seed, added_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [(normalize_keyword(keyword), language_id, network, seed, now) for keyword in keywords]
+            )
+            self._conn.commit()
+
+    def save_allintitle_counts(self, counts: Dict[str, Optional[int]], language_id: str = "1000",
+                               network: str = DEFAULT_NETWORK) -> None:
+        """
+        保存关键词的allintitle数量，KGR在读取时按当时的搜索量计算
+
+        Args:
+            counts: 关键词到allintitle数量的映射，库中没有的关键词会被忽略
+            language_id: 语言ID
+            network: 搜索网络
+        """
+        if not counts:
+            return
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE keywords SET allintitle_count = ? WHERE keyword = ? AND language_id = ? AND network = ?",
+                [(count, normalize_keyword(keyword), language_id, network) for keyword, count in counts.items()]
+            )
+            self._conn.commit()
+
+    def load_kgr_values(self, keywords: List[str], language_id: str = "1000",
+                        network: str = DEFAULT_NETWORK) -> Dict[str, Tuple[float, float, int]]:
+        """
+        读取已保存allintitle数量的关键词的KGR
+
+        Args:
+            keywords: 关键词列表
+            language_id: 语言ID
+            network: 搜索网络
+
+        Returns:
+            Dict[str, Tuple[float, float, int]]: 关键词（保存的文本）到 (kgr_avg, kgr_latest, allintitle_count) 的映射
+        """
+        normalized = list(dict.fromkeys(normalize_keyword(keyword) for keyword in keywords))
+        values = {}
+        with self._lock:
+            for i in range(0, len(normalized), SQL_BATCH_SIZE):
+                batch = normalized[i:i + SQL_BATCH_SIZE]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT text, allintitle_count, avg_monthly_searches, monthly_searches FROM keywords "
+                    f"WHERE language_id = ? AND network = ? AND allintitle_count IS NOT NULL "
+                    f"AND keyword IN ({placeholders})",
+                    [language_id, network, *batch]
+                ).fetchall()
+                for text, count, avg, series in rows:
+                    series = json.loads(series)
+                    if series:
+                        values[text] = (*compute_kgr(count, series[-1][1], avg), count)
+        return values
+
+    def query(self, *, min_volume: Optional[int] = None, max_volume: Optional[int] = None,
+              min_competition_index: Optional[float] = None, max_competition_index: Optional[float] = None,
+              min_cpc: Optional[float] = None, max_cpc: Optional[float] = None,
+              min_growth: Optional[float] = None, min_recent_growth: Optional[float] = None,
+              rising: bool = False, max_kgr: Optional[float] = None, text_prefix: Optional[str] = None,
+              seed: Optional[str] = None, order_by: str = 'avg_monthly_searches', descending: bool = True,
+              limit: Optional[int] = DEFAULT_QUERY_LIMIT, language_id: str = "1000",
+              network: str = DEFAULT_NETWORK) -> List[KeywordIdea]:
+        """
+        按条件查询已保存的关键词，不访问API
+
+        所有范围条件都包含边界，值为None的条件不参与过滤。
+
+        Args:
+            min_volume: 最低月均搜索量
+            max_volume: 最高月均搜索量
+            min_competition_index: 最低竞争指数
+            max_competition_index: 最高竞争指数
+            min_cpc: 首页最低出价的下限
+            max_cpc: 首页最高出价的上限
+            min_growth: 最低年增长百分比
+            min_recent_growth: 最低近三个月增长百分比
+            rising: 为True时只返回近三个月增长为正的关键词
+            max_kgr: 基于月均搜索量的KGR上限，只返回已保存allintitle数量的关键词
+            text_prefix: 关键词前缀（按规范化文本匹配）
+            seed: 只返回由该种子产生的关键词
+            order_by: 排序列，见ORDER_COLUMNS
+            descending: 是否降序
+            limit: 最多返回的数量，None表示不限制
+            language_id: 语言ID
+            network: 搜索网络
+
+        Returns:
+            List[KeywordIdea]: 符合条件的关键词
+
+        Raises:
+            ValueError: 排序列不受支持
+        """
+        if order_by not in ORDER_COLUMNS:
+            raise ValueError(f"不支持的排序列: {order_by}，可选: {', '.join(ORDER_COLUMNS)}")
+
+        conditions = ["language_id = ?", "network = ?"]
+        params: List = [language_id, network]
+        # 有索引的列上的范围条件，用于选择索引
+        ranges: Dict[str, List[Tuple[str, List]]] = {}
+        for column, operator, value in (
+            ('avg_monthly_searches', '>=', min_volume),
+            ('avg_monthly_searches', '<=', max_volume),
+            ('competition_index', '>=', min_competition_index),
+            ('competition_index', '<=', max_competition_index),
+            ('low_cpc', '>=', min_cpc),
+            ('high_cpc', '<=', max_cpc),
+            ('growth_percentage', '>=', min_growth),
+            ('recent_growth_percentage', '>=', min_recent_growth),
+            ('recent_growth_percentage', '>', 0 if rising else None),
+        ):
+            if value is not None:
+                conditions.append(f"{column} {operator} ?")
+                params.append(value)
+                if column in INDEXED_COLUMNS:
+                    ranges.setdefault(column, []).append((f"{column} {operator} ?", [value]))
+        if max_kgr is not None:
+            conditions.append("allintitle_count IS NOT NULL AND avg_monthly_searches > 0 "
+                              "AND allintitle_count <= ? * avg_monthly_searches")
+            params.append(max_kgr)
+        if text_prefix:
+            # 规范化关键词是主键的第一列，前缀匹配转换为主键上的范围查询
+            prefix = normalize_keyword(text_prefix)
+            conditions.append("keyword >= ? AND keyword < ?")
+            params.extend([prefix, prefix + "\U0010ffff"])
+        if seed is not None:
+            conditions.append("keyword IN (SELECT keyword FROM keyword_seeds "
+                              "WHERE seed = ? AND language_id = ? AND network = ?)")
+            params.extend([seed, language_id, network])
+
+        with self._lock:
+            # 前缀和种子条件本身足够精确，交给SQLite选择；否则按实际数据选择索引
+            index = None if text_prefix or seed is not None else \
+                self._choose_index(ranges, order_by, language_id, network)
+            sql = (f"SELECT text, avg_monthly_searches, competition, competition_index, low_cpc, high_cpc, "
+                   f"monthly_searches, growth_percentage, recent_growth_percentage FROM keywords "
+                   f"{f'INDEXED BY {index} ' if index else ''}"
+                   f"WHERE {' AND '.join(conditions)} ORDER BY {order_by} {'DESC' if descending else 'ASC'}")
+            if limit is not None:
+                sql += " LIMIT ?"
+                params.append(limit)
+            rows = self._conn.execute(sql, params).fetchall()
+        return [KeywordIdea(
+            text=text,
+            avg_monthly_searches=avg,
+            competition=competition,
+            competition_index=competition_index,
+            low_cpc=low_cpc,
+            high_cpc=high_cpc,
+            monthly_searches=[MonthlySearchVolume(year_month, searches) for year_month, searches in json.loads(series)],
+            growth_percentage=growth if growth is not None else 0.0,
+            recent_growth_percentage=recent if recent is not None else 0.0,
+        ) for text, avg, competition, competition_index, low_cpc, high_cpc, series, growth, recent in rows]
+
+    def _choose_index(self, ranges: Dict[str, List[Tuple[str, List]]], order_by: str, language_id: str,
+                      network: str) -> Optional[str]:
+        """
+        为查询选择索引，调用方需持有锁
+
+        SQLite不了解范围条件的实际选择性，常会为了ORDER BY按排序列的索引扫描整个表。
+        这里在每个有条件的索引上最多数PROBE_LIMIT行（只读索引，约几毫秒）：匹配行数少于上限的索引中选最少的一个，
+        只读取匹配的行再排序；所有条件都很宽泛时按排序列的索引顺序读取，凑够LIMIT即停止。
+
+        Args:
+            ranges: 列到该列上的 (条件, 参数) 列表的映射
+            order_by: 排序列
+            language_id: 语言ID
+            network: 搜索网络
+
+        Returns:
+            Optional[str]: 索引名，None表示由SQLite选择
+        """
+        best, best_count = None, PROBE_LIMIT
+        # 两端都有限制的列通常更精确，先检查；之后的检查最多数到目前最少的行数
+        for column, column_conditions in sorted(ranges.items(), key=lambda item: -len(item[1])):
+            index = INDEXED_COLUMNS[column]
+            where = " AND ".join(condition for condition, _ in column_conditions)
+            count = self._conn.execute(
+                f"SELECT COUNT(*) FROM (SELECT 1 FROM keywords INDEXED BY {index} "
+                f"WHERE language_id = ? AND network = ? AND {where} LIMIT ?)",
+                [language_id, network, *(value for _, values in column_conditions for value in values), best_count]
+            ).fetchone()[0]
+            if count < best_count:
+                best, best_count = index, count
+        return best or INDEXED_COLUMNS.get(order_by)
+
+    def seeds_of(self, keyword: str, language_id: str = "1000", network: str = DEFAULT_NETWORK) -> List[str]:
+        """
+        查询产生某个关键词的种子
+
+        Args:
+            keyword: 关键词
+            language_id: 语言ID
+            network: 搜索网络
+
+        Returns:
+            List[str]: 种子列表，按首次记录的时间排序
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT seed FROM keyword_seeds WHERE keyword = ? AND language_id = ? AND network = ? ORDER BY added_at",
+                (normalize_keyword(keyword), language_id, network)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def clear(self) -> None:
+        """清空关键词库"""
+        with self._lock:
+            self._conn.execute("DELETE FROM keywords")
+            self._conn.execute("DELETE FROM keyword_seeds")
+            self._conn.commit()
+
+    def close(self) -> None:
+        """更新查询优化器的统计信息并关闭数据库连接"""
+        with self._lock:
+            self._conn.execute("PRAGMA optimize")
+            self._conn.close()
+
+
+def _benchmark_refresh(count: int, stale_ratio: float = 0.2, batch_size: int = 1000) -> None:
+    """
+    模拟跨月后的刷新：大部分关键词已在本月刷新过，其余关键词缺少最新一个月
+
+    Args:
+        count: 关键词数量
+        stale_ratio: 缺少最新月份的关键词比例
+        batch_size: 每个历史指标请求包含的关键词数量
+    """
+    import math
+
+    from keyword_table import build_synthetic_ideas
+
+    target_month = latest_published_month()
+    ideas = build_synthetic_ideas(count, HISTORY_MONTHS)
+    stale_count = int(count * stale_ratio)
+
+    def metrics_for(idea, latest: str) -> Dict:
+        months = [month_offset(latest, i - HISTORY_MONTHS + 1) for i in range(HISTORY_MONTHS)]
+        return {
+            'keyword': idea.text,
+            'monthly_searches': [MonthlySearchVolume(month, monthly.monthly_searches)
+                                 for month, monthly in zip(months, idea.monthly_searches)],
+            'avg_monthly_searches': idea.avg_monthly_searches,
+            'competition': idea.competition,
+            'competition_index': idea.competition_index,
+            'low_cpc': idea.low_cpc,
+            'high_cpc': idea.high_cpc,
+        }
+
+    stored = {idea.text: metrics_for(idea, month_offset(target_month, -1 if i < stale_count else 0))
+              for i, idea in enumerate(ideas)}
+    store = KeywordStore(":memory:")
+    start = time.perf_counter()
+    store.save_metrics(stored)
+    save_time = time.perf_counter() - start
+
+    keywords = [idea.text for idea in ideas]
+    start = time.perf_counter()
+    plan = store.plan_refresh(keywords, target_month=target_month)
+    plan_time = time.perf_counter() - start
+
+    # 模拟API只返回缺少的一个月
+    start = time.perf_counter()
+    fetched = {}
+    for metrics in plan.stale.values():
+        update = dict(metrics, monthly_searches=[MonthlySearchVolume(target_month, 1234)])
+        fetched[metrics['keyword']] = merge_metrics(metrics, update)
+    store.save_metrics(fetched)
+    merge_time = time.perf_counter() - start
+    assert not store.plan_refresh(keywords, target_month=target_month).stale
+
+    full_calls = math.ceil(count / batch_size)
+    incremental_calls = math.ceil(len(plan.stale) / batch_size) + math.ceil(len(plan.missing) / batch_size)
+    print(f"{count:,} 个关键词，其中 {len(plan.stale):,} 个缺少 {target_month} 的数据，每次请求 {batch_size} 个关键词")
+    print(f"  保存: {save_time * 1000:8.1f} ms")
+    print(f"  制定刷新计划: {plan_time * 1000:8.1f} ms（最新 {len(plan.fresh):,}，落后 {len(plan.stale):,}，"
+          f"未保存 {len(plan.missing):,}）")
+    print(f"  合并并保存新月份: {merge_time * 1000:8.1f} ms")
+    print(f"  API调用: 完整刷新 {full_calls} 次，增量刷新 {incremental_calls} 次，避免 {full_calls - incremental_calls} 次")
+
+
+def _benchmark_queries(count: int, batch: int = 50_000, repeat: int = 5) -> None:
+    """
+    在大量关键词上测量带索引的条件查询耗时
+
+    Args:
+        count: 库中的关键词数量
+        batch: 每次写入的关键词数量
+        repeat: 每个查询的执行次数，取中位数
+    """
+    import statistics
+    import tempfile
+
+    rng = np.random.default_rng(0)
+    months = [month_offset(latest_published_month(), i - HISTORY_MONTHS + 1) for i in range(HISTORY_MONTHS)]
+    with tempfile.TemporaryDirectory() as directory:
+        store = KeywordStore(os.path.join(directory, "keywords.db"))
+        start = time.perf_counter()
+        for offset in range(0, count, batch):
+            n = min(batch, count - offset)
+            # 搜索量呈长尾分布，每个关键词有各自的月度趋势
+            base = rng.lognormal(4, 2, n)
+            trend = rng.normal(1, 0.05, (n, 1)) ** np.arange(HISTORY_MONTHS)
+            volumes = (base[:, None] * trend).astype(int).tolist()
+            competition_index = rng.integers(0, 101, n).tolist()
+            low_cpc = rng.gamma(1, 0.5, n)
+            high_cpc = (low_cpc * rng.uniform(1, 4, n)).tolist()
+            low_cpc = low_cpc.tolist()
+            store.save_metrics({f"keyword {offset + i}": {
+                'keyword': f"keyword {offset + i}",
+                'monthly_searches': [MonthlySearchVolume(month, volume) for month, volume in zip(months, volumes[i])],
+                'avg_monthly_searches': sum(volumes[i]) // HISTORY_MONTHS,
+                'competition': 'LOW' if competition_index[i] < 34 else 'MEDIUM' if competition_index[i] < 67 else 'HIGH',
+                'competition_index': competition_index[i],
+                'low_cpc': low_cpc[i],
+                'high_cpc': high_cpc[i],
+            } for i in range(n)})
+        load_time = time.perf_counter() - start
+        with store._lock:
+            store._conn.execute("ANALYZE")
+        print(f"写入 {count:,} 个关键词: {load_time:.1f} s")
+
+        queries = (
+            ("月均搜索量>1000、竞争指数<30、近3月上升",
+             dict(min_volume=1001, max_competition_index=29, rising=True)),
+            ("同上，按近3月增长排序",
+             dict(min_volume=1001, max_competition_index=29, rising=True, order_by='recent_growth_percentage')),
+            ("出价 0.5~2、月均搜索量>10000",
+             dict(min_cpc=0.5, max_cpc=2, min_volume=10_001)),
+            ("近3月增长>=50%",
+             dict(min_recent_growth=50, limit=100)),
+            ("前缀 keyword 12345",
+             dict(text_prefix="keyword 12345", order_by='text', descending=False)),
+        )
+        for name, conditions in queries:
+            samples = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                results = store.query(**conditions)
+                samples.append(time.perf_counter() - start)
+            print(f"  {name}: {statistics.median(samples) * 1000:7.2f} ms（返回 {len(results)} 个）")
+        store.close()
+
+
+def run_benchmark(count: int = 50_000, query_count: int = 1_000_000) -> None:
+    """
+    模拟跨月后的增量刷新，并在大量关键词上测量条件查询
+
+    Args:
+        count: 增量刷新基准的关键词数量
+        query_count: 查询基准的关键词数量
+    """
+    _benchmark_refresh(count)
+    _benchmark_queries(query_count)
+
+
+if __name__ == "__main__":
+    import sys
+
+    run_benchmark(*(int(arg) for arg in sys.argv[1:3]))
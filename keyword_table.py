@@ -0,0 +1,409 @@
+"""
+列式存储的关键词结果集
+
+KeywordIdeaTable 将每个字段保存为一个NumPy数组，月度搜索量保存为 关键词×月份 的二维矩阵，
+避免为每个关键词创建大量的小对象。通过下标访问得到的 KeywordIdeaRow 是指向表中一行的视图，
+提供与 KeywordIdea 相同的属性，现有调用方无需修改即可使用。
+
+运行本模块可对比两种表示方式的内存占用：
+
+    python keyword_table.py [关键词数量]
+"""
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence
+
+import numpy as np
+
+from keyword_analytics import stack_volume_matrices, volumes_matrix
+from keyword_ideas_service import KeywordIdea, KeywordIdeaBatch, MonthlySearchVolume
+
+# 数值列名称及对应的数组属性
+NUMERIC_COLUMNS = (
+    'avg_monthly_searches',
+    'competition_index',
+    'low_cpc',
+    'high_cpc',
+    'growth_percentage',
+    'recent_growth_percentage',
+)
+# 数值列的数组类型
+COLUMN_DTYPES = {name: np.int64 if name == 'avg_monthly_searches' else np.float64 for name in NUMERIC_COLUMNS}
+# from_ideas每批读取的关键词创意数量
+FROM_IDEAS_BATCH_SIZE = 4096
+
+
+class KeywordIdeaRow:
+    """KeywordIdeaTable中一行的只读视图，属性与KeywordIdea一致"""
+
+    __slots__ = ('_table', '_index')
+
+    def __init__(self, table: 'KeywordIdeaTable', index: int):
+        self._table = table
+        self._index = index
+
+    @property
+    def index(self) -> int:
+        """该行在表中的下标"""
+        return self._index
+
+    @property
+    def text(self) -> str:
+        return self._table.texts[self._index]
+
+    @property
+    def avg_monthly_searches(self) -> int:
+        return int(self._table.avg_monthly_searches[self._index])
+
+    @property
+    def competition(self) -> str:
+        return self._table.competition_labels[self._table.competition_codes[self._index]]
+
+    @property
+    def competition_index(self) -> float:
+        return float(self._table.competition_index[self._index])
+
+    @property
+    def low_cpc(self) -> float:
+        return float(self._table.low_cpc[self._index])
+
+    @property
+    def high_cpc(self) -> float:
+        return float(self._table.high_cpc[self._index])
+
+    @property
+    def growth_percentage(self) -> float:
+        return float(self._table.growth_percentage[self._index])
+
+    @property
+    def recent_growth_percentage(self) -> float:
+        return float(self._table.recent_growth_percentage[self._index])
+
+    @property
+    def monthly_searches(self) -> List[MonthlySearchVolume]:
+        """按月份正序构建月度搜索量列表，缺失的月份会被跳过"""
+        row = self._table.volumes[self._index]
+        return [
+            MonthlySearchVolume(year_month=month, monthly_searches=int(volume))
+            for month, volume in zip(self._table.months, row)
+            if not np.isnan(volume)
+        ]
+
+    @property
+    def volumes(self) -> np.ndarray:
+        """按月份正序的搜索量数组（表中数据的视图，缺失值为NaN）"""
+        return self._table.volumes[self._index]
+
+    def to_idea(self) -> KeywordIdea:
+        """转换为独立的KeywordIdea对象"""
+        return KeywordIdea(
+            text=self.text,
+            avg_monthly_searches=self.avg_monthly_searches,
+            competition=self.competition,
+            competition_index=self.competition_index,
+            low_cpc=self.low_cpc,
+            high_cpc=self.high_cpc,
+            monthly_searches=self.monthly_searches,
+            growth_percentage=self.growth_percentage,
+            recent_growth_percentage=self.recent_growth_percentage
+        )
+
+    def __eq__(self, other):
+        if isinstance(other, KeywordIdeaRow):
+            return self._table is other._table and self._index == other._index
+        return NotImplemented
+
+    def __hash__(self):
+        return hash((id(self._table), self._index))
+
+    def __repr__(self):
+        return (f"KeywordIdeaRow(text={self.text!r}, avg_monthly_searches={self.avg_monthly_searches}, "
+                f"competition={self.competition!r}, competition_index={self.competition_index})")
+
+
+class KeywordIdeaTable:
+    """列式关键词结果集"""
+
+    def __init__(self, texts: List[str], avg_monthly_searches: np.ndarray, competition_codes: np.ndarray,
+                 competition_labels: List[str], competition_index: np.ndarray, low_cpc: np.ndarray,
+                 high_cpc: np.ndarray, growth_percentage: np.ndarray, recent_growth_percentage: np.ndarray,
+                 months: List[str], volumes: np.ndarray):
+        """
+        Args:
+            texts: 关键词文本
+            avg_monthly_searches: 月均搜索量（int64）
+            competition_codes: 竞争度编码（int8），对应competition_labels中的下标
+            competition_labels: 竞争度名称
+            competition_index: 竞争指数（float64）
+            low_cpc: 首页最低出价（float64）
+            high_cpc: 首页最高出价（float64）
+            growth_percentage: 年增长百分比（float64）
+            recent_growth_percentage: 近三个月增长百分比（float64）
+            months: 按正序排列的月份（YYYY-MM）
+            volumes: 关键词×月份的搜索量矩阵（float64，缺失值为NaN）
+        """
+        n = len(texts)
+        for name, array in (('avg_monthly_searches', avg_monthly_searches), ('competition_codes', competition_codes),
+                            ('competition_index', competition_index), ('low_cpc', low_cpc), ('high_cpc', high_cpc),
+                            ('growth_percentage', growth_percentage),
+                            ('recent_growth_percentage', recent_growth_percentage)):
+            if len(array) != n:
+                raise ValueError(f"{name}的长度({len(array)})与关键词数量({n})不一致")
+        if volumes.shape != (n, len(months)):
+            raise ValueError(f"volumes的形状{volumes.shape}应为({n}, {len(months)})")
+
+        self.texts = texts
+        self.avg_monthly_searches = avg_monthly_searches
+        self.competition_codes = competition_codes
+        self.competition_labels = competition_labels
+        self.competition_index = competition_index
+        self.low_cpc = low_cpc
+        self.high_cpc = high_cpc
+        self.growth_percentage = growth_percentage
+        self.recent_growth_percentage = recent_growth_percentage
+        self.months = months
+        self.volumes = volumes
+
+    @classmethod
+    def empty(cls) -> 'KeywordIdeaTable':
+        """创建空表"""
+        return cls.from_ideas([])
+
+    @classmethod
+    def from_ideas(cls, ideas: Iterable) -> 'KeywordIdeaTable':
+        """
+        从KeywordIdea（或具有相同属性的对象）构建列式表
+
+        按FROM_IDEAS_BATCH_SIZE分批读取，每批转换为数组后即丢弃，
+        流式结果（如iter_keyword_ideas）不会先全部保存为KeywordIdea列表。
+
+        Args:
+            ideas: 关键词创意的可迭代对象
+
+        Returns:
+            KeywordIdeaTable: 列式表
+        """
+        iterator = iter(ideas)
+        return cls.from_batches(iter(lambda: list(islice(iterator, FROM_IDEAS_BATCH_SIZE)), []))
+
+    @classmethod
+    def from_batches(cls, batches: Iterable[Sequence]) -> 'KeywordIdeaTable':
+        """
+        从按批到达的关键词创意构建列式表，每批转换为数组后即丢弃
+
+        KeywordIdeaBatch（如iter_keyword_idea_batches的结果）直接使用附带的搜索量矩阵，
+        其他序列按批计算。
+
+        Args:
+            batches: 关键词创意批次的可迭代对象
+
+        Returns:
+            KeywordIdeaTable: 列式表
+        """
+        texts: List[str] = []
+        competition_labels: List[str] = []
+        label_codes: Dict[str, int] = {}
+        code_batches: List[np.ndarray] = []
+        column_batches: Dict[str, List[np.ndarray]] = {name: [] for name in NUMERIC_COLUMNS}
+        volume_batches = []
+
+        def competition_code(label: str) -> int:
+            code = label_codes.get(label)
+            if code is None:
+                code = label_codes[label] = len(competition_labels)
+                competition_labels.append(label)
+            return code
+
+        for batch in batches:
+            if not batch:
+                continue
+            n = len(batch)
+            texts.extend(idea.text for idea in batch)
+            code_batches.append(np.fromiter((competition_code(idea.competition) for idea in batch),
+                                            dtype=np.int8, count=n))
+            for name, arrays in column_batches.items():
+                arrays.append(np.fromiter((getattr(idea, name) for idea in batch), dtype=COLUMN_DTYPES[name], count=n))
+            if isinstance(batch, KeywordIdeaBatch):
+                volume_batches.append(batch.matrix)
+            else:
+                volume_batches.append(volumes_matrix(idea.monthly_searches for idea in batch))
+
+        # 各批的月份可能不同，按全部月份的并集合并
+        months, volumes = stack_volume_matrices(volume_batches)
+
+        def concatenate(arrays: List[np.ndarray], dtype) -> np.ndarray:
+            return np.concatenate(arrays) if arrays else np.empty(0, dtype=dtype)
+
+        return cls(
+            texts=texts,
+            competition_codes=concatenate(code_batches, np.int8),
+            competition_labels=competition_labels,
+            months=months,
+            volumes=volumes,
+            **{name: concatenate(arrays, COLUMN_DTYPES[name]) for name, arrays in column_batches.items()}
+        )
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+    def __getitem__(self, index: int) -> KeywordIdeaRow:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("行下标超出范围")
+        return KeywordIdeaRow(self, index)
+
+    def __iter__(self) -> Iterator[KeywordIdeaRow]:
+        for index in range(len(self)):
+            yield KeywordIdeaRow(self, index)
+
+    @property
+    def competition(self) -> np.ndarray:
+        """竞争度名称数组"""
+        return np.asarray(self.competition_labels, dtype=object)[self.competition_codes]
+
+    def column(self, name: str) -> np.ndarray:
+        """
+        获取数值列
+
+        Args:
+            name: 列名，见NUMERIC_COLUMNS
+
+        Returns:
+            np.ndarray: 列数组（表中数据本身，不复制）
+        """
+        if name not in NUMERIC_COLUMNS:
+            raise KeyError(f"未知的数值列: {name}")
+        return getattr(self, name)
+
+    def take(self, indices: Sequence[int]) -> 'KeywordIdeaTable':
+        """
+        按下标选取若干行组成新表（用于排序和筛选）
+
+        Args:
+            indices: 行下标序列
+
+        Returns:
+            KeywordIdeaTable: 新表
+        """
+        indices = np.asarray(indices, dtype=np.intp)
+        return KeywordIdeaTable(
+            texts=[self.texts[i] for i in indices],
+            avg_monthly_searches=self.avg_monthly_searches[indices],
+            competition_codes=self.competition_codes[indices],
+            competition_labels=self.competition_labels,
+            competition_index=self.competition_index[indices],
+            low_cpc=self.low_cpc[indices],
+            high_cpc=self.high_cpc[indices],
+            growth_percentage=self.growth_percentage[indices],
+            recent_growth_percentage=self.recent_growth_percentage[indices],
+            months=self.months,
+            volumes=self.volumes[indices]
+        )
+
+    def to_ideas(self) -> List[KeywordIdea]:
+        """转换为KeywordIdea列表"""
+        return [row.to_idea() for row in self]
+
+    def nbytes(self) -> int:
+        """数值数组占用的字节数（不含关键词文本）"""
+        return sum(array.nbytes for array in (
+            self.avg_monthly_searches, self.competition_codes, self.competition_index, self.low_cpc,
+            self.high_cpc, self.growth_percentage, self.recent_growth_percentage, self.volumes
+        ))
+
+
+def iter_synthetic_ideas(count: int, months: int = 12, seed: Optional[int] = 0) -> Iterator[KeywordIdea]:
+    """
+    逐个生成用于基准测试的关键词创意
+
+    Args:
+        count: 关键词数量
+        months: 每个关键词的月份数量
+        seed: 随机种子
+
+    Yields:
+        KeywordIdea: 关键词创意
+    """
+    rng = np.random.default_rng(seed)
+    month_labels = [f"{2024 + (i // 12)}-{(i % 12) + 1:02d}" for i in range(months)]
+    volumes = rng.integers(0, 100_000, size=(count, months))
+    competitions = ['LOW', 'MEDIUM', 'HIGH']
+    for i in range(count):
+        yield KeywordIdea(
+            text=f"keyword {i}",
+            avg_monthly_searches=int(volumes[i].mean()),
+            competition=competitions[i % 3],
+            competition_index=float(rng.integers(0, 100)),
+            low_cpc=float(rng.random()),
+            high_cpc=float(rng.random() * 5),
+            monthly_searches=[
+                MonthlySearchVolume(year_month=month, monthly_searches=int(volume))
+                for month, volume in zip(month_labels, volumes[i])
+            ],
+            growth_percentage=float(rng.normal() * 50),
+            recent_growth_percentage=float(rng.normal() * 20)
+        )
+
+
+def build_synthetic_ideas(count: int, months: int = 12, seed: Optional[int] = 0) -> List[KeywordIdea]:
+    """
+    生成用于基准测试的关键词创意
+
+    Args:
+        count: 关键词数量
+        months: 每个关键词的月份数量
+        seed: 随机种子
+
+    Returns:
+        List[KeywordIdea]: 关键词创意列表
+    """
+    return list(iter_synthetic_ideas(count, months, seed))
+
+
+def run_memory_benchmark(count: int) -> None:
+    """
+    对比KeywordIdea列表与KeywordIdeaTable的内存占用
+
+    Args:
+        count: 关键词数量
+    """
+    import gc
+    import sys
+    import tracemalloc
+
+    gc.collect()
+    tracemalloc.start()
+    ideas = build_synthetic_ideas(count)
+    ideas_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    gc.collect()
+    tracemalloc.start()
+    table = KeywordIdeaTable.from_ideas(ideas)
+    # 关键词文本对象与原列表共享，单独计入字符串本身的大小
+    table_bytes = tracemalloc.get_traced_memory()[0] + sum(sys.getsizeof(text) for text in table.texts)
+    tracemalloc.stop()
+
+    print(f"{count:,} 个关键词，每个 {len(table.months)} 个月")
+    print(f"  KeywordIdea 列表:   {ideas_bytes / 1024 / 1024:8.2f} MB")
+    print(f"  KeywordIdeaTable:   {table_bytes / 1024 / 1024:8.2f} MB  "
+          f"(数值数组 {table.nbytes() / 1024 / 1024:.2f} MB, {ideas_bytes / table_bytes:.1f}x)")
+    del ideas, table
+
+    # 从流式结果构建表时的峰值内存：分批读取与先转为列表
+    peaks = []
+    for build in (lambda: KeywordIdeaTable.from_ideas(iter_synthetic_ideas(count)),
+                  lambda: KeywordIdeaTable.from_ideas(list(iter_synthetic_ideas(count)))):
+        gc.collect()
+        tracemalloc.start()
+        build()
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    print(f"  从流式结果构建的峰值内存: 分批读取 {peaks[0] / 1024 / 1024:.2f} MB，"
+          f"先转为列表 {peaks[1] / 1024 / 1024:.2f} MB ({peaks[1] / peaks[0]:.1f}x)")
+
+
+if __name__ == "__main__":
+    import sys
+
+    run_memory_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 10_000)
@@ -1,25 +1,149 @@
+"""
+KGR（关键词黄金比例）计算：allintitle结果数量除以月搜索量
+
+运行本模块可在本地HTTP服务上演示批量计算，包括共享限速器、连接复用、429退避重试和单个关键词失败
+（无需网络，不访问搜索引擎）：
+
+    python kgr_calculator.py [关键词数量]
+
+访问真实搜索引擎的示例：
+
+    python kgr_calculator.py --example
+"""
 import requests
-from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
 import random
-import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from tkinter import messagebox
+from serp_parser import extract_result_count_from_chunks
+
+# 默认的搜索地址，测试时可指向本地HTTP服务
+DEFAULT_SEARCH_URL = 'https://www.google.com/search'
+# 默认请求速率（每秒请求数）
+DEFAULT_REQUESTS_PER_SECOND = 0.5
+# 默认突发请求数
+DEFAULT_BURST = 2
+# 批量计算的默认并发数
+DEFAULT_MAX_WORKERS = 4
+# 遇到429时的最大重试次数
+DEFAULT_MAX_RETRIES = 3
+# 退避等待的基础时间（秒）
+BACKOFF_BASE_DELAY = 2.0
+# 退避等待的最长时间（秒）
+BACKOFF_MAX_DELAY = 60.0
+# 流式读取搜索结果页时的数据块大小
+STREAM_CHUNK_SIZE = 16 * 1024
+# 释放响应前最多读取的剩余正文字节数，不超过时读完正文使连接放回连接池，超过时直接关闭连接
+MAX_DRAIN_BYTES = 256 * 1024
+
+
+class TokenBucket:
+    """线程安全的令牌桶限速器"""
+    
+    def __init__(self, rate, capacity):
+        """
+        Args:
+            rate: 每秒补充的令牌数
+            capacity: 令牌桶容量，即允许的突发请求数
+        """
+        if rate <= 0:
+            raise ValueError("rate必须大于0")
+        if capacity < 1:
+            raise ValueError("capacity必须至少为1")
+            
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+        
+    def acquire(self):
+        """获取一个令牌，令牌不足时阻塞等待"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+                self._updated_at = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait_time = (1 - self._tokens) / self.rate
+            time.sleep(wait_time)
+
+
+class RateLimitedError(Exception):
+    """重试后仍被搜索引擎限流（HTTP 429）"""
+
 
 class KGRCalculator:
-    def __init__(self):
+    def __init__(self, search_url=DEFAULT_SEARCH_URL, requests_per_second=DEFAULT_REQUESTS_PER_SECOND,
+                 burst=DEFAULT_BURST, max_workers=DEFAULT_MAX_WORKERS, max_retries=DEFAULT_MAX_RETRIES,
+                 timeout=10, cache=None):
+        """
+        Args:
+            search_url: 搜索地址
+            requests_per_second: 所有线程共享的请求速率上限
+            burst: 允许的突发请求数
+            max_workers: 批量计算的并发数，同时也是连接池大小
+            max_retries: 遇到429时的最大重试次数
+            timeout: 单个请求的超时时间（秒）
+            cache: 可选的allintitle缓存（如cache.AllintitleCache），命中时不再访问搜索引擎
+        """
         # User-Agent池
         self.user_agents = [
             'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
             'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
             'Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:89.0) Gecko/20100101 Firefox/89.0',
         ]
+        self.search_url = search_url
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.cache = cache
+        self.rate_limiter = TokenBucket(requests_per_second, burst)
+        
+        # 共享的连接池，复用TCP/TLS连接
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
 
-    def get_allintitle_count(self, keyword):
-        """获取allintitle搜索结果数量"""
-        try:
-            # 构建搜索URL
-            query = f'allintitle:{keyword}'
-            url = f'https://www.google.com/search?q={requests.utils.quote(query)}'
+    def backoff_delay(self, attempt, retry_after=None):
+        """
+        计算带随机抖动的指数退避等待时间
+        
+        Args:
+            attempt: 当前重试次数，从0开始
+            retry_after: 服务端返回的Retry-After秒数，可选
+        """
+        delay = min(BACKOFF_MAX_DELAY, BACKOFF_BASE_DELAY * (2 ** attempt))
+        # 全抖动，避免多个线程同时重试
+        delay = random.uniform(delay / 2, delay)
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        return delay
+
+    def fetch_search_page(self, keyword):
+        """
+        请求allintitle搜索结果页，遇到429时按指数退避重试
+        
+        响应以流式方式返回，调用方负责读取并关闭。
+        
+        Args:
+            keyword: 关键词
+            
+        Returns:
+            requests.Response: 未读取正文的响应
             
+        Raises:
+            RateLimitedError: 重试后仍被限流
+            requests.RequestException: 请求失败
+        """
+        query = f'allintitle:{keyword}'
+        
+        for attempt in range(self.max_retries + 1):
             # 随机选择User-Agent
             headers = {
                 'User-Agent': random.choice(self.user_agents),
@@ -27,45 +151,127 @@ class KGRCalculator:
                 'Accept-Language': 'en-US,en;q=0.5',
             }
             
-            # 发送请求
-            response = requests.get(url, headers=headers, timeout=10)
-            response.raise_for_status()
+            # 所有线程共享同一个限速器
+            self.rate_limiter.acquire()
+            response = self.session.get(self.search_url, params={'q': query}, headers=headers,
+                                        timeout=self.timeout, stream=True)
             
-            # 解析结果
-            soup = BeautifulSoup(response.text, 'html.parser')
-            result_stats = soup.find('div', {'id': 'result-stats'})
+            if response.status_code != 429:
+                try:
+                    response.raise_for_status()
+                except requests.HTTPError:
+                    self.release_response(response)
+                    raise
+                return response
+                
+            self.release_response(response)
             
-            if result_stats:
-                # 提取数字
-                text = result_stats.text
-                print("google allintitle 统计:", text)
+            if attempt == self.max_retries:
+                break
                 
-                # 提取"About X results"中的数字
-                match = re.search(r'About ([\d,]+) results', text)
-                if match:
-                    number_str = match.group(1).replace(',', '')  # 移除逗号
-                    return int(number_str)
+            retry_after = response.headers.get('Retry-After')
+            retry_after = float(retry_after) if retry_after and retry_after.isdigit() else None
+            time.sleep(self.backoff_delay(attempt, retry_after))
             
-            return 0
+        raise RateLimitedError(f"获取 '{keyword}' 的allintitle数量时被限流（HTTP 429）")
+
+    def release_response(self, response):
+        """
+        释放响应：剩余正文不超过MAX_DRAIN_BYTES时读完，使连接放回连接池复用，否则直接关闭连接
+        
+        Args:
+            response: 以流式方式请求的响应，可以已经读取了部分正文
+        """
+        try:
+            length = response.headers.get('Content-Length')
+            # raw.tell() 是已从连接读取的字节数，与Content-Length同样按传输编码计算
+            remaining = int(length) - response.raw.tell() if length and length.isdigit() else None
+            if remaining is None or remaining <= MAX_DRAIN_BYTES:
+                drained = 0
+                for chunk in response.iter_content(chunk_size=STREAM_CHUNK_SIZE):
+                    drained += len(chunk)
+                    if drained > MAX_DRAIN_BYTES:
+                        break
+        except requests.RequestException:
+            pass
+        finally:
+            # 正文已读完时close只把连接放回连接池，否则关闭连接
+            response.close()
+
+    def fetch_allintitle_count(self, keyword):
+        """
+        流式读取搜索结果页，读到结果统计节点后立即停止并返回结果数量
+        
+        Args:
+            keyword: 关键词
+            
+        Returns:
+            int: 结果数量，找不到时返回0
+        """
+        response = self.fetch_search_page(keyword)
+        try:
+            if response.encoding is None:
+                response.encoding = 'utf-8'
+            return extract_result_count_from_chunks(
+                response.iter_content(chunk_size=STREAM_CHUNK_SIZE, decode_unicode=True)
+            )
+        finally:
+            self.release_response(response)
+
+    def get_allintitle_count(self, keyword, raise_errors=False):
+        """获取allintitle搜索结果数量
+        
+        Args:
+            keyword: 关键词
+            raise_errors: 为True时直接抛出异常而不弹出错误对话框，用于后台线程调用
+        """
+        try:
+            if self.cache:
+                hit, count = self.cache.get(keyword)
+                if hit:
+                    if count is None:
+                        raise Exception(f"'{keyword}' 最近一次获取失败，请稍后再试")
+                    return count
+                    
+            try:
+                count = self.fetch_allintitle_count(keyword)
+            except requests.HTTPError as e:
+                # 4xx错误与关键词本身有关，进行负缓存；限流和服务端错误不缓存
+                status = e.response.status_code if e.response is not None else None
+                if self.cache and status and 400 <= status < 500 and status != 429:
+                    self.cache.put(keyword, None)
+                raise
+                
+            if self.cache:
+                self.cache.put(keyword, count)
+            return count
             
         except Exception as e:
+            if raise_errors:
+                raise
             messagebox.showerror("错误", f"获取allintitle数量时出错: {str(e)}")
             return 0
 
-    def calculate(self, keyword, monthly_searches, avg_monthly_searches):
-        """计算KGR值
+    def get_cached_counts(self, keywords):
+        """批量查询缓存中的allintitle数量
         
         Args:
-            keyword: 关键词
-            monthly_searches: 最近一个月的搜索量
-            avg_monthly_searches: 月平均搜索量
+            keywords: 关键词列表
             
         Returns:
-            tuple: (kgr_avg, kgr_latest, allintitle_count) KGR平均值、最新KGR值和allintitle数量
+            dict: 关键词到allintitle数量的映射，只包含成功获取过的关键词
+        """
+        if not self.cache:
+            return {}
+        return {keyword: count for keyword, count in self.cache.get_many(keywords).items() if count is not None}
+
+    def compute_kgr(self, allintitle_count, monthly_searches, avg_monthly_searches):
+        """
+        根据allintitle数量计算KGR值
+        
+        Returns:
+            tuple: (kgr_avg, kgr_latest)
         """
-        # 获取allintitle数量
-        allintitle_count = self.get_allintitle_count(keyword)
-            
         # 计算基于平均搜索量的KGR
         if avg_monthly_searches == 0:
             kgr_avg = float('inf')
@@ -78,8 +284,148 @@ class KGRCalculator:
         else:
             kgr_latest = allintitle_count / monthly_searches
             
+        return kgr_avg, kgr_latest
+
+    def calculate(self, keyword, monthly_searches, avg_monthly_searches, raise_errors=False):
+        """计算KGR值
+        
+        Args:
+            keyword: 关键词
+            monthly_searches: 最近一个月的搜索量
+            avg_monthly_searches: 月平均搜索量
+            raise_errors: 为True时获取allintitle数量失败会抛出异常
+            
+        Returns:
+            tuple: (kgr_avg, kgr_latest, allintitle_count) KGR平均值、最新KGR值和allintitle数量
+        """
+        # 获取allintitle数量
+        allintitle_count = self.get_allintitle_count(keyword, raise_errors)
+        kgr_avg, kgr_latest = self.compute_kgr(allintitle_count, monthly_searches, avg_monthly_searches)
+            
         return kgr_avg, kgr_latest, allintitle_count
+
+    def calculate_many(self, items, max_workers=None):
+        """批量计算KGR值，结果按完成顺序逐个产出
+        
+        所有请求共享连接池和限速器，单个关键词失败不会影响其他关键词。
+        
+        Args:
+            items: (keyword, monthly_searches, avg_monthly_searches) 元组的可迭代对象
+            max_workers: 并发数，默认为初始化时的max_workers
+            
+        Yields:
+            tuple: (keyword, result, error)，成功时result为(kgr_avg, kgr_latest, allintitle_count)且error为None，
+                   失败时result为None且error为异常对象
+        """
+        with ThreadPoolExecutor(max_workers=max_workers or self.max_workers) as executor:
+            futures = {
+                executor.submit(self.calculate, keyword, monthly_searches, avg_monthly_searches, True): keyword
+                for keyword, monthly_searches, avg_monthly_searches in items
+            }
+            try:
+                for future in as_completed(futures):
+                    keyword = futures[future]
+                    try:
+                        yield keyword, future.result(), None
+                    except Exception as e:
+                        yield keyword, None, e
+            finally:
+                # 调用方提前停止迭代时取消尚未开始的请求
+                for future in futures:
+                    future.cancel()
+
+    def close(self):
+        """关闭连接池"""
+        self.session.close()
         
+def run_benchmark(keyword_count=40, workers=4, latency=0.05, page_size=200_000):
+    """
+    在本地HTTP服务上运行calculate_many（无需网络，不访问搜索引擎）
+
+    本地服务返回生成的搜索结果页，结果数量由关键词确定；第二个关键词的第一次请求返回429和Retry-After，
+    第三个关键词总是返回404。对比单线程与多线程时的耗时、请求次数、连接数和结果是否正确。
+
+    Args:
+        keyword_count: 关键词数量
+        workers: 并发数
+        latency: 服务端处理每个请求的耗时（秒）
+        page_size: 每个搜索结果页的大致字节数
+    """
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    from urllib.parse import parse_qs, urlparse
+    from serp_parser import build_synthetic_serp
+
+    keywords = [f"benchmark keyword {i}" for i in range(keyword_count)]
+    expected = {keyword: 1000 + i * 37 for i, keyword in enumerate(keywords)}
+    pages = {keyword: build_synthetic_serp(count, page_size).encode('utf-8') for keyword, count in expected.items()}
+    missing = {keywords[2]}
+    lock = threading.Lock()
+    served = {}
+
+    class SearchHandler(BaseHTTPRequestHandler):
+        # 支持长连接，客户端可以复用连接
+        protocol_version = 'HTTP/1.1'
+
+        def do_GET(self):
+            keyword = parse_qs(urlparse(self.path).query).get('q', [''])[0].removeprefix('allintitle:')
+            with lock:
+                served['requests'] += 1
+                served['connections'].add(self.client_address)
+                throttled = keyword in served['throttle_once']
+                served['throttle_once'].discard(keyword)
+            time.sleep(latency)
+            if throttled or keyword in missing or keyword not in pages:
+                with lock:
+                    served['rate_limited'] += throttled
+                self.send_response(429 if throttled else 404)
+                if throttled:
+                    self.send_header('Retry-After', '1')
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            body = pages[keyword]
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def handle(self):
+            try:
+                super().handle()
+            except (BrokenPipeError, ConnectionResetError):
+                # 客户端读到结果统计后提前关闭了连接
+                pass
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), SearchHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    search_url = f'http://127.0.0.1:{server.server_address[1]}/search'
+    items = [(keyword, 1000, 500) for keyword in keywords]
+
+    print(f"{keyword_count} 个关键词，每页 {page_size / 1024:.0f} KB，服务端耗时 {latency * 1000:.0f} ms，"
+          f"第二个关键词第一次返回429（Retry-After: 1），第三个关键词返回404")
+    try:
+        for max_workers in (1, workers):
+            served.update(requests=0, rate_limited=0, connections=set(), throttle_once={keywords[1]})
+            calculator = KGRCalculator(search_url, requests_per_second=1000, burst=max_workers, max_workers=max_workers)
+            start = time.perf_counter()
+            results = list(calculator.calculate_many(items))
+            elapsed = time.perf_counter() - start
+            calculator.close()
+            correct = sum(1 for keyword, result, _ in results if result and result[2] == expected[keyword])
+            errors = [f"{keyword}: {type(error).__name__}" for keyword, _, error in results if error]
+            print(f"  {max_workers} 线程: 耗时 {elapsed * 1000:.0f} ms，请求 {served['requests']} 次"
+                  f"（429 {served['rate_limited']} 次），连接 {len(served['connections'])} 个，"
+                  f"结果正确 {correct}/{keyword_count}，失败: {', '.join(errors) or '无'}")
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
 def main():
     """测试用例"""
     calculator = KGRCalculator()
@@ -94,4 +440,9 @@ def main():
     
 
 if __name__ == "__main__":
-    main()
+    import sys
+
+    if sys.argv[1:] == ["--example"]:
+        main()
+    else:
+        run_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 40)
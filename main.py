@@ -1,28 +1,76 @@
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
-import json
+import importlib
 import yaml
 import os
-import csv
-from keyword_ideas_service import KeywordIdeasService
-from google.ads.googleads.errors import GoogleAdsException
-import matplotlib.pyplot as plt
-from matplotlib.figure import Figure
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-import matplotlib
+from keyword_ideas_service import KeywordIdeaBatch, KeywordIdeasService
+from cache import AllintitleCache
 import platform
-import requests
-from bs4 import BeautifulSoup
+import threading
 import time
-import random
-from kgr_calculator import KGRCalculator
+import queue
+from concurrent.futures import ThreadPoolExecutor
+from virtual_table import VirtualTreeview
+from keyword_index import KeywordIndex
+from request_scheduler import error_message
+from exporters import EXPORT_FORMATS, export_results
 
-# 根据操作系统设置matplotlib中文字体支持
-if platform.system() == 'Windows':
-    matplotlib.rcParams['font.sans-serif'] = ['Microsoft YaHei']  # Windows的中文字体
-else:  # macOS
-    matplotlib.rcParams['font.sans-serif'] = ['Arial Unicode MS']  # macOS 系统自带的字体
-matplotlib.rcParams['axes.unicode_minus'] = False  # 解决负号显示问题
+# matplotlib、google-ads、requests、numpy 都不在启动时导入：
+# google-ads 在后台创建客户端时导入，matplotlib 在首次显示图表时导入，requests 随KGR计算器首次使用时导入，
+# numpy 随关键词库、结果排序和筛选、趋势序列等模块在首次使用时导入。
+# 窗口显示后由后台线程预先导入以下模块，首次使用时通常已经加载完成
+WARMUP_MODULES = ('numpy', 'keyword_store', 'result_sorter', 'result_filter', 'trend_chart', 'keyword_clusters',
+                  'matplotlib.figure', 'matplotlib.backends.backend_agg', 'kgr_calculator')
+# 窗口创建后延迟开始预加载的时间（毫秒），让首帧先完成绘制
+WARMUP_DELAY_MS = 100
+
+# 后台结果队列的轮询间隔（毫秒）
+QUEUE_POLL_INTERVAL_MS = 50
+# 流式结果每批最多包含的关键词数量
+STREAM_BATCH_SIZE = 200
+# 流式结果的最长交付间隔（秒）
+STREAM_FLUSH_INTERVAL = 0.1
+# 选择变化后延迟更新趋势区域的时间（毫秒），快速切换选择时只绘制最后一个关键词
+TREND_DEBOUNCE_MS = 60
+# 结果表格各列的排序键，直接取关键词创意中的类型化字段
+RESULT_SORT_KEYS = {
+    'keyword': lambda idea: idea.text,
+    'avg_monthly_searches': lambda idea: idea.avg_monthly_searches,
+    # 竞争度列使用竞争指数的值排序
+    'competition': lambda idea: idea.competition_index,
+    'competition_index': lambda idea: idea.competition_index,
+    'recent_growth': lambda idea: idea.recent_growth_percentage,
+    'growth': lambda idea: idea.growth_percentage,
+    'low_cpc': lambda idea: idea.low_cpc,
+    'high_cpc': lambda idea: idea.high_cpc,
+}
+# 筛选栏的数值范围条件：(标题, 最小值对应的列, 最大值对应的列)
+# CPC的最小值按最低出价、最大值按最高出价筛选，与本地关键词库的查询条件一致
+RESULT_FILTER_RANGES = (
+    ('搜索量', 'avg_monthly_searches', 'avg_monthly_searches'),
+    ('CPC', 'low_cpc', 'high_cpc'),
+    ('竞争指数', 'competition_index', 'competition_index'),
+)
+
+
+def load_matplotlib():
+    """
+    导入matplotlib的图表类并设置中文字体，首次创建图表时调用
+
+    Returns:
+        tuple: (Figure, FigureCanvasTkAgg)
+    """
+    import matplotlib
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+
+    # 根据操作系统设置matplotlib中文字体支持
+    if platform.system() == 'Windows':
+        matplotlib.rcParams['font.sans-serif'] = ['Microsoft YaHei']  # Windows的中文字体
+    else:  # macOS
+        matplotlib.rcParams['font.sans-serif'] = ['Arial Unicode MS']  # macOS 系统自带的字体
+    matplotlib.rcParams['axes.unicode_minus'] = False  # 解决负号显示问题
+    return Figure, FigureCanvasTkAgg
 
 class GoogleAdsKeywordTool:
     def __init__(self, root):
@@ -39,6 +87,40 @@ class GoogleAdsKeywordTool:
         self.root.geometry(f'{window_width}x{window_height}+{center_x}+{center_y}')
         
         self.service = None
+        # 搜索结果按规范化关键词索引，选择、KGR回填等按关键词查找都是O(1)
+        self.search_results = KeywordIndex()
+        # 已计算的KGR显示文本，按关键词记录，表格滚动复用项目时由format_result_row读取
+        self.kgr_texts = {}
+        # 已计算的KGR数值，关键词到 (kgr_avg, kgr_latest, allintitle_count) 的映射，用于导出
+        self.kgr_values = {}
+        # 结果排序器缓存各列的排序键和排列下标，sort_spec为当前的 (列名, 是否反向) 排序规则；
+        # 排序器、筛选器、趋势序列和关键词库都依赖numpy，在首次使用时创建
+        self._result_sorter = None
+        self.sort_spec = []
+        # 结果筛选器为关键词建立倒排索引并缓存数值列，filter_mask为当前筛选条件下每行是否显示，None表示不筛选
+        self._result_filter = None
+        self.filter_mask = None
+        # 尚未执行的筛选更新（root.after_idle返回的ID），连续输入时只筛选一次
+        self.filter_after_id = None
+        # 各关键词预先计算的趋势序列（搜索量和归一化指数），结果到达时按批计算，供对比图直接使用
+        self._trend_series = None
+        
+        # 当前搜索中最终获取失败的关键词（request_scheduler.KeywordFailure）
+        self.search_failures = []
+        # 当前搜索的近似变体聚类器，未合并变体时为None
+        self.keyword_clusters = None
+        # 当前搜索开始时服务的 (增量刷新统计, 重复请求合并统计) 快照，搜索完成时只报告这次搜索的部分
+        self.search_stats_start = None
+        
+        # 后台任务执行器，网络请求和抓取都在后台线程中执行
+        self.executor = ThreadPoolExecutor(max_workers=4)
+        # 后台任务结果队列，由主线程通过root.after轮询
+        self.result_queue = queue.Queue()
+        # 搜索代数，每次新搜索或取消时递增，用于丢弃过期的后台结果
+        self.search_generation = 0
+        self.search_future = None
+        # 尚未执行的趋势区域更新（root.after返回的ID）
+        self.trend_after_id = None
         
         # 创建左右分隔的主框架
         self.main_paned = ttk.PanedWindow(root, orient=tk.HORIZONTAL)
@@ -60,19 +142,26 @@ class GoogleAdsKeywordTool:
         self.status_text.pack(fill=tk.X)
         self.status_text.config(state=tk.DISABLED)
         
-        # 加载配置
-        self.load_config()
-        
-        # 初始化服务
+        # 关键词服务在后台线程中创建，完成前为None
         self.keyword_service = None
-        self.initialize_service()
-        
-        # 初始化KGR计算器
-        self.kgr_calculator = KGRCalculator()
+        self.service_initializing = False
+        
+        # allintitle数量缓存在本地以减少对 Google 搜索的访问，KGR计算器在首次使用时创建
+        current_dir = os.path.dirname(os.path.abspath(__file__))
+        self.allintitle_cache = AllintitleCache(os.path.join(current_dir, '.cache', 'allintitle.db'))
+        self.kgr_calculator = None
+        # 本地关键词库，保存每次搜索的结果、allintitle数量和种子来源，可离线按条件查询；
+        # 关键词服务在后台线程中创建时也会读取，首次创建时加锁
+        self.keyword_store_path = os.path.join(current_dir, '.cache', 'keywords.db')
+        self._keyword_store = None
+        self.keyword_store_lock = threading.Lock()
         
         # 创建输入区域
         self.create_input_area()
         
+        # 创建本地关键词库查询区域
+        self.create_local_query_area()
+        
         # 创建结果展示区域
         self.create_result_area()
         
@@ -82,12 +171,59 @@ class GoogleAdsKeywordTool:
         # 绑定单元格点击事件
         self.result_table.bind('<ButtonRelease-1>', self.handle_cell_click)
         
-        # 添加User-Agent池
-        self.user_agents = [
-            'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-            'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-            'Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:89.0) Gecko/20100101 Firefox/89.0',
-        ]
+        # 开始轮询后台结果队列
+        self.root.after(QUEUE_POLL_INTERVAL_MS, self.poll_result_queue)
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+        
+        # 初始化服务（后台线程），窗口显示后预加载图表和KGR计算用到的模块
+        self.initialize_service()
+        self.root.after(WARMUP_DELAY_MS, self.warm_up_modules)
+
+    def run_in_background(self, task, on_success, on_error, generation=None):
+        """
+        在后台线程中执行任务，结果通过队列交回主线程处理
+
+        Args:
+            task: 无参数的可调用对象
+            on_success: 成功回调，在主线程中以任务结果调用
+            on_error: 失败回调，在主线程中以异常对象调用
+            generation: 任务所属的搜索代数，为None时结果总是被处理
+
+        Returns:
+            Future: 后台任务
+        """
+        def worker():
+            try:
+                result = task()
+            except Exception as e:
+                self.result_queue.put((generation, on_error, e))
+            else:
+                self.result_queue.put((generation, on_success, result))
+
+        return self.executor.submit(worker)
+
+    def post_status(self, message, generation=None):
+        """从后台线程发送状态更新"""
+        self.result_queue.put((generation, self.update_status, message))
+
+    def poll_result_queue(self):
+        """在主线程中处理后台任务结果"""
+        try:
+            while True:
+                generation, callback, payload = self.result_queue.get_nowait()
+                # 丢弃已被新搜索取代的结果
+                if generation is not None and generation != self.search_generation:
+                    continue
+                callback(payload)
+        except queue.Empty:
+            pass
+        self.root.after(QUEUE_POLL_INTERVAL_MS, self.poll_result_queue)
+
+    def on_close(self):
+        """关闭窗口时停止后台任务"""
+        self.search_generation += 1
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.root.destroy()
 
     def load_refresh_token(self) -> str:
         """从refresh_token.txt加载refresh token"""
@@ -145,33 +281,97 @@ class GoogleAdsKeywordTool:
             raise Exception(f"加载配置失败: {str(e)}")
 
     def initialize_service(self):
-        """初始化关键词服务"""
-        try:
-            # 检查必要的配置文件是否存在
-            current_dir = os.path.dirname(os.path.abspath(__file__))
-            required_files = {
-                '.refresh_token': 'Refresh Token文件',
-                'config.yaml': 'YAML配置文件'
-            }
+        """初始化关键词服务，google-ads的导入和客户端创建在后台线程中进行，不阻塞窗口显示"""
+        # 检查必要的配置文件是否存在
+        current_dir = os.path.dirname(os.path.abspath(__file__))
+        required_files = {
+            '.refresh_token': 'Refresh Token文件',
+            'config.yaml': 'YAML配置文件'
+        }
+        
+        missing_files = []
+        for file_name, desc in required_files.items():
+            if not os.path.exists(os.path.join(current_dir, file_name)):
+                missing_files.append(f"{desc} ({file_name})")
+        
+        if missing_files:
+            error_msg = "缺少以下必要文件：\n" + "\n".join(missing_files)
+            self.update_status(error_msg)
+            messagebox.showerror("初始化失败", error_msg)
+            return
             
-            missing_files = []
-            for file_name, desc in required_files.items():
-                if not os.path.exists(os.path.join(current_dir, file_name)):
-                    missing_files.append(f"{desc} ({file_name})")
+        def task():
+            config = self.load_config()
+            # 数据已是最新的关键词不再请求API，跨月后只请求新发布的月份
+            return KeywordIdeasService(config, store=self.keyword_store)
             
-            if missing_files:
-                error_msg = "缺少以下必要文件：\n" + "\n".join(missing_files)
-                self.update_status(error_msg)
-                messagebox.showerror("初始化失败", error_msg)
-                return
+        self.service_initializing = True
+        self.update_status("正在初始化 Google Ads API 服务...")
+        self.run_in_background(task, self.on_service_ready, self.on_service_error)
+        
+    def on_service_ready(self, service):
+        """在主线程中接收后台创建的关键词服务"""
+        self.service_initializing = False
+        self.keyword_service = service
+        self.update_status("Google Ads API 服务初始化成功")
+        
+    def on_service_error(self, error):
+        """在主线程中处理服务初始化失败"""
+        self.service_initializing = False
+        error_msg = f"初始化服务失败: {str(error)}"
+        self.update_status(error_msg)
+        messagebox.showerror("错误", error_msg)
+        
+    def warm_up_modules(self):
+        """在后台线程中预先导入图表和KGR计算用到的模块"""
+        def task():
+            for name in WARMUP_MODULES:
+                importlib.import_module(name)
                 
-            config = self.load_config()
-            self.keyword_service = KeywordIdeasService(config)
-            self.update_status("Google Ads API 服务初始化成功")
-        except Exception as e:
-            error_msg = f"初始化服务失败: {str(e)}"
-            self.update_status(error_msg)
-            messagebox.showerror("错误", error_msg)
+        # 预加载失败不影响使用，首次使用时会再次导入并报告错误
+        self.run_in_background(task, lambda _: None, lambda error: None)
+        
+    @property
+    def keyword_store(self):
+        """本地关键词库，首次使用时创建"""
+        with self.keyword_store_lock:
+            if self._keyword_store is None:
+                from keyword_store import KeywordStore
+                self._keyword_store = KeywordStore(self.keyword_store_path)
+            return self._keyword_store
+
+    @property
+    def result_sorter(self):
+        """结果排序器，首次使用时创建"""
+        if self._result_sorter is None:
+            from result_sorter import ResultSorter
+            self._result_sorter = ResultSorter(RESULT_SORT_KEYS)
+        return self._result_sorter
+
+    @property
+    def result_filter(self):
+        """结果筛选器，首次使用时创建"""
+        if self._result_filter is None:
+            from result_filter import ResultFilter
+            filter_columns = {column for _, low_column, high_column in RESULT_FILTER_RANGES
+                              for column in (low_column, high_column)}
+            self._result_filter = ResultFilter({column: RESULT_SORT_KEYS[column] for column in filter_columns})
+        return self._result_filter
+
+    @property
+    def trend_series(self):
+        """趋势序列，首次使用时创建"""
+        if self._trend_series is None:
+            from trend_chart import TrendSeriesStore
+            self._trend_series = TrendSeriesStore()
+        return self._trend_series
+
+    def get_kgr_calculator(self):
+        """获取KGR计算器，首次使用时创建"""
+        if self.kgr_calculator is None:
+            from kgr_calculator import KGRCalculator
+            self.kgr_calculator = KGRCalculator(cache=self.allintitle_cache)
+        return self.kgr_calculator
 
     def create_input_area(self):
         """创建输入区域"""
@@ -193,6 +393,11 @@ class GoogleAdsKeywordTool:
         self.url_input = ttk.Entry(input_frame)
         self.url_input.pack(fill=tk.X, pady=(0, 10))
         
+        # 单复数、词序、标点和拼写不同的近似变体只请求一次历史数据，也只计算一次KGR
+        self.merge_variants = tk.BooleanVar(value=True)
+        ttk.Checkbutton(input_frame, text="合并近似变体（如单复数、词序不同的关键词）",
+                        variable=self.merge_variants).pack(fill=tk.X, pady=(0, 10))
+        
         # 按钮区域
         button_frame = ttk.Frame(input_frame)
         button_frame.pack(fill=tk.X)
@@ -205,6 +410,65 @@ class GoogleAdsKeywordTool:
 
         export_button = ttk.Button(button_frame, text="导出结果", command=self.export_results)
         export_button.pack(side=tk.LEFT, padx=5)
+
+        self.cancel_button = ttk.Button(button_frame, text="取消搜索", command=self.cancel_search, state=tk.DISABLED)
+        self.cancel_button.pack(side=tk.LEFT)
+
+        bulk_kgr_button = ttk.Button(button_frame, text="批量计算KGR", command=self.calculate_all_kgr)
+        bulk_kgr_button.pack(side=tk.LEFT, padx=5)
+
+        compare_button = ttk.Button(button_frame, text="加入对比", command=self.add_selected_to_comparison)
+        compare_button.pack(side=tk.LEFT)
+        
+    def create_local_query_area(self):
+        """创建本地关键词库查询区域，查询不访问API"""
+        query_frame = ttk.LabelFrame(self.left_frame, text="本地关键词库", padding=(10, 5, 10, 10))
+        query_frame.pack(fill=tk.X, padx=10, pady=(0, 10))
+        
+        ttk.Label(query_frame, text="最低月均搜索量:").pack(side=tk.LEFT)
+        self.query_min_volume = ttk.Entry(query_frame, width=8)
+        self.query_min_volume.pack(side=tk.LEFT, padx=(2, 10))
+        
+        ttk.Label(query_frame, text="最高竞争指数:").pack(side=tk.LEFT)
+        self.query_max_competition = ttk.Entry(query_frame, width=5)
+        self.query_max_competition.pack(side=tk.LEFT, padx=(2, 10))
+        
+        self.query_rising = tk.BooleanVar(value=False)
+        ttk.Checkbutton(query_frame, text="近3月上升", variable=self.query_rising).pack(side=tk.LEFT)
+        
+        query_button = ttk.Button(query_frame, text="查询本地库", command=self.query_local_store)
+        query_button.pack(side=tk.LEFT, padx=10)
+        
+    def create_filter_bar(self, parent):
+        """创建结果筛选栏，输入时即时筛选已有结果"""
+        filter_frame = ttk.Frame(parent)
+        filter_frame.pack(fill=tk.X, pady=(0, 5))
+        
+        text_row = ttk.Frame(filter_frame)
+        text_row.pack(fill=tk.X)
+        ttk.Label(text_row, text="筛选关键词:").pack(side=tk.LEFT)
+        self.filter_text = tk.StringVar()
+        ttk.Entry(text_row, textvariable=self.filter_text).pack(side=tk.LEFT, fill=tk.X, expand=True, padx=(2, 5))
+        ttk.Button(text_row, text="清除筛选", command=self.clear_filter).pack(side=tk.LEFT)
+        self.filter_count_label = ttk.Label(text_row, text="")
+        self.filter_count_label.pack(side=tk.LEFT, padx=(10, 0))
+        
+        # 每个数值条件一对最小值、最大值输入框，留空表示不限制
+        range_row = ttk.Frame(filter_frame)
+        range_row.pack(fill=tk.X, pady=(5, 0))
+        self.filter_range_vars = []
+        for title, low_column, high_column in RESULT_FILTER_RANGES:
+            ttk.Label(range_row, text=f"{title}:").pack(side=tk.LEFT)
+            low_var = tk.StringVar()
+            high_var = tk.StringVar()
+            ttk.Entry(range_row, textvariable=low_var, width=8).pack(side=tk.LEFT, padx=(2, 0))
+            ttk.Label(range_row, text="-").pack(side=tk.LEFT)
+            ttk.Entry(range_row, textvariable=high_var, width=8).pack(side=tk.LEFT, padx=(0, 10))
+            self.filter_range_vars.append((low_column, low_var, high_column, high_var))
+        
+        for var in [self.filter_text] + [var for _, low_var, _, high_var in self.filter_range_vars
+                                         for var in (low_var, high_var)]:
+            var.trace_add('write', self.schedule_filter)
         
     def create_result_area(self):
         """创建结果展示区域"""
@@ -212,6 +476,8 @@ class GoogleAdsKeywordTool:
         result_frame = ttk.LabelFrame(self.left_frame, text="搜索结果", padding=10)
         result_frame.pack(fill=tk.BOTH, expand=True, pady=(10, 0))
         
+        self.create_filter_bar(result_frame)
+        
         # 创建表格容器，用于放置表格和滚动条
         table_container = ttk.Frame(result_frame)
         table_container.pack(fill=tk.BOTH, expand=True)
@@ -220,20 +486,19 @@ class GoogleAdsKeywordTool:
         table_container.grid_rowconfigure(0, weight=1)
         table_container.grid_columnconfigure(0, weight=1)
         
-        # 创建表格
+        # 创建表格，只渲染可见窗口内的行，滚动时复用表格项目
         columns = ('keyword', 'avg_monthly_searches', 'competition', 'competition_index',
                   'recent_growth', 'growth', 'low_cpc', 'high_cpc', 'kgr')
-        self.result_table = ttk.Treeview(table_container, columns=columns, show='headings', height=20)
-        
-        # 创建自定义样式
-        style = ttk.Style()
-        style.configure('Custom.Treeview', rowheight=30)  # 设置更大的行高
+        self.result_view = VirtualTreeview(table_container, columns, self.format_result_row,
+                                           row_height=30, style='Custom.Treeview', height=20)
+        self.result_view.grid(row=0, column=0, sticky='nsew')
+        self.result_table = self.result_view.tree
         
         # 设置列标题和排序事件
         for col in columns:
             if col != 'kgr':  # KGR列不需要排序功能
                 self.result_table.heading(col, text=self.get_column_title(col),
-                                    command=lambda c=col: self.treeview_sort_column(self.result_table, c, False))
+                                    command=lambda c=col: self.on_sort_heading(c))
             else:
                 self.result_table.heading(col, text='KGR(avg/latest)')  # KGR列的标题
         
@@ -248,31 +513,34 @@ class GoogleAdsKeywordTool:
         self.result_table.column('high_cpc', width=100, minwidth=100)
         self.result_table.column('kgr', width=80, minwidth=80)  # KGR列的宽度
         
-        # 添加垂直滚动条
-        vsb = ttk.Scrollbar(table_container, orient=tk.VERTICAL, command=self.result_table.yview)
-        self.result_table.configure(yscrollcommand=vsb.set)
-        
-        # 添加水平滚动条
-        hsb = ttk.Scrollbar(table_container, orient=tk.HORIZONTAL, command=self.result_table.xview)
-        self.result_table.configure(xscrollcommand=hsb.set)
-        
-        # 使用网格布局放置表格和滚动条
-        self.result_table.grid(row=0, column=0, sticky='nsew')
-        vsb.grid(row=0, column=1, sticky='ns')
-        hsb.grid(row=1, column=0, sticky='ew')
-        
         # 绑定选择事件
-        self.result_table.bind('<<TreeviewSelect>>', self.on_item_select)
+        self.result_view.bind('<<RowSelect>>', self.on_item_select)
         self.result_table.bind('<Button-1>', self.on_click)
+        # 按住Shift点击列标题添加次要排序列
+        self.result_table.bind('<Shift-Button-1>', self.on_shift_heading_click)
+        # 滚动后表格项目会指向其他行，隐藏关键词输入框
+        self.result_view.bind('<<ViewScrolled>>', self.hide_current_entry)
         
-        # 存储Entry组件的字典
-        self.keyword_entries = {}
-        self.current_entry = None  # 添加当前显示的Entry引用
+        self.current_entry = None  # 当前显示的关键词Entry
+
+    def format_result_row(self, idea):
+        """将一个关键词创意转换为结果表格中各列的显示值"""
+        return (
+            idea.text,
+            self.format_number(idea.avg_monthly_searches),
+            idea.competition,
+            idea.competition_index,
+            self.format_growth_rate(idea.recent_growth_percentage),
+            self.format_growth_rate(idea.growth_percentage),
+            f"${idea.low_cpc:.2f}",
+            f"${idea.high_cpc:.2f}",
+            self.kgr_texts.get(idea.text, "点击计算")
+        )
 
     def hide_current_entry(self, event=None):
         """隐藏当前显示的Entry"""
         if self.current_entry:
-            self.current_entry.place_forget()
+            self.current_entry.destroy()
             self.current_entry = None
 
     def on_click(self, event):
@@ -294,27 +562,19 @@ class GoogleAdsKeywordTool:
             
         # 获取单元格的坐标
         bbox = self.result_table.bbox(row_id, 'keyword')
-        if not bbox:
+        idea = self.result_view.row_for_item(row_id)
+        if not bbox or idea is None:
             return
             
-        # 如果这个单元格还没有Entry
-        if row_id not in self.keyword_entries:
-            # 获取关键词
-            keyword = self.result_table.item(row_id)['values'][0]
-            
-            # 创建Entry，使用自定义样式
-            entry = ttk.Entry(self.result_table)
-            entry.insert(0, keyword)
-            entry.configure(state='readonly')  # 设置为只读
-            
-            # 绑定失去焦点事件
-            entry.bind('<FocusOut>', self.hide_current_entry)
-            
-            # 存储Entry
-            self.keyword_entries[row_id] = entry
+        # 表格项目会随滚动复用，每次点击都按当前对应的行创建Entry
+        entry = ttk.Entry(self.result_table)
+        entry.insert(0, idea.text)
+        entry.configure(state='readonly')  # 设置为只读
+        
+        # 绑定失去焦点事件
+        entry.bind('<FocusOut>', self.hide_current_entry)
         
         # 显示Entry，调整位置和大小以完全显示文本
-        entry = self.keyword_entries[row_id]
         entry.place(x=bbox[0], y=bbox[1], width=bbox[2], height=28)  # 固定高度为28像素
         entry.select_range(0, tk.END)  # 全选文本
         entry.focus_set()  # 设置焦点
@@ -339,13 +599,8 @@ class GoogleAdsKeywordTool:
         self.growth_label.pack(fill=tk.X, pady=(0, 10))
         self.growth_label.pack_forget()  # 初始隐藏
         
-        # 创建图表区域
-        self.fig = Figure(figsize=(6, 3), dpi=100)
-        self.ax = self.fig.add_subplot(111)
-        self.canvas = FigureCanvasTkAgg(self.fig, master=self.right_frame)
-        self.canvas_widget = self.canvas.get_tk_widget()
-        self.canvas_widget.pack(fill=tk.BOTH, expand=True, pady=(0, 10))
-        self.canvas_widget.pack_forget()  # 初始隐藏
+        # 图表区域在首次显示趋势时创建
+        self.trend_chart = None
         
         # 月度数据表格
         columns = ('month', 'searches', 'growth')
@@ -372,9 +627,115 @@ class GoogleAdsKeywordTool:
         # 初始隐藏表格和滚动条
         self.trend_table.pack_forget()
         scrollbar.pack_forget()
+
+        # 创建多关键词趋势对比区域
+        self.create_comparison_area()
+
+    def create_comparison_area(self):
+        """创建多关键词趋势对比区域，加入第一个关键词后显示"""
+        self.compare_frame = ttk.LabelFrame(self.right_frame, text="趋势对比", padding=5)
+
+        # 工具栏
+        toolbar = ttk.Frame(self.compare_frame)
+        toolbar.pack(fill=tk.X, pady=(0, 5))
+
+        remove_button = ttk.Button(toolbar, text="移除选中", command=self.remove_selected_from_comparison)
+        remove_button.pack(side=tk.LEFT)
+
+        clear_button = ttk.Button(toolbar, text="清空对比", command=self.clear_comparison)
+        clear_button.pack(side=tk.LEFT, padx=5)
+
+        # 勾选后显示归一化指数（100为各关键词的月均搜索量），便于比较量级不同的关键词的季节性
+        self.compare_index_var = tk.BooleanVar(value=False)
+        index_check = ttk.Checkbutton(toolbar, text="指数视图", variable=self.compare_index_var,
+                                      command=self.on_comparison_mode_change)
+        index_check.pack(side=tk.LEFT)
+
+        # 关键词列表代替图内图例，文字颜色与折线颜色一致
+        self.compare_body = ttk.Frame(self.compare_frame)
+        self.compare_body.pack(fill=tk.BOTH, expand=True)
+
+        self.compare_list = tk.Listbox(self.compare_body, width=24, selectmode=tk.EXTENDED, activestyle=tk.NONE)
+        self.compare_list.pack(side=tk.LEFT, fill=tk.Y)
+
+        # 对比图在首次加入关键词时创建
+        self.comparison_chart = None
+
+    def create_comparison_chart(self):
+        """创建对比图，matplotlib在此时才导入"""
+        from trend_chart import ComparisonChart
+
+        Figure, FigureCanvasTkAgg = load_matplotlib()
+        self.compare_fig = Figure(figsize=(6, 3), dpi=100)
+        self.compare_canvas = FigureCanvasTkAgg(self.compare_fig, master=self.compare_body)
+        # 对比图中每个关键词一条折线，加入关键词时只绘制新的折线
+        self.comparison_chart = ComparisonChart(self.compare_fig, self.compare_canvas)
+        self.compare_canvas.get_tk_widget().pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+
+    def add_selected_to_comparison(self):
+        """把结果表格中选中的关键词加入趋势对比"""
+        rows = self.result_view.selected_rows()
+        if not rows:
+            messagebox.showwarning("提示", "请先在结果表格中选择关键词")
+            return
+
+        series_list = [series for series in (self.trend_series.get(row.text) for row in rows) if series is not None]
+        if not series_list:
+            self.update_status("选中的关键词没有月度搜索数据")
+            return
+
+        if self.comparison_chart is None:
+            self.create_comparison_chart()
+        if not self.compare_frame.winfo_ismapped():
+            self.compare_frame.pack(side=tk.BOTTOM, fill=tk.BOTH, expand=True, pady=(10, 0))
+        self.comparison_chart.add_many(series_list)
+        self.refresh_comparison_list()
+
+    def remove_selected_from_comparison(self):
+        """从趋势对比中移除关键词列表中选中的关键词"""
+        keywords = [self.compare_list.get(i) for i in self.compare_list.curselection()]
+        if not keywords:
+            return
+        self.comparison_chart.remove_many(keywords)
+        self.refresh_comparison_list()
+
+    def clear_comparison(self):
+        """清空趋势对比并隐藏对比区域"""
+        self.comparison_chart.clear()
+        self.refresh_comparison_list()
+        self.compare_frame.pack_forget()
+
+    def on_comparison_mode_change(self):
+        """在搜索量和归一化指数之间切换对比图"""
+        from trend_chart import COMPARE_MODE_INDEX, COMPARE_MODE_VOLUME
+
+        self.comparison_chart.set_mode(COMPARE_MODE_INDEX if self.compare_index_var.get() else COMPARE_MODE_VOLUME)
+
+    def refresh_comparison_list(self):
+        """按对比图中的关键词重建列表，文字使用对应折线的颜色"""
+        from matplotlib.colors import to_hex
+
+        self.compare_list.delete(0, tk.END)
+        for i, series in enumerate(self.comparison_chart.series.values()):
+            self.compare_list.insert(tk.END, series.keyword)
+            self.compare_list.itemconfig(i, foreground=to_hex(self.comparison_chart.color_of(series.keyword)))
+        
+    def create_trend_chart(self):
+        """创建趋势图，matplotlib在此时才导入"""
+        from trend_chart import TrendChart
+
+        Figure, FigureCanvasTkAgg = load_matplotlib()
+        self.fig = Figure(figsize=(6, 3), dpi=100)
+        self.ax = self.fig.add_subplot(111)
+        self.canvas = FigureCanvasTkAgg(self.fig, master=self.right_frame)
+        # 趋势图保留同一条折线，切换关键词时只替换数据
+        self.trend_chart = TrendChart(self.fig, self.canvas)
+        self.canvas_widget = self.canvas.get_tk_widget()
         
     def show_trend_widgets(self):
         """显示趋势相关的所有组件"""
+        if self.trend_chart is None:
+            self.create_trend_chart()
         self.trend_title_label.pack(fill=tk.X, pady=(0, 10))
         self.trend_keyword_label.pack(fill=tk.X, pady=(0, 10))
         self.growth_label.pack(fill=tk.X, pady=(0, 10))
@@ -383,19 +744,26 @@ class GoogleAdsKeywordTool:
         
     def on_item_select(self, event):
         """处理表格项目选择事件"""
-        selection = self.result_table.selection()
-        if not selection:
+        selected = self.result_view.selected_rows()
+        if not selected:
             return
             
-        # 获取选中项
-        item = selection[0]
-        keyword = self.result_table.item(item)['values'][0]
-        
-        # 更新月度趋势数据
+        # 合并快速连续的选择变化，只更新最后选中的关键词
+        if self.trend_after_id is not None:
+            self.root.after_cancel(self.trend_after_id)
+        keyword = selected[0].text
+        self.trend_after_id = self.root.after(TREND_DEBOUNCE_MS, lambda: self.show_debounced_trend(keyword))
+        
+    def show_debounced_trend(self, keyword):
+        """执行延迟的趋势区域更新"""
+        self.trend_after_id = None
         self.update_monthly_trend(keyword)
         
     def update_monthly_trend(self, keyword):
         """更新月度趋势数据显示"""
+        import numpy as np
+        from keyword_analytics import mom_growth, volumes_matrix
+
         # 显示所有趋势相关的组件
         self.show_trend_widgets()
         
@@ -404,12 +772,18 @@ class GoogleAdsKeywordTool:
             self.trend_table.delete(item)
             
         # 获取选中关键词的数据
-        keyword_data = next((data for data in self.search_results if data.text == keyword), None)
+        keyword_data = self.search_results.get(keyword)
         if not keyword_data:
             return
             
-        # 更新关键词标签
-        self.trend_keyword_label.config(text=f"关键词: {keyword}")
+        # 更新关键词标签，合并了近似变体时附带变体数量和汇总搜索量
+        keyword_text = f"关键词: {keyword}"
+        cluster = self.keyword_clusters.cluster_of(keyword) if self.keyword_clusters is not None else None
+        if cluster is not None and cluster.size > 1:
+            variants = [member for member in cluster.members if member != keyword]
+            keyword_text += (f"\n包含 {len(variants)} 个近似变体，汇总月均搜索量 {self.format_number(cluster.total_volume)}: "
+                             f"{', '.join(variants[:5])}{' ...' if len(variants) > 5 else ''}")
+        self.trend_keyword_label.config(text=keyword_text)
         
         # 更新增长率标签
         growth_text = f"年增长: {self.format_growth_rate(keyword_data.growth_percentage)}"
@@ -426,60 +800,46 @@ class GoogleAdsKeywordTool:
             
         self.growth_label.config(text=f"{growth_text}    {recent_growth_text}")
         
-        # 按时间倒序排列月度数据
-        monthly_data = sorted(keyword_data.monthly_searches, key=lambda x: x.year_month, reverse=True)
-        
-        # 填充表格
-        for i in range(len(monthly_data)):
-            current_volume = monthly_data[i].monthly_searches
-            if i < len(monthly_data) - 1:  # 还有下一个月的数据（较早的月份）
-                prev_volume = monthly_data[i+1].monthly_searches  # 上个月（较早的月份）
-                if prev_volume == 0:
-                    growth = float('inf') if current_volume > 0 else 0
-                else:
-                    growth = ((current_volume - prev_volume) / prev_volume) * 100
-                growth_text = "∞" if growth == float('inf') else f"{growth:.1f}%"
-            else:
+        # 构建按时间正序的搜索量行，一次性计算环比增长
+        months, volumes = volumes_matrix([keyword_data.monthly_searches])
+        volumes = volumes[0]
+        growth_row = mom_growth(volumes[None, :])[0]
+        
+        # 按时间倒序填充表格
+        for i in reversed(range(len(months))):
+            if np.isnan(volumes[i]):
+                continue
+            growth = growth_row[i]
+            if np.isnan(growth):
                 growth_text = "-"
+            else:
+                growth_text = "∞" if growth == float('inf') else f"{growth:.1f}%"
                 
             self.trend_table.insert('', tk.END, values=(
-                monthly_data[i].year_month,
-                self.format_number(monthly_data[i].monthly_searches),
+                months[i],
+                self.format_number(int(volumes[i])),
                 growth_text
             ))
             
         # 更新趋势图
-        self.update_trend_chart(monthly_data)
-        
-    def update_trend_chart(self, monthly_data):
-        """更新趋势图"""
-        # 清空现有图表
-        self.ax.clear()
-        
-        # 准备数据
-        dates = [data.year_month for data in reversed(monthly_data)]  # 按时间正序
-        volumes = [data.monthly_searches for data in reversed(monthly_data)]
+        self.update_trend_chart(months, volumes)
         
-        # 绘制折线图
-        self.ax.plot(dates, volumes, marker='o')
+    def update_trend_chart(self, dates, volumes):
+        """更新趋势图，坐标轴不变时只重绘折线
         
-        # 设置标签和标题
-        self.ax.set_xlabel('月份')
-        self.ax.set_ylabel('搜索量')
-        
-        # 旋转x轴标签以防重叠
-        self.ax.tick_params(axis='x', rotation=45)
-        
-        # 自动调整布局
-        self.fig.tight_layout()
-        
-        # 刷新画布
-        self.canvas.draw()
+        Args:
+            dates: 按时间正序的月份
+            volumes: 对应的搜索量
+        """
+        self.trend_chart.update(dates, volumes)
 
     def search_keywords(self):
         """搜索关键词"""
         if not self.keyword_service:
-            messagebox.showerror("错误", "Google Ads API 服务未初始化")
+            if self.service_initializing:
+                messagebox.showinfo("提示", "Google Ads API 服务正在初始化，请稍候再试")
+            else:
+                messagebox.showerror("错误", "Google Ads API 服务未初始化")
             return
             
         # 获取输入的关键词
@@ -491,40 +851,219 @@ class GoogleAdsKeywordTool:
             messagebox.showwarning("提示", "请输入关键词或网址")
             return
             
-        try:
-            # 清空现有结果
-            for item in self.result_table.get_children():
-                self.result_table.delete(item)
-                
-            self.update_status("正在搜索关键词创意...")
-            
-            # 调用服务获取关键词创意
-            self.search_results = self.keyword_service.generate_keyword_ideas(
+        generation = self.reset_results()
+        # 每次搜索使用新的聚类器，结果表格中只显示每组的代表
+        if self.merge_variants.get():
+            from keyword_clusters import KeywordClusterer
+            clusterer = KeywordClusterer()
+        else:
+            clusterer = None
+        self.keyword_clusters = clusterer
+        
+        self.update_status("正在搜索关键词创意...")
+        self.cancel_button.config(state=tk.NORMAL)
+        
+        keyword_service = self.keyword_service
+        keyword_store = self.keyword_store
+        self.search_stats_start = (keyword_service.refresh_stats(), keyword_service.dedup_stats())
+        # 与命令行模式的种子格式一致，记录在本地关键词库中作为结果的来源
+        seed = ", ".join(keywords + ([url] if url else []))
+        
+        def task():
+            # 在后台线程中流式获取关键词创意，按批次交给主线程插入表格
+            # 各分块的结果附带构建时算出的搜索量矩阵，合并后计算趋势序列时直接使用
+            pending = []
+            pending_count = 0
+            last_flush = time.monotonic()
+            batches = keyword_service.iter_keyword_idea_batches(
                 keywords=keywords if keywords else None,
-                url=url if url else None
+                url=url if url else None,
+                progress_callback=lambda message: self.post_status(message, generation),
+                failure_callback=lambda failure: self.result_queue.put((generation, self.record_search_failure, failure)),
+                clusterer=clusterer
             )
-
-            # 显示结果
-            for idea in self.search_results:
-                self.result_table.insert('', tk.END, values=(
-                    idea.text,
-                    self.format_number(idea.avg_monthly_searches),
-                    idea.competition,
-                    idea.competition_index,
-                    self.format_growth_rate(idea.recent_growth_percentage),
-                    self.format_growth_rate(idea.growth_percentage),
-                    f"${idea.low_cpc:.2f}",
-                    f"${idea.high_cpc:.2f}",
-                    "点击计算"  # KGR列的初始值
-                ))
+            
+            def flush():
+                batch = KeywordIdeaBatch.concat(pending)
+                # 指标已在增量刷新时写入本地关键词库，这里只记录种子来源
+                keyword_store.save_seeds([idea.text for idea in batch], seed)
+                self.result_queue.put((generation, self.append_search_results, batch))
                 
-            self.update_status(f"成功获取 {len(self.search_results)} 个关键词的相关数据")
-        except GoogleAdsException as ex:
-            self.update_status(f"Google Ads API 错误: {ex.error.message}")
-            messagebox.showerror("API错误", ex.error.message)
-        except Exception as e:
-            self.update_status(f"发生错误: {str(e)}")
-            messagebox.showerror("错误", str(e))
+            for chunk in batches:
+                # 搜索已被取消或取代，停止迭代
+                if generation != self.search_generation:
+                    batches.close()
+                    return
+                pending.append(chunk)
+                pending_count += len(chunk)
+                if pending_count >= STREAM_BATCH_SIZE or time.monotonic() - last_flush >= STREAM_FLUSH_INTERVAL:
+                    flush()
+                    pending = []
+                    pending_count = 0
+                    last_flush = time.monotonic()
+            if pending:
+                flush()
+            
+        self.search_future = self.run_in_background(task, self.on_search_done, self.on_search_error, generation)
+        
+    def reset_results(self):
+        """清空现有结果，新的搜索或查询会取代仍在进行中的搜索
+        
+        Returns:
+            int: 新的搜索代数
+        """
+        from result_filter import filtered_order
+
+        self.hide_current_entry()
+        self.search_results = KeywordIndex()
+        self.kgr_texts = {}
+        self.kgr_values = {}
+        self.search_failures = []
+        self.keyword_clusters = None
+        self.trend_series.clear()
+        self.result_sorter.reset(self.search_results)
+        self.sort_spec = []
+        self.update_sort_headings()
+        # 筛选条件在新结果上保持生效
+        self.result_filter.reset(self.search_results)
+        self.filter_mask = self.result_filter.mask(*self.filter_conditions())
+        self.result_view.set_rows(self.search_results, filtered_order(self.filter_mask))
+        self.update_filter_count()
+        
+        self.search_generation += 1
+        return self.search_generation
+        
+    def query_local_store(self):
+        """按条件查询本地关键词库，结果显示在结果表格中"""
+        try:
+            min_volume = int(self.query_min_volume.get()) if self.query_min_volume.get().strip() else None
+            max_competition = float(self.query_max_competition.get()) if self.query_max_competition.get().strip() else None
+        except ValueError:
+            messagebox.showwarning("提示", "请输入有效的数字")
+            return
+        rising = self.query_rising.get()
+        
+        generation = self.reset_results()
+        self.cancel_button.config(state=tk.DISABLED)
+        keyword_store = self.keyword_store
+        
+        def task():
+            # 在后台线程中查询，同时读取已保存allintitle数量的关键词的KGR
+            start = time.perf_counter()
+            ideas = keyword_store.query(min_volume=min_volume, max_competition_index=max_competition, rising=rising)
+            kgr_values = keyword_store.load_kgr_values([idea.text for idea in ideas])
+            return ideas, kgr_values, time.perf_counter() - start
+            
+        def on_done(result):
+            ideas, kgr_values, elapsed = result
+            self.append_search_results(ideas)
+            for keyword, value in kgr_values.items():
+                if keyword not in self.kgr_values:
+                    self.kgr_values[keyword] = value
+                    self.kgr_texts[keyword] = self.format_kgr(*value[:2])
+            self.result_view.refresh()
+            self.build_filter_index(generation)
+            self.update_status(f"本地关键词库中找到 {len(ideas)} 个关键词，耗时 {elapsed * 1000:.1f} ms")
+            
+        def on_error(error):
+            messagebox.showerror("错误", f"查询本地关键词库时出错：{str(error)}")
+            
+        self.run_in_background(task, on_done, on_error, generation)
+        
+    def append_search_results(self, ideas):
+        """在主线程中追加一批搜索结果"""
+        import numpy as np
+
+        # 不同批次中重复的关键词只保留第一次出现的结果
+        start = len(self.search_results)
+        batch = ideas
+        ideas = self.search_results.extend(ideas)
+        if not ideas:
+            return
+        if isinstance(batch, KeywordIdeaBatch):
+            # 附带的搜索量矩阵只保留实际加入的行
+            ideas = batch if len(ideas) == len(batch) else batch.subset(ideas)
+            
+        # 已缓存allintitle数量的关键词直接显示KGR
+        kgr_calculator = self.get_kgr_calculator()
+        cached_counts = kgr_calculator.get_cached_counts([idea.text for idea in ideas])
+        for idea in ideas:
+            if idea.text in cached_counts and idea.monthly_searches:
+                kgr_avg, kgr_latest = kgr_calculator.compute_kgr(
+                    cached_counts[idea.text], idea.monthly_searches[-1].monthly_searches, idea.avg_monthly_searches
+                )
+                self.kgr_values[idea.text] = (kgr_avg, kgr_latest, cached_counts[idea.text])
+                self.kgr_texts[idea.text] = self.format_kgr(kgr_avg, kgr_latest)
+        
+        # 整批计算趋势序列（复用批次附带的搜索量矩阵），加入对比时不再逐个解析月度数据
+        self.trend_series.add_batch(ideas)
+        
+        # 表格只重新渲染可见窗口，追加的开销与结果总数无关
+        self.result_sorter.rows_appended()
+        self.result_filter.rows_appended()
+        if self.filter_mask is not None:
+            self.filter_mask = self.result_filter.mask(*self.filter_conditions())
+        if self.sort_spec:
+            # 排序时新行按排序规则并入显示顺序，排序键已缓存，只为新行计算；保持当前的滚动位置
+            self.update_view_order(keep_position=True)
+        elif self.filter_mask is None:
+            self.result_view.rows_changed()
+        else:
+            # 筛选时只显示满足条件的新行
+            self.result_view.rows_changed((np.flatnonzero(self.filter_mask[start:]) + start).tolist())
+        self.update_filter_count()
+            
+    def on_search_done(self, _):
+        """在主线程中完成搜索"""
+        self.search_future = None
+        self.cancel_button.config(state=tk.DISABLED)
+        self.build_filter_index(self.search_generation)
+        
+        self.update_status(f"成功获取 {len(self.search_results)} 个关键词的相关数据")
+        if self.search_failures:
+            failed = sum(len(failure.keywords) for failure in self.search_failures)
+            self.update_status(f"{failed} 个关键词在重试后仍获取失败，可稍后重新搜索")
+        refresh_start, dedup_start = self.search_stats_start
+        stats = self.keyword_service.refresh_stats(since=refresh_start)
+        self.update_status(f"本地数据 {stats['fresh']} 个，增量刷新 {stats['incremental']} 个，完整请求 {stats['full']} 个，"
+                           f"避免 {stats['api_calls_avoided']} / {stats['baseline_calls']} 次API调用")
+        stats = self.keyword_service.dedup_stats(since=dedup_start)
+        if stats['coalesced']:
+            self.update_status(f"合并重复请求 {stats['coalesced']} 个关键词，占 {stats['coalesce_rate']:.1%}")
+        if self.keyword_clusters is not None:
+            stats = self.keyword_clusters.stats()
+            self.update_status(f"{stats['keywords']} 个关键词创意合并为 {stats['clusters']} 组近似变体，"
+                               f"少请求 {stats['merged']} 个关键词的历史数据")
+            
+    def record_search_failure(self, failure):
+        """在主线程中记录重试后仍获取失败的关键词"""
+        self.search_failures.append(failure)
+        self.update_status(str(failure))
+        
+    def on_search_error(self, error):
+        """在主线程中处理搜索错误"""
+        self.search_future = None
+        self.cancel_button.config(state=tk.DISABLED)
+        
+        from google.ads.googleads.errors import GoogleAdsException
+        if isinstance(error, GoogleAdsException):
+            message = error_message(error)
+            self.update_status(f"Google Ads API 错误: {message} [Request ID: {error.request_id}]")
+            messagebox.showerror("API错误", f"{message}\n\nRequest ID: {error.request_id}")
+        else:
+            self.update_status(f"发生错误: {str(error)}")
+            messagebox.showerror("错误", str(error))
+            
+    def cancel_search(self):
+        """取消正在进行的搜索，之后返回的结果将被丢弃"""
+        if not self.search_future:
+            return
+            
+        self.search_future.cancel()
+        self.search_future = None
+        self.search_generation += 1
+        self.cancel_button.config(state=tk.DISABLED)
+        self.update_status("已取消当前搜索")
 
     def clear_keywords(self):
         """清空输入"""
@@ -539,84 +1078,130 @@ class GoogleAdsKeywordTool:
             self.status_text.see(tk.END)
             self.status_text.config(state=tk.DISABLED)
 
-    def treeview_sort_column(self, tree, col, reverse):
+    def on_sort_heading(self, col, additive=False):
         """
-        表格列排序
+        处理列标题点击：点击当前唯一的排序列时切换方向，否则改为按该列升序排序
         
         Args:
-            tree: Treeview对象
             col: 列名
-            reverse: 是否反向排序
+            additive: 为True时把该列加入（或切换）多列排序规则，而不是替换
         """
-        # 获取所有项目的ID
-        l = [(tree.set(k, col), k) for k in tree.get_children('')]
-        
-        # 根据列类型进行不同的排序处理
-        if col in ['avg_monthly_searches', 'competition_index', 'low_cpc', 'high_cpc']:
-            # 数值型列，需要转换为float进行排序
-            l.sort(key=lambda x: float(x[0].replace('$', '').replace(',', '')), reverse=reverse)
-        elif col in ['recent_growth', 'growth']:
-            # 增长率列，需要特殊处理无穷大值
-            def growth_sort_key(x):
-                value = x[0].replace('%', '').strip()
-                if value == '∞':
-                    return float('inf')
-                return float(value)
-            l.sort(key=growth_sort_key, reverse=reverse)
-        elif col == 'competition':
-            # 竞争度列，使用竞争指数的值排序
-            competition_index_list = [(tree.set(k, 'competition_index'), k) for k in tree.get_children('')]
-            competition_index_list.sort(key=lambda x: float(x[0]), reverse=reverse)
-            # 重新排序
-            for index, (val, k) in enumerate(competition_index_list):
-                tree.move(k, '', index)
-            # 更新标题并返回，避免重复排序
-            for column in tree['columns']:
-                if column == col:
-                    tree.heading(column, text=f"{self.get_column_title(column)} {'↓' if reverse else '↑'}")
-                else:
-                    tree.heading(column, text=self.get_column_title(column))
-            # 重新绑定点击事件，切换排序方向
-            tree.heading(col, command=lambda: self.treeview_sort_column(tree, col, not reverse))
-            return
-        else:
-            # 文本列，直接排序
-            l.sort(reverse=reverse)
-            
-        # 重新排序
-        for index, (val, k) in enumerate(l):
-            tree.move(k, '', index)
-            
-        # 更新所有列的标题，添加排序指示器
-        for column in tree['columns']:
-            if column == col:
-                tree.heading(column, text=f"{self.get_column_title(column)} {'↓' if reverse else '↑'}")
+        spec = list(self.sort_spec)
+        columns = [column for column, _ in spec]
+        if additive:
+            if col in columns:
+                index = columns.index(col)
+                spec[index] = (col, not spec[index][1])
             else:
-                tree.heading(column, text=self.get_column_title(column))
+                spec.append((col, False))
+        elif columns == [col]:
+            spec = [(col, not spec[0][1])]
+        else:
+            spec = [(col, False)]
+        self.sort_results(spec)
+
+    def on_shift_heading_click(self, event):
+        """按住Shift点击列标题时添加次要排序列"""
+        if self.result_table.identify_region(event.x, event.y) != "heading":
+            return
+        col = self.result_table.column(self.result_table.identify_column(event.x), 'id')
+        if col in RESULT_SORT_KEYS:
+            self.on_sort_heading(col, additive=True)
+        return "break"
+
+    def sort_results(self, spec):
+        """
+        按一列或多列对结果排序，排列下标按列缓存，只改变表格的显示顺序
         
-        # 重新绑定点击事件，切换排序方向
-        tree.heading(col, command=lambda: self.treeview_sort_column(tree, col, not reverse))
+        Args:
+            spec: (列名, 是否反向) 列表，排在前面的列优先
+        """
+        self.sort_spec = list(spec)
+        self.update_view_order()
+        self.update_sort_headings()
 
-    def extract_numeric_value(self, text):
+    def update_view_order(self, keep_position=False):
         """
-        从文本中提取数值
+        按当前的排序规则和筛选结果设置表格的显示顺序
         
         Args:
-            text: 要处理的文本
-            
+            keep_position: 为True时保持表格的滚动位置，否则回到顶部
+        """
+        from result_filter import filtered_order
+
+        self.hide_current_entry()
+        order = self.result_sorter.sort(self.sort_spec) if self.sort_spec else None
+        order = filtered_order(self.filter_mask, order)
+        self.result_view.set_order(order.tolist() if order is not None else None, keep_position)
+
+    def filter_conditions(self):
+        """
+        读取筛选栏中的条件，无法解析的数值视为不限制（输入过程中可能暂时不完整）
+        
         Returns:
-            float: 提取的数值，如果无法提取则返回0
+            tuple: (筛选文本, 数值范围条件)
         """
-        try:
-            # 移除千位分隔符和货币符号
-            text = text.replace(',', '').replace('$', '')
-            # 移除百分号并转换为浮点数
-            if '%' in text:
-                return float(text.replace('%', ''))
-            return float(text)
-        except (ValueError, TypeError):
-            return 0
-    
+        ranges = {}
+        for low_column, low_var, high_column, high_var in self.filter_range_vars:
+            for column, var, bound in ((low_column, low_var, 0), (high_column, high_var, 1)):
+                try:
+                    value = float(var.get().replace(',', ''))
+                except ValueError:
+                    continue
+                bounds = list(ranges.get(column, (None, None)))
+                bounds[bound] = value
+                ranges[column] = tuple(bounds)
+        return self.filter_text.get(), ranges
+
+    def schedule_filter(self, *_):
+        """筛选条件变化时调用，同一轮事件中的多次变化只筛选一次"""
+        if self.filter_after_id is None:
+            self.filter_after_id = self.root.after_idle(self.apply_filter)
+
+    def apply_filter(self):
+        """按筛选栏中的条件重新筛选结果"""
+        self.filter_after_id = None
+        self.filter_mask = self.result_filter.mask(*self.filter_conditions())
+        self.update_view_order()
+        self.update_filter_count()
+
+    def clear_filter(self):
+        """清空筛选条件，显示全部结果"""
+        self.filter_text.set("")
+        for _, low_var, _, high_var in self.filter_range_vars:
+            low_var.set("")
+            high_var.set("")
+
+    def update_filter_count(self):
+        """在筛选栏中显示筛选后的行数"""
+        if self.filter_mask is None:
+            self.filter_count_label.config(text="")
+        else:
+            self.filter_count_label.config(text=f"显示 {len(self.result_view)} / {len(self.search_results)}")
+
+    def build_filter_index(self, generation):
+        """
+        结果到齐后在后台线程中为关键词建立筛选索引，完成前新行逐行匹配
+        
+        Args:
+            generation: 结果所属的搜索代数，新的搜索开始后索引被丢弃
+        """
+        from result_filter import build_index
+
+        texts = [idea.text for idea in self.search_results]
+        self.run_in_background(lambda: build_index(texts), self.result_filter.install,
+                               lambda error: self.update_status(f"建立筛选索引失败: {str(error)}"), generation)
+
+    def update_sort_headings(self):
+        """更新列标题中的排序指示器，多列排序时附带优先级序号"""
+        for column in self.result_table['columns']:
+            self.result_table.heading(column, text=self.get_column_title(column))
+        for priority, (column, reverse) in enumerate(self.sort_spec, start=1):
+            indicator = '↓' if reverse else '↑'
+            if len(self.sort_spec) > 1:
+                indicator += str(priority)
+            self.result_table.heading(column, text=f"{self.get_column_title(column)} {indicator}")
+
     def get_column_title(self, column):
         """
         获取列的原始标题
@@ -651,54 +1236,49 @@ class GoogleAdsKeywordTool:
         return f"{number:,}"
 
     def export_results(self):
-        """导出搜索结果到CSV文件"""
-        if not hasattr(self, 'search_results') or not self.search_results:
+        """在后台线程中分批导出搜索结果，包含月度搜索量和KGR"""
+        if not self.search_results:
             messagebox.showwarning("提示", "没有可导出的搜索结果")
             return
             
-        # 让用户选择保存位置
+        # 让用户选择保存位置和格式
         file_path = filedialog.asksaveasfilename(
             defaultextension='.csv',
-            filetypes=[('CSV files', '*.csv')],
+            filetypes=[
+                ('CSV files', '*.csv'),
+                ('JSON Lines files', '*.jsonl'),
+                ('Parquet files', '*.parquet'),
+                ('Arrow files', '*.arrow *.feather'),
+            ],
             title='选择保存位置'
         )
         
         if not file_path:  # 用户取消了保存
             return
             
-        try:
-            with open(file_path, 'w', newline='', encoding='utf-8-sig') as f:  # 使用 utf-8-sig 以支持Excel正确显示中文
-                writer = csv.writer(f)
-                # 写入表头
-                writer.writerow([
-                    '关键词',
-                    '月均搜索量',
-                    '竞争度',
-                    '竞争指数',
-                    '近三月增长率',
-                    '年增长率',
-                    '首页最低CPC',
-                    '首页最高CPC'
-                ])
-                
-                # 写入数据
-                for idea in self.search_results:
-                    writer.writerow([
-                        idea.text,
-                        idea.avg_monthly_searches,
-                        idea.competition,
-                        idea.competition_index,
-                        f"{idea.recent_growth_percentage:.1f}%" if idea.recent_growth_percentage != float('inf') else "∞",
-                        f"{idea.growth_percentage:.1f}%" if idea.growth_percentage != float('inf') else "∞",
-                        f"${idea.low_cpc:.2f}",
-                        f"${idea.high_cpc:.2f}"
-                    ])
-                    
-            self.update_status(f"搜索结果已导出到：{file_path}")
+        if os.path.splitext(file_path)[1].lower() not in EXPORT_FORMATS:
+            messagebox.showerror("错误", f"不支持的导出格式，支持: {', '.join(EXPORT_FORMATS)}")
+            return
+            
+        # 导出期间结果可能继续追加，只导出当前已有的行；KGR数值复制一份以免与主线程同时修改
+        rows = self.search_results
+        kgr_values = dict(self.kgr_values)
+        self.update_status(f"正在导出 {len(rows)} 个关键词...")
+        
+        def task():
+            return export_results(
+                rows, file_path, kgr_values=kgr_values,
+                progress_callback=lambda done, total: self.post_status(f"已导出 {done}/{total} 个关键词")
+            )
+            
+        def on_done(count):
+            self.update_status(f"{count} 个关键词已导出到：{file_path}")
             messagebox.showinfo("成功", "搜索结果导出成功！")
             
-        except Exception as e:
-            messagebox.showerror("错误", f"导出失败：{str(e)}")
+        def on_error(error):
+            messagebox.showerror("错误", f"导出失败：{str(error)}")
+            
+        self.run_in_background(task, on_done, on_error)
 
     def handle_cell_click(self, event):
         """处理单元格点击事件"""
@@ -710,50 +1290,136 @@ class GoogleAdsKeywordTool:
             
             # 如果点击的是KGR列（第9列）
             if column == '#9' and item:
-                self.calculate_kgr(item)
+                idea = self.result_view.row_for_item(item)
+                if idea is not None:
+                    self.calculate_kgr(idea)
 
-    def calculate_kgr(self, item_id):
-        """计算KGR值"""
-        item = self.result_table.item(item_id)
-        values = item['values']
+    def calculate_kgr(self, keyword_data):
+        """计算KGR值
+        
+        Args:
+            keyword_data: 关键词创意
+        """
+        keyword = keyword_data.text
         
         # 如果已经计算过KGR，就不重复计算
-        if values[8] != "点击计算":
+        if self.kgr_texts.get(keyword, "点击计算") != "点击计算":
             return
             
-        # 获取关键词
-        keyword = values[0]
-        
-        # 从搜索结果中找到对应的关键词数据
-        keyword_data = None
-        for idea in self.search_results:
-            if idea.text == keyword:
-                keyword_data = idea
-                break
-                
-        if not keyword_data or not keyword_data.monthly_searches:
+        if not keyword_data.monthly_searches:
             messagebox.showerror("错误", "无法获取关键词的历史数据")
             return
             
-        try:
-            self.update_status(f"计算 '{keyword}' 的KGR，这个功能需要访问 Google 搜索，可能会受到 Google 的访问限制，注意控制使用频率...")
-
-            # 获取最近一个月的搜索量
-            latest_search_volume = keyword_data.monthly_searches[-1].monthly_searches
-            
-            # 计算KGR
-            kgr_avg, kgr_latest, allintitle_count = self.kgr_calculator.calculate(keyword, latest_search_volume, keyword_data.avg_monthly_searches)
+        self.update_status(f"计算 '{keyword}' 的KGR，这个功能需要访问 Google 搜索，可能会受到 Google 的访问限制，注意控制使用频率...")
+        
+        # 获取最近一个月的搜索量
+        latest_search_volume = keyword_data.monthly_searches[-1].monthly_searches
+        avg_monthly_searches = keyword_data.avg_monthly_searches
+        
+        # 标记为计算中，避免重复提交
+        self.set_kgr_cell(keyword, "计算中...")
+        kgr_calculator = self.get_kgr_calculator()
+        
+        keyword_store = self.keyword_store
+        
+        def task():
+            # 在后台线程中计算KGR，allintitle数量同时保存到本地关键词库
+            result = kgr_calculator.calculate(keyword, latest_search_volume, avg_monthly_searches, raise_errors=True)
+            keyword_store.save_allintitle_counts({keyword: result[2]})
+            return result
             
+        def on_done(result):
+            kgr_avg, kgr_latest, allintitle_count = result
             # 更新表格中的KGR值
-            values = list(values)
-            values[8] = f"{kgr_avg:.3f} ({kgr_latest:.3f})"  # KGR值保留三位小数
-            self.result_table.item(item_id, values=values)
+            self.set_kgr_result(keyword, result)
             
             # 更新状态
-            self.update_status(f"KGR计算完成 - 月均搜索量： {keyword_data.avg_monthly_searches}, 最近一个月搜索量: {latest_search_volume}, allintitle: {allintitle_count}")
+            self.update_status(f"KGR计算完成 - 月均搜索量： {avg_monthly_searches}, 最近一个月搜索量: {latest_search_volume}, allintitle: {allintitle_count}")
+            
+        def on_error(error):
+            self.set_kgr_cell(keyword, "点击计算")
+            messagebox.showerror("错误", f"计算KGR时出错：{str(error)}")
+            
+        self.run_in_background(task, on_done, on_error, self.search_generation)
+
+    def format_kgr(self, kgr_avg, kgr_latest):
+        """格式化KGR显示，保留三位小数"""
+        return f"{kgr_avg:.3f} ({kgr_latest:.3f})"
+
+    def set_kgr_cell(self, keyword, text):
+        """更新某个关键词的KGR显示，该行不在可见窗口内时不需要渲染"""
+        self.kgr_texts[keyword] = text
+        row_index = self.search_results.index_of(keyword)
+        if row_index is not None:
+            self.result_view.refresh_row(row_index)
+
+    def set_kgr_result(self, keyword, result):
+        """记录某个关键词的KGR计算结果并更新显示
+        
+        Args:
+            keyword: 关键词
+            result: (kgr_avg, kgr_latest, allintitle_count)
+        """
+        kgr_avg, kgr_latest, _ = result
+        self.kgr_values[keyword] = tuple(result)
+        self.set_kgr_cell(keyword, self.format_kgr(kgr_avg, kgr_latest))
+
+    def calculate_all_kgr(self):
+        """批量计算所有未计算行的KGR值，结果逐个回填到表格"""
+        if not self.search_results:
+            messagebox.showwarning("提示", "没有可计算的搜索结果")
+            return
+            
+        items = []
+        for idea in self.search_results:
+            keyword = idea.text
+            if self.kgr_texts.get(keyword, "点击计算") != "点击计算" or not idea.monthly_searches:
+                continue
+            items.append((keyword, idea.monthly_searches[-1].monthly_searches, idea.avg_monthly_searches))
+            self.kgr_texts[keyword] = "计算中..."
+        self.result_view.refresh()
+            
+        if not items:
+            self.update_status("所有关键词的KGR均已计算")
+            return
+            
+        self.update_status(f"开始批量计算 {len(items)} 个关键词的KGR，请求会被限速以避免触发 Google 的访问限制...")
+        generation = self.search_generation
+        kgr_calculator = self.get_kgr_calculator()
+        
+        def on_result(payload):
+            keyword, result, error = payload
+            if error:
+                self.set_kgr_cell(keyword, "点击计算")
+                self.update_status(f"计算 '{keyword}' 的KGR失败: {str(error)}")
+                return
+            self.set_kgr_result(keyword, result)
+            
+        keyword_store = self.keyword_store
+        
+        def task():
+            # 在后台线程中批量计算，每个结果完成后立即交给主线程回填，allintitle数量同时保存到本地关键词库
+            completed = 0
+            failed = 0
+            for keyword, result, error in kgr_calculator.calculate_many(items):
+                # 搜索已被取代，停止后续请求
+                if generation != self.search_generation:
+                    break
+                completed += 1
+                failed += 1 if error else 0
+                if not error:
+                    keyword_store.save_allintitle_counts({keyword: result[2]})
+                self.result_queue.put((generation, on_result, (keyword, result, error)))
+            return completed, failed
+            
+        def on_done(counts):
+            completed, failed = counts
+            self.update_status(f"批量KGR计算完成：成功 {completed - failed} 个，失败 {failed} 个")
+            
+        def on_error(error):
+            self.update_status(f"批量计算KGR时出错: {str(error)}")
             
-        except (ValueError, ZeroDivisionError, IndexError) as e:
-            messagebox.showerror("错误", f"计算KGR时出错：{str(e)}")
+        self.run_in_background(task, on_done, on_error, generation)
             
 def main():
     root = tk.Tk()
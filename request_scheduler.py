@@ -0,0 +1,374 @@
+"""
+按开发者令牌共享的 Google Ads 请求调度器
+
+Google Ads API 的配额按开发者令牌计算，同一令牌下的所有线程和服务实例共用一个 RequestScheduler：
+
+    - 并发上限按AIMD调整：请求成功时上限缓慢增加（每一轮约+1），
+      收到 RESOURCE_EXHAUSTED 时减半，并让该令牌下的所有请求暂停一段退避时间
+    - 暂时性错误（限流、服务不可用、超时等）按带随机抖动的指数退避重试，
+      错误中带有建议的等待时间时至少等待该时间
+    - 重试受重试预算限制：每次成功请求积累少量重试额度，每次重试消耗一份，
+      服务持续失败时不会因大量重试进一步放大负载
+    - 最终失败的关键词以 KeywordFailure 记录在 MetricsResult.failures 中，保留错误状态和请求ID
+
+运行本模块会模拟一个每秒只接受固定数量请求的API，对比固定并发立即重试与调度器的结果：
+
+    python request_scheduler.py [分块数量]
+"""
+import random
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
+
+# 可以重试的gRPC状态
+TRANSIENT_STATUSES = frozenset({'RESOURCE_EXHAUSTED', 'UNAVAILABLE', 'DEADLINE_EXCEEDED', 'INTERNAL', 'ABORTED'})
+# 每个开发者令牌默认的最大并发请求数
+DEFAULT_MAX_CONCURRENCY = 8
+# 默认的最大重试次数
+DEFAULT_MAX_RETRIES = 4
+# 退避等待的基础时间和上限（秒）
+BACKOFF_BASE_DELAY = 1.0
+BACKOFF_MAX_DELAY = 60.0
+# 每次成功请求积累的重试额度
+RETRY_BUDGET_RATIO = 0.2
+# 重试额度的初始值和上限
+RETRY_BUDGET_TOKENS = 10.0
+
+
+def error_status(error: BaseException) -> Optional[str]:
+    """
+    获取错误的gRPC状态名
+
+    Args:
+        error: GoogleAdsException、grpc.RpcError或其他异常
+
+    Returns:
+        Optional[str]: 状态名（如 RESOURCE_EXHAUSTED），不是gRPC错误时返回None
+    """
+    # GoogleAdsException.error 是原始的grpc.Call
+    call = getattr(error, 'error', None) or error
+    code = getattr(call, 'code', None)
+    if not callable(code):
+        return None
+    try:
+        return code().name
+    except Exception:
+        return None
+
+
+def retry_delay_hint(error: BaseException) -> Optional[float]:
+    """配额错误中建议的重试等待时间（秒），没有时返回None"""
+    failure = getattr(error, 'failure', None)
+    for err in getattr(failure, 'errors', ()):
+        try:
+            delay = err.details.quota_error_details.retry_delay
+            seconds = delay.total_seconds() if hasattr(delay, 'total_seconds') else delay.seconds + delay.nanos / 1e9
+        except AttributeError:
+            continue
+        if seconds > 0:
+            return seconds
+    return None
+
+
+def error_message(error: BaseException) -> str:
+    """错误的简要说明，GoogleAdsException取各条错误的消息"""
+    failure = getattr(error, 'failure', None)
+    messages = [err.message for err in getattr(failure, 'errors', ()) if getattr(err, 'message', None)]
+    return "; ".join(messages) if messages else str(error)
+
+
+@dataclass
+class KeywordFailure:
+    """最终获取失败的一组关键词"""
+    keywords: List[str]
+    status: Optional[str]  # gRPC状态名，不是API错误时为None
+    message: str
+    request_id: Optional[str] = None
+
+    @classmethod
+    def from_error(cls, keywords: List[str], error: BaseException) -> 'KeywordFailure':
+        """由请求抛出的异常构建"""
+        return cls(list(keywords), error_status(error), error_message(error), getattr(error, 'request_id', None))
+
+    def __str__(self) -> str:
+        text = f"{len(self.keywords)} 个关键词获取失败（{self.status or '错误'}）: {self.message}"
+        if self.request_id:
+            text += f" [Request ID: {self.request_id}]"
+        return text
+
+
+class MetricsResult(dict):
+    """历史指标请求结果：关键词到指标的映射，failures记录最终失败的关键词"""
+
+    def __init__(self, *args, failures: Optional[List[KeywordFailure]] = None):
+        super().__init__(*args)
+        self.failures: List[KeywordFailure] = list(failures or [])
+
+    @property
+    def failed_keywords(self) -> List[str]:
+        """全部失败的关键词"""
+        return [keyword for failure in self.failures for keyword in failure.keywords]
+
+
+class RetryBudget:
+    """重试预算：成功请求积累额度，重试消耗额度"""
+
+    def __init__(self, ratio: float = RETRY_BUDGET_RATIO, max_tokens: float = RETRY_BUDGET_TOKENS):
+        """
+        Args:
+            ratio: 每次成功请求积累的额度
+            max_tokens: 额度的初始值和上限
+        """
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        self.tokens = max_tokens
+        self._lock = threading.Lock()
+
+    def deposit(self) -> None:
+        with self._lock:
+            self.tokens = min(self.max_tokens, self.tokens + self.ratio)
+
+    def try_spend(self) -> bool:
+        """尝试消耗一次重试额度，额度不足时返回False"""
+        with self._lock:
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+            return True
+
+
+class RequestScheduler:
+    """AIMD并发控制、退避重试和重试预算"""
+
+    def __init__(self, max_concurrency: int = DEFAULT_MAX_CONCURRENCY, max_retries: int = DEFAULT_MAX_RETRIES,
+                 base_delay: float = BACKOFF_BASE_DELAY, max_delay: float = BACKOFF_MAX_DELAY,
+                 retry_budget: Optional[RetryBudget] = None):
+        """
+        Args:
+            max_concurrency: 并发上限的最大值，也是初始值
+            max_retries: 默认的最大重试次数
+            base_delay: 退避等待的基础时间（秒）
+            max_delay: 退避等待的上限（秒）
+            retry_budget: 重试预算，默认每次成功积累0.2次重试、最多10次
+        """
+        if max_concurrency <= 0:
+            raise ValueError("max_concurrency必须大于0")
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retry_budget = retry_budget or RetryBudget()
+        self.limit = float(max_concurrency)
+        self.active = 0
+        self.successes = 0
+        self.failures = 0
+        self.retries = 0
+        self.throttled = 0
+        self.budget_exhausted = 0
+        self._resume_at = 0.0
+        self._condition = threading.Condition()
+
+    @property
+    def concurrency_limit(self) -> int:
+        """当前允许的并发请求数"""
+        return max(1, int(self.limit))
+
+    def call(self, func: Callable, *args, max_retries: Optional[int] = None, **kwargs):
+        """
+        在调度器控制下执行一次API调用，暂时性错误按退避重试
+
+        Args:
+            func: 发送请求的函数
+            *args: 传给func的位置参数
+            max_retries: 最大重试次数，默认使用调度器的设置
+            **kwargs: 传给func的关键字参数
+
+        Returns:
+            func的返回值
+
+        Raises:
+            Exception: 不可重试的错误、重试次数用尽或重试预算不足时抛出最后一次的异常
+        """
+        max_retries = self.max_retries if max_retries is None else max_retries
+        attempt = 0
+        while True:
+            self._acquire()
+            try:
+                result = func(*args, **kwargs)
+            except Exception as e:
+                status = error_status(e)
+                throttled = status == 'RESOURCE_EXHAUSTED'
+                self._release(success=False, throttled=throttled)
+                if status not in TRANSIENT_STATUSES or attempt >= max_retries:
+                    self._count('failures')
+                    raise
+                if not self.retry_budget.try_spend():
+                    self._count('failures')
+                    self._count('budget_exhausted')
+                    raise
+
+                delay = self.backoff_delay(attempt, retry_delay_hint(e))
+                if throttled:
+                    # 配额按令牌计算，限流时该令牌下的所有请求一起暂停
+                    with self._condition:
+                        self._resume_at = max(self._resume_at, time.monotonic() + delay)
+                self._count('retries')
+                time.sleep(delay)
+                attempt += 1
+            else:
+                self._release(success=True, throttled=False)
+                self.retry_budget.deposit()
+                self._count('successes')
+                return result
+
+    def backoff_delay(self, attempt: int, hint: Optional[float] = None) -> float:
+        """
+        计算带随机抖动的指数退避等待时间
+
+        Args:
+            attempt: 当前重试次数，从0开始
+            hint: 服务端建议的等待时间（秒），可选
+        """
+        delay = min(self.max_delay, self.base_delay * (2 ** attempt))
+        delay = random.uniform(delay / 2, delay)
+        return max(delay, hint) if hint else delay
+
+    def stats(self) -> Dict:
+        """
+        获取调度统计
+
+        Returns:
+            Dict: 当前并发上限、成功/失败/重试/限流次数以及因预算不足放弃的重试次数
+        """
+        with self._condition:
+            return {
+                'concurrency_limit': self.concurrency_limit,
+                'successes': self.successes,
+                'failures': self.failures,
+                'retries': self.retries,
+                'throttled': self.throttled,
+                'budget_exhausted': self.budget_exhausted,
+            }
+
+    def _acquire(self) -> None:
+        with self._condition:
+            while True:
+                wait = self._resume_at - time.monotonic()
+                if wait > 0:
+                    self._condition.wait(wait)
+                elif self.active < self.concurrency_limit:
+                    self.active += 1
+                    return
+                else:
+                    self._condition.wait()
+
+    def _release(self, success: bool, throttled: bool) -> None:
+        with self._condition:
+            self.active -= 1
+            if throttled:
+                self.throttled += 1
+                self.limit = max(1.0, self.limit / 2)
+            elif success:
+                # 加性增加：每完成约一轮（当前上限个）成功请求，上限加1
+                self.limit = min(float(self.max_concurrency), self.limit + 1 / self.limit)
+            self._condition.notify_all()
+
+    def _count(self, name: str) -> None:
+        with self._condition:
+            setattr(self, name, getattr(self, name) + 1)
+
+
+_schedulers: Dict[str, RequestScheduler] = {}
+_schedulers_lock = threading.Lock()
+
+
+def get_scheduler(developer_token: str, max_concurrency: int = DEFAULT_MAX_CONCURRENCY) -> RequestScheduler:
+    """
+    获取开发者令牌对应的共享调度器，首次调用时创建
+
+    Args:
+        developer_token: 开发者令牌
+        max_concurrency: 创建调度器时使用的并发上限
+
+    Returns:
+        RequestScheduler: 该令牌下所有服务实例共用的调度器
+    """
+    with _schedulers_lock:
+        scheduler = _schedulers.get(developer_token)
+        if scheduler is None:
+            scheduler = _schedulers[developer_token] = RequestScheduler(max_concurrency)
+        return scheduler
+
+
+def run_benchmark(chunks: int = 200, quota_per_second: float = 100.0, latency: float = 0.01,
+                  workers: int = 16) -> None:
+    """
+    模拟每秒只接受固定数量请求、超出时返回 RESOURCE_EXHAUSTED 的API
+
+    Args:
+        chunks: 请求的分块数量
+        quota_per_second: API每秒接受的请求数
+        latency: 每次请求的耗时（秒）
+        workers: 发起请求的线程数
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    class StatusCode:
+        name = 'RESOURCE_EXHAUSTED'
+
+    class ResourceExhausted(Exception):
+        request_id = 'simulated'
+
+        def code(self):
+            return StatusCode
+
+    quota_lock = threading.Lock()
+    quota = {'tokens': quota_per_second / 10, 'updated': time.monotonic()}
+
+    def fake_api(chunk: int) -> int:
+        with quota_lock:
+            now = time.monotonic()
+            quota['tokens'] = min(quota_per_second / 10, quota['tokens'] + (now - quota['updated']) * quota_per_second)
+            quota['updated'] = now
+            allowed = quota['tokens'] >= 1
+            if allowed:
+                quota['tokens'] -= 1
+        time.sleep(latency)
+        if not allowed:
+            raise ResourceExhausted("quota exceeded")
+        return chunk
+
+    def naive(chunk: int) -> int:
+        # 旧实现：固定并发，失败后立即重试，最多重试2次
+        for attempt in range(3):
+            try:
+                return fake_api(chunk)
+            except ResourceExhausted:
+                if attempt == 2:
+                    raise
+        return chunk
+
+    scheduler = RequestScheduler(max_concurrency=workers, base_delay=0.05, max_delay=1.0,
+                                 retry_budget=RetryBudget(max_tokens=chunks))
+
+    def scheduled(chunk: int) -> int:
+        return scheduler.call(fake_api, chunk, max_retries=8)
+
+    print(f"{chunks} 个分块，{workers} 个线程，API每秒接受 {quota_per_second:.0f} 个请求")
+    for name, func in (("固定并发立即重试", naive), ("AIMD调度器", scheduled)):
+        time.sleep(0.2)  # 恢复配额
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(func, chunk) for chunk in range(chunks)]
+            failed = sum(1 for future in futures if future.exception() is not None)
+        elapsed = time.perf_counter() - start
+        print(f"  {name}: 成功 {chunks - failed} 个，失败 {failed} 个，耗时 {elapsed * 1000:.0f} ms")
+    stats = scheduler.stats()
+    print(f"    重试 {stats['retries']} 次，限流 {stats['throttled']} 次，结束时并发上限 {stats['concurrency_limit']}")
+
+
+if __name__ == "__main__":
+    import sys
+
+    run_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 200)
@@ -0,0 +1,320 @@
+"""
+结果的实时筛选
+
+ResultFilter 为一组结果建立关键词词元的倒排索引，并缓存数值列，每次输入只做数组运算：
+
+    - 关键词按空白切分为词元，全部词元排序后每个词元的行下标连续存放，
+      以某个前缀开头的词元在排序后相邻，对应的行下标是一段连续的切片，二分查找即可定位
+    - 筛选文本中的每个词都必须是关键词中某个词元的前缀（"py tut" 匹配 "python tutorial"）
+    - 数值列的范围条件在缓存的数组上计算，与文本条件按位与
+    - 每个词的匹配结果会被缓存，继续输入时只重新计算变化的词
+
+追加结果后，新行先逐行匹配，未索引的行较多时才重建索引，流式追加时重建次数只随行数对数增长。
+build_index 不访问筛选器的状态，可以在后台线程中为一组关键词文本建立索引，再在主线程中用 install 安装。
+
+运行本模块可模拟在大量结果上逐字输入筛选文本，测量每次按键的耗时：
+
+    python result_filter.py [关键词数量]
+"""
+from bisect import bisect_left
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from keyword_index import normalize_keyword
+
+# 数值范围条件：列名到 (最小值, 最大值) 的映射，包含边界，None表示不限制
+RangeSpec = Dict[str, Tuple[Optional[float], Optional[float]]]
+
+# 未索引的行数超过已索引行数的这个比例时重建索引
+REBUILD_RATIO = 0.1
+# 未索引的行数少于这个数量时不重建索引
+REBUILD_MIN_ROWS = 1000
+# 缓存的单个词匹配结果数量
+TERM_CACHE_SIZE = 64
+
+
+def _idea_text(row) -> str:
+    return row.text
+
+
+def parse_terms(query: str) -> List[str]:
+    """把筛选文本拆分为词，规则与关键词的规范化一致"""
+    return normalize_keyword(query).split()
+
+
+class TokenIndex(NamedTuple):
+    """关键词词元的倒排索引，覆盖一组结果的前len(tokens)行"""
+    # 每行关键词的词元
+    tokens: List[List[str]]
+    # 排序后的全部词元
+    vocabulary: List[str]
+    # 第i个词元的行下标为 postings[offsets[i]:offsets[i + 1]]
+    offsets: np.ndarray
+    postings: np.ndarray
+
+
+def tokenize(text: str) -> List[str]:
+    """关键词的词元，与先规范化再按空白切分的结果相同"""
+    return text.lower().split()
+
+
+def build_index(texts: Sequence[str], tokens: Optional[List[List[str]]] = None) -> TokenIndex:
+    """
+    为一组关键词文本建立倒排索引
+
+    Args:
+        texts: 关键词文本，下标即行下标
+        tokens: 已切分好的前若干行的词元，只为其余行切分
+
+    Returns:
+        TokenIndex: 倒排索引
+    """
+    tokens = list(tokens or [])
+    tokens.extend(map(tokenize, texts[len(tokens):]))
+    count = len(tokens)
+    flat = [token for row_tokens in tokens for token in row_tokens]
+    lengths = np.fromiter(map(len, tokens), dtype=np.intp, count=count)
+
+    # 按词元排序后，同一词元和同一前缀的行下标都连续存放
+    vocabulary = sorted(set(flat))
+    ranks = {token: rank for rank, token in enumerate(vocabulary)}
+    posting_ranks = np.fromiter(map(ranks.__getitem__, flat), dtype=np.intp, count=len(flat))
+    order = np.argsort(posting_ranks, kind='stable')
+    postings = np.repeat(np.arange(count, dtype=np.intp), lengths)[order]
+    offsets = np.concatenate(([0], np.cumsum(np.bincount(posting_ranks, minlength=len(vocabulary))))).astype(np.intp)
+    return TokenIndex(tokens, vocabulary, offsets, postings)
+
+
+class ResultFilter:
+    """基于词元倒排索引和数值列缓存的结果筛选器"""
+
+    def __init__(self, value_funcs: Dict[str, Callable[[object], float]], text_func: Callable[[object], str] = _idea_text):
+        """
+        Args:
+            value_funcs: 可按范围筛选的列名到取值函数的映射
+            text_func: 从一行数据中取出关键词文本的函数，默认取 .text 属性
+        """
+        self.value_funcs = value_funcs
+        self.text_func = text_func
+        self.reset([])
+
+    def reset(self, rows: Sequence) -> None:
+        """
+        替换要筛选的数据，清空索引和缓存
+
+        Args:
+            rows: 行数据序列，筛选器只保存引用，追加数据后调用rows_appended即可
+        """
+        self.rows = rows
+        self._tokens: List[List[str]] = []
+        self._values: Dict[str, np.ndarray] = {}
+        # 索引覆盖rows的前indexed_count行，结构同TokenIndex
+        self.indexed_count = 0
+        self._vocabulary: List[str] = []
+        self._offsets = np.zeros(1, dtype=np.intp)
+        self._postings = np.zeros(0, dtype=np.intp)
+        self._term_cache: Dict[str, np.ndarray] = {}
+
+    def rows_appended(self) -> None:
+        """rows序列追加了数据时调用，索引在未索引的行足够多时才重建"""
+        self._term_cache = {}
+
+    def build(self) -> None:
+        """为全部行建立索引，通常在一组结果到齐后调用一次"""
+        self.install(build_index([self.text_func(row) for row in self.rows], self._tokens))
+
+    def install(self, index: TokenIndex) -> None:
+        """
+        安装在其他线程中建立的索引，索引覆盖的行之后追加的行仍逐行匹配
+
+        Args:
+            index: 为当前rows的前若干行建立的索引
+        """
+        count = len(index.tokens)
+        if count < self.indexed_count:
+            return
+        self._tokens = index.tokens + self._tokens[count:]
+        self._vocabulary = index.vocabulary
+        self._offsets = index.offsets
+        self._postings = index.postings
+        self.indexed_count = count
+        self._term_cache = {}
+
+    def mask(self, query: str = "", ranges: Optional[RangeSpec] = None) -> Optional[np.ndarray]:
+        """
+        计算每行是否满足筛选条件
+
+        Args:
+            query: 筛选文本，每个词都必须是关键词中某个词元的前缀
+            ranges: 数值范围条件
+
+        Returns:
+            Optional[np.ndarray]: 与rows一一对应的布尔数组，没有任何条件时返回None
+
+        Raises:
+            KeyError: 范围条件中的列不受支持
+        """
+        terms = parse_terms(query)
+        ranges = {column: bounds for column, bounds in (ranges or {}).items() if bounds != (None, None)}
+        if not terms and not ranges:
+            return None
+
+        count = len(self.rows)
+        tail = count - self.indexed_count
+        if terms and tail > max(REBUILD_MIN_ROWS, self.indexed_count * REBUILD_RATIO):
+            self.build()
+
+        result = np.ones(count, dtype=bool)
+        for term in dict.fromkeys(terms):
+            result &= self._term_mask(term, count)
+        for column, (low, high) in ranges.items():
+            values = self.values(column)
+            if low is not None:
+                result &= values >= low
+            if high is not None:
+                result &= values <= high
+        return result
+
+    def values(self, column: str) -> np.ndarray:
+        """
+        获取某一列的数值，只为尚未计算过的行调用取值函数
+
+        Args:
+            column: 列名
+
+        Returns:
+            np.ndarray: 与rows一一对应的数值
+        """
+        if column not in self.value_funcs:
+            raise KeyError(f"不支持筛选的列: {column}")
+        values = self._values.get(column, np.zeros(0))
+        done = len(values)
+        if done < len(self.rows):
+            value_func = self.value_funcs[column]
+            new_values = np.fromiter((value_func(self.rows[i]) for i in range(done, len(self.rows))),
+                                     dtype=np.float64, count=len(self.rows) - done)
+            values = np.concatenate((values, new_values)) if done else new_values
+            self._values[column] = values
+        return values
+
+    def _row_tokens(self) -> List[List[str]]:
+        """每行关键词的词元，只为新增的行切分"""
+        tokens = self._tokens
+        if len(tokens) < len(self.rows):
+            text_func = self.text_func
+            tokens.extend(tokenize(text_func(self.rows[i])) for i in range(len(tokens), len(self.rows)))
+        return tokens
+
+    def _term_mask(self, term: str, count: int) -> np.ndarray:
+        """某个词匹配的行：已索引的行查倒排索引，之后追加的行逐行检查"""
+        cached = self._term_cache.get(term)
+        if cached is not None and len(cached) == count:
+            return cached
+
+        mask = np.zeros(count, dtype=bool)
+        low = bisect_left(self._vocabulary, term)
+        high = bisect_left(self._vocabulary, term + "\U0010ffff", low)
+        mask[self._postings[self._offsets[low]:self._offsets[high]]] = True
+        tokens = self._row_tokens()
+        for row in range(self.indexed_count, count):
+            if any(token.startswith(term) for token in tokens[row]):
+                mask[row] = True
+
+        if len(self._term_cache) >= TERM_CACHE_SIZE:
+            self._term_cache.pop(next(iter(self._term_cache)))
+        self._term_cache[term] = mask
+        return mask
+
+
+def filtered_order(mask: Optional[np.ndarray], order: Optional[np.ndarray] = None) -> Optional[np.ndarray]:
+    """
+    按筛选结果过滤显示顺序
+
+    Args:
+        mask: ResultFilter.mask 的结果，None表示不筛选
+        order: 排序后的行下标，None表示按原有顺序
+
+    Returns:
+        Optional[np.ndarray]: 筛选后的行下标，两者都为None时返回None
+    """
+    if mask is None:
+        return order
+    if order is None:
+        return np.flatnonzero(mask)
+    return order[mask[order]]
+
+
+def run_benchmark(count: int = 100_000) -> None:
+    """
+    模拟在排序后的结果上逐字输入筛选文本，并叠加数值范围条件
+
+    Args:
+        count: 关键词数量
+    """
+    import random
+    import time
+
+    from keyword_ideas_service import KeywordIdea
+    from result_sorter import ResultSorter
+
+    rng = random.Random(0)
+    # 一半的词来自少量常见词，其余来自长尾词
+    common = ["python", "pytorch", "tutorial", "programming", "course", "online", "free", "best", "learn", "data",
+              "science", "machine", "learning", "beginner", "advanced", "book", "pdf", "video", "job", "salary"]
+    rare = [f"term{i}" for i in range(5_000)]
+    ideas = [KeywordIdea(text=" ".join(rng.choice(common if rng.random() < 0.5 else rare)
+                                       for _ in range(rng.randint(2, 4))),
+                         avg_monthly_searches=rng.randint(0, 100_000), competition='LOW',
+                         competition_index=float(rng.randint(0, 100)), low_cpc=rng.random(), high_cpc=rng.random() * 5,
+                         monthly_searches=[], growth_percentage=0.0, recent_growth_percentage=0.0)
+             for _ in range(count)]
+    value_funcs = {
+        'avg_monthly_searches': lambda idea: idea.avg_monthly_searches,
+        'competition_index': lambda idea: idea.competition_index,
+        'low_cpc': lambda idea: idea.low_cpc,
+        'high_cpc': lambda idea: idea.high_cpc,
+    }
+    result_filter = ResultFilter(value_funcs)
+    result_filter.reset(ideas)
+    sorter = ResultSorter({'avg_monthly_searches': value_funcs['avg_monthly_searches']})
+    sorter.reset(ideas)
+    order = sorter.permutation('avg_monthly_searches', reverse=True)
+
+    start = time.perf_counter()
+    result_filter.build()
+    for column in value_funcs:
+        result_filter.values(column)
+    build_time = time.perf_counter() - start
+
+    ranges = {'avg_monthly_searches': (1000, None), 'competition_index': (None, 30)}
+    query = "python tut"
+    timings = []
+    for i in range(1, len(query) + 1):
+        start = time.perf_counter()
+        rows = filtered_order(result_filter.mask(query[:i], ranges), order).tolist()
+        timings.append(time.perf_counter() - start)
+
+    expected = [row for row in order.tolist()
+                if ideas[row].avg_monthly_searches >= 1000 and ideas[row].competition_index <= 30
+                and any(token.startswith("python") for token in ideas[row].text.split())
+                and any(token.startswith("tut") for token in ideas[row].text.split())]
+    assert rows == expected
+
+    # 线性扫描：每次按键对每一行检查子串
+    start = time.perf_counter()
+    [row for row in order.tolist() if "python tut" in ideas[row].text
+     and ideas[row].avg_monthly_searches >= 1000 and ideas[row].competition_index <= 30]
+    scan_time = time.perf_counter() - start
+
+    print(f"{count:,} 个关键词，按月均搜索量排序，筛选月均搜索量>=1000、竞争指数<=30")
+    print(f"  建立索引和数值列: {build_time * 1000:8.1f} ms")
+    print(f"  逐行扫描（每次按键）: {scan_time * 1000:8.1f} ms")
+    print(f"  逐字输入 \"{query}\"：平均 {sum(timings) / len(timings) * 1000:.2f} ms，"
+          f"最慢 {max(timings) * 1000:.2f} ms，最终 {len(rows)} 行")
+
+
+if __name__ == "__main__":
+    import sys
+
+    run_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
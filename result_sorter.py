@@ -0,0 +1,224 @@
+"""
+基于类型化排序键的结果排序
+
+ResultSorter 为每一列缓存排序键、升序排列下标和名次（相同键值名次相同）：
+
+    - 同一列再次排序直接返回缓存的排列下标
+    - 反向排序由升序排列在O(n)内得到，相同键值的行保持原有的相对顺序（稳定排序）
+    - 多列排序把各列的名次交给 np.lexsort，不再比较原始值
+
+追加结果后只为新增的行计算排序键，排列和名次在下次排序时重新计算。
+
+运行本模块可对比解析显示文本排序与缓存排序键排序的耗时：
+
+    python result_sorter.py [关键词数量]
+"""
+from typing import Callable, Dict, List, Sequence, Tuple
+
+import numpy as np
+
+# 排序规则：(列名, 是否反向) 列表，排在前面的列优先
+SortSpec = Sequence[Tuple[str, bool]]
+
+
+class ResultSorter:
+    """按列缓存排序键和排列下标的排序器"""
+
+    def __init__(self, key_funcs: Dict[str, Callable[[object], object]]):
+        """
+        Args:
+            key_funcs: 列名到排序键函数的映射，函数接收一行数据，返回数值或字符串
+        """
+        self.key_funcs = key_funcs
+        self.rows: Sequence = []
+        self._keys: Dict[str, list] = {}
+        self._ranks: Dict[str, np.ndarray] = {}
+        self._permutations: Dict[Tuple[str, bool], np.ndarray] = {}
+
+    def reset(self, rows: Sequence) -> None:
+        """
+        替换要排序的数据，清空全部缓存
+
+        Args:
+            rows: 行数据序列，排序器只保存引用，追加数据后调用rows_appended即可
+        """
+        self.rows = rows
+        self._keys = {}
+        self._ranks = {}
+        self._permutations = {}
+
+    def rows_appended(self) -> None:
+        """rows序列追加了数据时调用，已计算的排序键保留，排列和名次在下次排序时重新计算"""
+        self._ranks = {}
+        self._permutations = {}
+
+    def keys(self, column: str) -> list:
+        """
+        获取某一列的排序键，只为尚未计算过的行调用排序键函数
+
+        Args:
+            column: 列名
+
+        Returns:
+            list: 与rows一一对应的排序键
+        """
+        if column not in self.key_funcs:
+            raise KeyError(f"不支持排序的列: {column}")
+        keys = self._keys.setdefault(column, [])
+        if len(keys) < len(self.rows):
+            key_func = self.key_funcs[column]
+            keys.extend(key_func(self.rows[i]) for i in range(len(keys), len(self.rows)))
+        return keys
+
+    def permutation(self, column: str, reverse: bool = False) -> np.ndarray:
+        """
+        获取按某一列排序后的行下标（稳定排序）
+
+        Args:
+            column: 列名
+            reverse: 是否反向排序
+
+        Returns:
+            np.ndarray: 按排序结果排列的行下标
+        """
+        cached = self._permutations.get((column, reverse))
+        if cached is not None:
+            return cached
+
+        if reverse:
+            permutation = self._reverse_stable(column)
+        else:
+            keys = self.keys(column)
+            if keys and isinstance(keys[0], str):
+                permutation = np.fromiter(sorted(range(len(keys)), key=keys.__getitem__), dtype=np.intp,
+                                          count=len(keys))
+            else:
+                permutation = np.argsort(np.asarray(keys, dtype=np.float64), kind='stable')
+        self._permutations[(column, reverse)] = permutation
+        return permutation
+
+    def ranks(self, column: str) -> np.ndarray:
+        """
+        获取某一列每行的名次，键值相同的行名次相同
+
+        Args:
+            column: 列名
+
+        Returns:
+            np.ndarray: 与rows一一对应的名次（从0开始的连续整数）
+        """
+        cached = self._ranks.get(column)
+        if cached is not None:
+            return cached
+
+        keys = self.keys(column)
+        permutation = self.permutation(column)
+        n = len(permutation)
+        ranks = np.empty(n, dtype=np.intp)
+        if n:
+            if isinstance(keys[0], str):
+                sorted_keys = [keys[i] for i in permutation]
+                changed = np.fromiter((sorted_keys[i] != sorted_keys[i - 1] for i in range(1, n)),
+                                      dtype=bool, count=n - 1)
+            else:
+                sorted_keys = np.asarray(keys, dtype=np.float64)[permutation]
+                changed = sorted_keys[1:] != sorted_keys[:-1]
+            ranks[permutation] = np.concatenate(([0], np.cumsum(changed)))
+        self._ranks[column] = ranks
+        return ranks
+
+    def sort(self, spec: SortSpec) -> np.ndarray:
+        """
+        按一列或多列排序
+
+        Args:
+            spec: (列名, 是否反向) 列表，排在前面的列优先
+
+        Returns:
+            np.ndarray: 按排序结果排列的行下标
+        """
+        if not spec:
+            return np.arange(len(self.rows), dtype=np.intp)
+        if len(spec) == 1:
+            column, reverse = spec[0]
+            return self.permutation(column, reverse)
+
+        # np.lexsort以最后一个键为主键，反向的列使用负名次
+        lex_keys = [-self.ranks(column) if reverse else self.ranks(column) for column, reverse in reversed(spec)]
+        return np.lexsort(lex_keys)
+
+    def _reverse_stable(self, column: str) -> np.ndarray:
+        """由升序排列在O(n)内得到稳定的降序排列：整体反转后，再把每段相同键值的行恢复为原有顺序"""
+        ascending = self.permutation(column)
+        reversed_permutation = ascending[::-1]
+        n = len(reversed_permutation)
+        if n < 2:
+            return reversed_permutation.copy()
+
+        ranks = self.ranks(column)[reversed_permutation]
+        run_starts = np.flatnonzero(np.concatenate(([True], ranks[1:] != ranks[:-1])))
+        run_ends = np.append(run_starts[1:], n) - 1
+        run_lengths = run_ends - run_starts + 1
+        starts = np.repeat(run_starts, run_lengths)
+        ends = np.repeat(run_ends, run_lengths)
+
+        result = np.empty(n, dtype=np.intp)
+        result[starts + ends - np.arange(n)] = reversed_permutation
+        return result
+
+
+def run_benchmark(count: int = 50_000) -> None:
+    """
+    对比解析显示文本排序与缓存排序键排序的耗时，并校验结果一致
+
+    Args:
+        count: 关键词数量
+    """
+    import time
+
+    from keyword_table import build_synthetic_ideas
+
+    ideas = build_synthetic_ideas(count)
+    key_funcs = {
+        'keyword': lambda idea: idea.text,
+        'avg_monthly_searches': lambda idea: idea.avg_monthly_searches,
+        'competition_index': lambda idea: idea.competition_index,
+        'low_cpc': lambda idea: idea.low_cpc,
+    }
+    sorter = ResultSorter(key_funcs)
+    sorter.reset(ideas)
+
+    # 旧实现：从显示文本中解析数值后排序
+    cells = [(f"${idea.low_cpc:.2f}", i) for i, idea in enumerate(ideas)]
+    start = time.perf_counter()
+    sorted(cells, key=lambda x: float(x[0].replace('$', '').replace(',', '')))
+    text_time = time.perf_counter() - start
+
+    timings: List[Tuple[str, float]] = []
+    for name, func in (
+        ("提取排序键（全部列）", lambda: [sorter.keys(column) for column in key_funcs]),
+        ("首次排序", lambda: sorter.permutation('low_cpc')),
+        ("再次排序（缓存）", lambda: sorter.permutation('low_cpc')),
+        ("首次反向排序", lambda: sorter.permutation('low_cpc', True)),
+        ("再次反向排序（缓存）", lambda: sorter.permutation('low_cpc', True)),
+        ("多列排序", lambda: sorter.sort([('competition_index', True), ('avg_monthly_searches', False)])),
+    ):
+        start = time.perf_counter()
+        func()
+        timings.append((name, time.perf_counter() - start))
+
+    expected = sorted(range(count), key=lambda i: ideas[i].low_cpc, reverse=True)
+    assert sorter.permutation('low_cpc', True).tolist() == expected
+    expected = sorted(range(count), key=lambda i: (-ideas[i].competition_index, ideas[i].avg_monthly_searches))
+    assert sorter.sort([('competition_index', True), ('avg_monthly_searches', False)]).tolist() == expected
+
+    print(f"{count:,} 个关键词")
+    print(f"  解析显示文本排序: {text_time * 1000:8.2f} ms")
+    for name, elapsed in timings:
+        print(f"  {name}: {elapsed * 1000:8.2f} ms")
+
+
+if __name__ == "__main__":
+    import sys
+
+    run_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 50_000)
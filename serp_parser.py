@@ -0,0 +1,215 @@
+"""
+搜索结果页中结果数量（div#result-stats）的快速解析
+
+只扫描到结果统计节点为止，不构建完整的DOM树；找不到节点时回退到BeautifulSoup解析。
+支持各语言界面的结果数量格式，例如：
+
+    About 1,234 results (0.32 seconds)
+    About 1,23,456 results (0.32 seconds)
+    Environ 1 234 résultats (0,32 secondes)
+    Ungefähr 1.234 Ergebnisse (0,32 Sekunden)
+    找到约 1,234 条结果 （用时 0.32 秒）
+    約 1,234 件 （0.32 秒）
+
+运行本模块可对比两种解析方式的耗时：
+
+    python serp_parser.py [saved_serp.html ...]
+"""
+import html as html_lib
+import re
+from typing import Iterable, Optional
+
+# 结果统计节点的起始标记
+RESULT_STATS_PATTERN = re.compile(r'''id\s*=\s*["']?result-stats\b''')
+# 结果统计中的耗时部分，如 "(0.32 seconds)"，通常位于<nobr>中
+NOBR_PATTERN = re.compile(r'<nobr>.*?</nobr>', re.IGNORECASE | re.DOTALL)
+TAG_PATTERN = re.compile(r'<[^>]+>')
+# 带千位分隔符（逗号、句点、空白含不换行空格、撇号）的数字、印度式分组的数字（1,23,456）或不带分隔符的数字
+NUMBER_PATTERN = re.compile(r"\d{1,3}(?:[,.\s'’]\d{3})+(?!\d)|\d{1,2}(?:,\d{2})+,\d{3}(?!\d)|\d+")
+SEPARATOR_PATTERN = re.compile(r"[,.\s'’]")
+# 流式扫描时保留的重叠长度，避免标记被切分在两个数据块之间
+MARKER_OVERLAP = 64
+# 结果统计节点的最大长度，流式扫描时找到起始标记后最多为其保留这么多字符
+MAX_STATS_NODE_LENGTH = 4096
+
+
+def parse_result_count(text: str) -> int:
+    """
+    从结果统计文本中解析结果数量
+
+    Args:
+        text: 结果统计文本，如 "About 1,234 results (0.32 seconds)"
+
+    Returns:
+        int: 结果数量，无法解析时返回0
+    """
+    # 去掉括号中的耗时部分，避免把秒数当作结果数量
+    text = re.split(r'[(（]', text, maxsplit=1)[0]
+    match = NUMBER_PATTERN.search(text)
+    if not match:
+        return 0
+    return int(SEPARATOR_PATTERN.sub('', match.group(0)))
+
+
+def _stats_text_from_fragment(fragment: str) -> str:
+    """将结果统计节点内的HTML片段转换为纯文本"""
+    fragment = NOBR_PATTERN.sub('', fragment)
+    return html_lib.unescape(TAG_PATTERN.sub(' ', fragment))
+
+
+def find_result_stats_text(html: str, start: int = 0) -> Optional[str]:
+    """
+    定位结果统计节点并返回其文本
+
+    Args:
+        html: 搜索结果页HTML（可以是不完整的前缀）
+        start: 开始搜索的位置
+
+    Returns:
+        Optional[str]: 结果统计文本，找不到完整节点时返回None
+    """
+    match = RESULT_STATS_PATTERN.search(html, start)
+    if not match:
+        return None
+    open_end = html.find('>', match.end())
+    if open_end == -1:
+        return None
+    close_start = html.find('</div>', open_end)
+    if close_start == -1:
+        return None
+    return _stats_text_from_fragment(html[open_end + 1:close_start])
+
+
+def parse_with_beautifulsoup(html: str) -> int:
+    """
+    使用BeautifulSoup解析结果数量，作为快速解析失败时的回退
+
+    Args:
+        html: 搜索结果页HTML
+
+    Returns:
+        int: 结果数量，找不到时返回0
+    """
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, 'html.parser')
+    result_stats = soup.find('div', {'id': 'result-stats'})
+    if not result_stats:
+        return 0
+    for nobr in result_stats.find_all('nobr'):
+        nobr.decompose()
+    return parse_result_count(result_stats.get_text(' '))
+
+
+def extract_result_count(html: str) -> int:
+    """
+    从完整的搜索结果页中提取结果数量
+
+    Args:
+        html: 搜索结果页HTML
+
+    Returns:
+        int: 结果数量，找不到时返回0
+    """
+    text = find_result_stats_text(html)
+    if text is not None:
+        return parse_result_count(text)
+    return parse_with_beautifulsoup(html)
+
+
+def extract_result_count_from_chunks(chunks: Iterable[str]) -> int:
+    """
+    从流式读取的搜索结果页中提取结果数量，读到结果统计节点后立即停止
+
+    Args:
+        chunks: 按顺序到达的HTML文本块
+
+    Returns:
+        int: 结果数量，找不到时返回0
+    """
+    parts = []
+    # 只在末尾的窗口中搜索：找到起始标记前保留重叠部分，找到后保留从标记开始的部分
+    window = ''
+    for chunk in chunks:
+        if not chunk:
+            continue
+        parts.append(chunk)
+        window += chunk
+        text = find_result_stats_text(window)
+        if text is not None:
+            return parse_result_count(text)
+        match = RESULT_STATS_PATTERN.search(window)
+        if match and len(window) - match.start() <= MAX_STATS_NODE_LENGTH:
+            window = window[match.start():]
+        else:
+            # 没有起始标记，或节点长度超过上限（不是真正的结果统计节点）
+            window = window[-MARKER_OVERLAP:]
+    # 整页都没有找到结果统计节点，回退到完整解析
+    return parse_with_beautifulsoup(''.join(parts))
+
+
+def build_synthetic_serp(count: int = 123456, size: int = 1_000_000, stats_position: float = 0.3) -> str:
+    """
+    生成用于基准测试的搜索结果页
+
+    Args:
+        count: 结果数量
+        size: 页面大致字节数
+        stats_position: 结果统计节点在页面中的相对位置
+
+    Returns:
+        str: 搜索结果页HTML
+    """
+    result_block = (
+        '<div class="g"><div class="tF2Cxc"><a href="https://example.com/page">'
+        '<h3 class="LC20lb">Example result title</h3></a>'
+        '<div class="VwiC3b"><span>Example snippet text for the result page.</span></div></div></div>\n'
+    )
+    script_block = '<script>var x = {"a": [1, 2, 3], "b": "' + 'x' * 200 + '"};</script>\n'
+    head_size = int(size * stats_position)
+    head = script_block * max(1, head_size // len(script_block))
+    body = result_block * max(1, (size - head_size) // len(result_block))
+    stats = f'<div id="result-stats">About {count:,} results<nobr> (0.32 seconds)&nbsp;</nobr></div>'
+    return f'<html><head>{head}</head><body><div id="rcnt">{stats}{body}</div></body></html>'
+
+
+def run_benchmark(pages, repeat: int = 5) -> None:
+    """
+    对比快速解析与BeautifulSoup完整解析的耗时
+
+    Args:
+        pages: (名称, HTML) 列表
+        repeat: 每种解析方式的重复次数
+    """
+    import timeit
+
+    for name, page in pages:
+        fast_count = extract_result_count(page)
+        streamed_count = extract_result_count_from_chunks(page[i:i + 16384] for i in range(0, len(page), 16384))
+        soup_count = parse_with_beautifulsoup(page)
+        fast_time = min(timeit.repeat(lambda: extract_result_count(page), number=1, repeat=repeat))
+        stream_time = min(timeit.repeat(
+            lambda: extract_result_count_from_chunks(page[i:i + 16384] for i in range(0, len(page), 16384)),
+            number=1, repeat=repeat
+        ))
+        soup_time = min(timeit.repeat(lambda: parse_with_beautifulsoup(page), number=1, repeat=repeat))
+        print(f"{name} ({len(page) / 1024:.0f} KB)")
+        print(f"  BeautifulSoup: {soup_time * 1000:8.2f} ms  结果数量: {soup_count}")
+        print(f"  快速解析:      {fast_time * 1000:8.2f} ms  结果数量: {fast_count}  ({soup_time / fast_time:.0f}x)")
+        print(f"  流式解析:      {stream_time * 1000:8.2f} ms  结果数量: {streamed_count}  ({soup_time / stream_time:.0f}x)")
+
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) > 1:
+        fixtures = []
+        for path in sys.argv[1:]:
+            with open(path, 'r', encoding='utf-8', errors='replace') as f:
+                fixtures.append((path, f.read()))
+    else:
+        fixtures = [
+            ("synthetic (stats at 30%)", build_synthetic_serp(stats_position=0.3)),
+            ("synthetic (stats at 90%)", build_synthetic_serp(stats_position=0.9)),
+        ]
+    run_benchmark(fixtures)
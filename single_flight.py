@@ -0,0 +1,158 @@
+"""
+合并并发的重复请求（single-flight）
+
+多个种子词扩展出的关键词集合经常重叠，它们的历史指标请求会在不同线程中同时发出。
+SingleFlight 记录每个键当前是否有请求在途：
+
+    - claim 把一批键分成两部分：没有在途请求的键由调用方负责请求，
+      已在途的键只订阅对应请求的结果，不再重复请求
+    - 负责请求的一方拿到结果后调用 resolve（失败时调用 fail），订阅方随即得到结果
+    - 调用方应先完成并resolve自己负责的键，再等待订阅的结果，这样多个线程互相订阅时不会死锁
+
+运行本模块可对比在多个重叠的种子词并发请求时，合并前后实际请求的关键词数量和耗时：
+
+    python single_flight.py [种子数量]
+"""
+import threading
+from concurrent.futures import Future
+from typing import Dict, Hashable, Iterable, List, Tuple
+
+
+class SingleFlight:
+    """按键合并在途请求，并统计合并节省的请求数量"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._inflight: Dict[Hashable, Future] = {}
+        self.requested = 0
+        self.coalesced = 0
+
+    def claim(self, keys: Iterable[Hashable]) -> Tuple[List[Hashable], Dict[Hashable, Future]]:
+        """
+        登记要请求的键
+
+        Args:
+            keys: 键，同一批中重复的键只计一次
+
+        Returns:
+            Tuple[List[Hashable], Dict[Hashable, Future]]: (由调用方请求的键, 已在途的键到结果的映射)
+        """
+        owned = {}
+        waiting = {}
+        with self._lock:
+            for key in keys:
+                self.requested += 1
+                if key in owned or key in waiting:
+                    # 本批中重复的键
+                    self.coalesced += 1
+                    continue
+                future = self._inflight.get(key)
+                if future is not None:
+                    waiting[key] = future
+                    self.coalesced += 1
+                    continue
+                owned[key] = self._inflight[key] = Future()
+        return list(owned), waiting
+
+    def resolve(self, keys: Iterable[Hashable], results: Dict[Hashable, object]) -> None:
+        """
+        交付调用方负责的键的结果，没有结果的键交付None
+
+        Args:
+            keys: claim返回的由调用方请求的键
+            results: 键到结果的映射
+        """
+        with self._lock:
+            futures = [(self._inflight.pop(key), results.get(key)) for key in keys]
+        for future, result in futures:
+            future.set_result(result)
+
+    def fail(self, keys: Iterable[Hashable], error: BaseException) -> None:
+        """
+        调用方负责的请求失败，订阅方会收到同一个异常
+
+        Args:
+            keys: claim返回的由调用方请求的键
+            error: 请求抛出的异常
+        """
+        with self._lock:
+            futures = [self._inflight.pop(key) for key in keys]
+        for future in futures:
+            future.set_exception(error)
+
+    def stats(self) -> Dict:
+        """
+        获取合并统计
+
+        Returns:
+            Dict: requested（登记的键数）、coalesced（合并的键数）、coalesce_rate（合并比例）、inflight（在途键数）
+        """
+        with self._lock:
+            return {
+                'requested': self.requested,
+                'coalesced': self.coalesced,
+                'coalesce_rate': self.coalesced / self.requested if self.requested else 0.0,
+                'inflight': len(self._inflight),
+            }
+
+
+def run_benchmark(seeds: int = 16, ideas_per_seed: int = 400, vocabulary: int = 2_000,
+                  batch_size: int = 100, latency: float = 0.02) -> None:
+    """
+    模拟多个种子词的关键词集合互相重叠时的并发请求
+
+    Args:
+        seeds: 并发处理的种子数量
+        ideas_per_seed: 每个种子扩展出的关键词数量
+        vocabulary: 关键词总数，越小重叠越多
+        batch_size: 每次请求的关键词数量
+        latency: 每次请求的耗时（秒）
+    """
+    import random
+    import time
+    from concurrent.futures import ThreadPoolExecutor
+
+    rng = random.Random(0)
+    seed_keywords = [rng.sample(range(vocabulary), ideas_per_seed) for _ in range(seeds)]
+    calls = []
+    calls_lock = threading.Lock()
+
+    def fetch(keywords: List[int]) -> Dict[int, int]:
+        with calls_lock:
+            calls.append(len(keywords))
+        time.sleep(latency)
+        return {keyword: keyword * 10 for keyword in keywords}
+
+    def process(keywords: List[int], flight) -> Dict[int, int]:
+        results = {}
+        for i in range(0, len(keywords), batch_size):
+            chunk = keywords[i:i + batch_size]
+            if flight is None:
+                results.update(fetch(chunk))
+                continue
+            owned, waiting = flight.claim(chunk)
+            fetched = fetch(owned) if owned else {}
+            flight.resolve(owned, fetched)
+            results.update(fetched)
+            results.update((key, future.result()) for key, future in waiting.items())
+        return results
+
+    print(f"{seeds} 个种子并发，每个 {ideas_per_seed} 个关键词（共 {vocabulary} 个不同关键词），每次请求 {latency * 1000:.0f} ms")
+    for name, flight in (("不合并", None), ("single-flight", SingleFlight())):
+        calls.clear()
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=seeds) as executor:
+            results = list(executor.map(lambda keywords: process(keywords, flight), seed_keywords))
+        elapsed = time.perf_counter() - start
+        assert all(result == {keyword: keyword * 10 for keyword in keywords}
+                   for result, keywords in zip(results, seed_keywords))
+        print(f"  {name}: 请求 {len(calls)} 次，共 {sum(calls):,} 个关键词，耗时 {elapsed * 1000:.0f} ms")
+        if flight is not None:
+            stats = flight.stats()
+            print(f"    合并 {stats['coalesced']:,} / {stats['requested']:,} 个关键词（{stats['coalesce_rate']:.1%}）")
+
+
+if __name__ == "__main__":
+    import sys
+
+    run_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 16)
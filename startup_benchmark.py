@@ -0,0 +1,200 @@
+"""
+桌面工具的冷启动基准
+
+测量两项指标：
+
+    - 导入耗时：在子进程中以 -X importtime 导入 main，统计总耗时和最慢的模块，
+      并检查 DEFERRED_MODULES 中的重量级模块没有在启动时被导入
+    - 首帧时间：在子进程中创建主窗口，记录从进程启动到窗口首次绘制（<Expose>）的时间，
+      需要图形界面，无法创建窗口时跳过
+
+每次测量都在新进程中进行，结果包含解释器本身的启动时间。任一检查失败时以非零状态退出，
+可作为启动性能的回归检查：
+
+    python startup_benchmark.py [--runs 5] [--max-import-ms 250] [--max-paint-ms 1500]
+
+预算默认为 DEFAULT_MAX_IMPORT_MS 和 DEFAULT_MAX_PAINT_MS，传入0表示不检查该项。
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional, Tuple
+
+# 启动时不应导入的重量级模块，只在首次使用时或由后台预加载导入
+DEFERRED_MODULES = ('matplotlib', 'google.ads.googleads', 'requests', 'bs4', 'numpy')
+# 导入main的默认耗时上限（毫秒），约为当前耗时的两倍
+DEFAULT_MAX_IMPORT_MS = 250
+# 首帧时间的默认上限（毫秒），包含解释器启动
+DEFAULT_MAX_PAINT_MS = 1500
+# 首帧时间测量的超时（秒）
+PAINT_TIMEOUT = 30
+
+# 在子进程中创建主窗口，首次绘制时输出耗时；配置缺失时弹出的对话框不影响测量
+_PAINT_PROBE = """
+import time
+start = time.perf_counter()
+import tkinter as tk
+try:
+    root = tk.Tk()
+except tk.TclError as e:
+    print('SKIP', e, flush=True)
+    raise SystemExit(0)
+import main
+painted = []
+def on_expose(event):
+    if not painted:
+        painted.append(True)
+        print('PAINT', time.perf_counter() - start, flush=True)
+root.bind('<Expose>', on_expose)
+app = main.GoogleAdsKeywordTool(root)
+root.mainloop()
+"""
+
+_MODULES_PROBE = """
+import json, sys
+import main
+print(json.dumps(sorted(m for m in {modules!r} if m in sys.modules)))
+"""
+
+
+def _run_python(args: List[str], timeout: float = 60) -> subprocess.CompletedProcess:
+    return subprocess.run([sys.executable, *args], cwd=os.path.dirname(os.path.abspath(__file__)),
+                          capture_output=True, text=True, timeout=timeout)
+
+
+def parse_importtime(stderr: str) -> Dict[str, Tuple[int, int]]:
+    """
+    解析 -X importtime 的输出
+
+    Args:
+        stderr: 子进程的标准错误输出
+
+    Returns:
+        Dict[str, Tuple[int, int]]: 模块名到 (自身耗时, 累计耗时) 的映射，单位为微秒
+    """
+    timings = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        parts = line[len('import time:'):].split('|')
+        if len(parts) != 3 or not parts[0].strip().isdigit():
+            continue  # 表头
+        timings[parts[2].strip()] = (int(parts[0]), int(parts[1]))
+    return timings
+
+
+def measure_import_time(module: str = 'main') -> Dict[str, Tuple[int, int]]:
+    """
+    在新进程中导入模块并返回各模块的导入耗时
+
+    Args:
+        module: 要导入的模块
+
+    Returns:
+        Dict[str, Tuple[int, int]]: 模块名到 (自身耗时, 累计耗时) 的映射，单位为微秒
+
+    Raises:
+        RuntimeError: 导入失败
+    """
+    result = _run_python(['-X', 'importtime', '-c', f'import {module}'])
+    if result.returncode != 0:
+        raise RuntimeError(f"导入 {module} 失败:\n{result.stderr[-2000:]}")
+    return parse_importtime(result.stderr)
+
+
+def loaded_deferred_modules() -> List[str]:
+    """导入main后已被加载的重量级模块，正常情况下应为空"""
+    result = _run_python(['-c', _MODULES_PROBE.format(modules=DEFERRED_MODULES)])
+    if result.returncode != 0:
+        raise RuntimeError(f"导入 main 失败:\n{result.stderr[-2000:]}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def measure_first_paint() -> Optional[float]:
+    """
+    在新进程中创建主窗口，测量从进程启动到首次绘制的时间
+
+    Returns:
+        Optional[float]: 耗时（秒），无法创建窗口时返回None
+
+    Raises:
+        RuntimeError: 子进程在绘制前退出或超时
+    """
+    start = time.perf_counter()
+    process = subprocess.Popen([sys.executable, '-c', _PAINT_PROBE], cwd=os.path.dirname(os.path.abspath(__file__)),
+                               stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    try:
+        line = process.stdout.readline()
+        elapsed = time.perf_counter() - start
+        if line.startswith('SKIP'):
+            return None
+        if not line.startswith('PAINT'):
+            process.kill()
+            raise RuntimeError(f"窗口未能显示:\n{process.communicate(timeout=PAINT_TIMEOUT)[1][-2000:]}")
+        return elapsed
+    finally:
+        if process.poll() is None:
+            process.kill()
+        process.wait(timeout=PAINT_TIMEOUT)
+
+
+def run_benchmark(runs: int = 5, max_import_ms: Optional[float] = DEFAULT_MAX_IMPORT_MS,
+                  max_paint_ms: Optional[float] = DEFAULT_MAX_PAINT_MS) -> bool:
+    """
+    测量冷启动耗时并检查是否超出预算
+
+    Args:
+        runs: 每项指标的测量次数，取中位数
+        max_import_ms: 导入main的耗时上限（毫秒），None或0表示不检查
+        max_paint_ms: 首帧时间上限（毫秒），None或0表示不检查
+
+    Returns:
+        bool: 全部检查是否通过
+    """
+    passed = True
+
+    loaded = loaded_deferred_modules()
+    if loaded:
+        print(f"失败: 导入 main 时加载了应延迟导入的模块: {', '.join(loaded)}")
+        passed = False
+    else:
+        print(f"启动时未导入: {', '.join(DEFERRED_MODULES)}")
+
+    samples = [measure_import_time() for _ in range(runs)]
+    import_ms = statistics.median(timings['main'][1] for timings in samples) / 1000
+    print(f"导入 main: {import_ms:8.1f} ms（{runs} 次中位数）")
+    slowest = sorted(samples[-1].items(), key=lambda item: item[1][1], reverse=True)
+    for name, (_, cumulative) in [item for item in slowest if item[0] != 'main'][:5]:
+        print(f"  {name:<40} {cumulative / 1000:8.1f} ms")
+    if max_import_ms and import_ms > max_import_ms:
+        print(f"失败: 导入耗时超过预算 {max_import_ms:.0f} ms")
+        passed = False
+
+    first = measure_first_paint()
+    if first is None:
+        print("首帧时间: 跳过（无法创建窗口）")
+    else:
+        paint_samples = [first] + [measure_first_paint() for _ in range(runs - 1)]
+        paint_ms = statistics.median(paint_samples) * 1000
+        print(f"首帧时间: {paint_ms:8.1f} ms（{runs} 次中位数，含解释器启动）")
+        if max_paint_ms and paint_ms > max_paint_ms:
+            print(f"失败: 首帧时间超过预算 {max_paint_ms:.0f} ms")
+            passed = False
+
+    return passed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="测量桌面工具的冷启动耗时")
+    parser.add_argument('--runs', type=int, default=5, help="每项指标的测量次数")
+    parser.add_argument('--max-import-ms', type=float, default=DEFAULT_MAX_IMPORT_MS,
+                        help="导入main的耗时上限（毫秒），0表示不检查")
+    parser.add_argument('--max-paint-ms', type=float, default=DEFAULT_MAX_PAINT_MS,
+                        help="首帧时间上限（毫秒），0表示不检查")
+    args = parser.parse_args()
+
+    sys.exit(0 if run_benchmark(max(1, args.runs), args.max_import_ms, args.max_paint_ms) else 1)
@@ -0,0 +1,464 @@
+"""
+增量更新的月度趋势图
+
+TrendChart 保留一条折线，切换关键词时只通过 set_data 替换数据：
+
+    - 月份和纵轴范围不变时，恢复缓存的背景后只重绘折线并blit，不重新绘制坐标轴和刻度
+    - 纵轴上限取整到 1/2/5×10^k，量级相近的关键词共用同一个背景
+    - tight_layout 只在首次绘制和画布尺寸变化时计算
+
+ComparisonChart 在同一坐标系中叠加多个关键词的趋势，可在搜索量和归一化指数
+（100表示该关键词的月均搜索量）之间切换。各关键词的序列由 TrendSeriesStore
+在结果到达时按批预先计算，加入一条折线只需追加一个artist，不会重建整个图表。
+
+运行本模块会使用Agg后端（无需图形界面）对比整图重绘与增量更新的耗时：
+
+    python trend_chart.py [更新次数]
+"""
+import math
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+from keyword_analytics import seasonality_index, volumes_matrix
+from keyword_ideas_service import KeywordIdeaBatch
+from keyword_index import normalize_keyword
+
+# 对比图的显示模式
+COMPARE_MODE_VOLUME = 'volume'
+COMPARE_MODE_INDEX = 'index'
+
+
+def nice_upper_limit(value: float) -> float:
+    """
+    将纵轴上限取整到 1/2/5×10^k，并预留少量空间避免标记被裁剪
+
+    Args:
+        value: 数据最大值
+
+    Returns:
+        float: 纵轴上限
+    """
+    if not value or value <= 0 or not math.isfinite(value):
+        return 1.0
+    value *= 1.05
+    magnitude = 10 ** math.floor(math.log10(value))
+    for step in (1, 2, 5, 10):
+        if value <= step * magnitude:
+            return float(step * magnitude)
+    return float(10 * magnitude)
+
+
+class TrendChart:
+    """只替换折线数据的趋势图"""
+
+    def __init__(self, figure, canvas, xlabel: str = '月份', ylabel: str = '搜索量'):
+        """
+        Args:
+            figure: matplotlib Figure
+            canvas: figure对应的画布（FigureCanvasTkAgg或FigureCanvasAgg）
+            xlabel: 横轴标签
+            ylabel: 纵轴标签
+        """
+        self.figure = figure
+        self.canvas = canvas
+        self.ax = figure.axes[0] if figure.axes else figure.add_subplot(111)
+        self.ax.set_xlabel(xlabel)
+        self.ax.set_ylabel(ylabel)
+        # 旋转x轴标签以防重叠
+        self.ax.tick_params(axis='x', rotation=45)
+        self.ax.set_ylim(0, 1)
+        # 折线不参与整图绘制，由draw_event回调和blit单独绘制
+        self.line, = self.ax.plot([], [], marker='o', animated=True)
+
+        self.months: Optional[list] = None
+        self.full_draws = 0
+        self.blits = 0
+        self._background = None
+        self._needs_layout = True
+
+        canvas.mpl_connect('draw_event', self._on_draw)
+        canvas.mpl_connect('resize_event', self._on_resize)
+
+    def update(self, months: Sequence[str], volumes: Sequence[float]) -> None:
+        """
+        显示一个关键词的趋势
+
+        Args:
+            months: 按时间正序的月份
+            volumes: 对应的搜索量，缺失值为NaN
+        """
+        months = list(months)
+        volumes = np.asarray(volumes, dtype=np.float64)
+        self.line.set_data(np.arange(len(months)), volumes)
+
+        needs_full_draw = self._background is None
+        if months != self.months:
+            self.months = months
+            self.ax.set_xticks(range(len(months)))
+            self.ax.set_xticklabels(months)
+            self.ax.set_xlim(-0.5, max(len(months) - 0.5, 0.5))
+            needs_full_draw = True
+
+        finite = volumes[np.isfinite(volumes)]
+        top = nice_upper_limit(float(finite.max()) if finite.size else 0.0)
+        if self.ax.get_ylim() != (0.0, top):
+            self.ax.set_ylim(0, top)
+            needs_full_draw = True
+
+        if needs_full_draw:
+            self.redraw()
+        else:
+            self._blit()
+
+    def redraw(self) -> None:
+        """整图重绘，必要时重新计算布局，绘制完成后由draw_event回调缓存背景"""
+        if self._needs_layout:
+            self.figure.tight_layout()
+            self._needs_layout = False
+        self.full_draws += 1
+        self.canvas.draw()
+
+    def _blit(self) -> None:
+        """恢复缓存的背景，只重绘折线"""
+        self.canvas.restore_region(self._background)
+        self.ax.draw_artist(self.line)
+        self.canvas.blit(self.figure.bbox)
+        self.blits += 1
+
+    def _on_draw(self, event) -> None:
+        # 任何整图绘制（包括窗口暴露和尺寸变化）之后都重新缓存不含折线的背景
+        self._background = self.canvas.copy_from_bbox(self.figure.bbox)
+        self.ax.draw_artist(self.line)
+
+    def _on_resize(self, event) -> None:
+        # 布局只在尺寸变化时重新计算，画布随后会整图重绘
+        self._needs_layout = True
+        self._background = None
+        self.figure.tight_layout()
+        self._needs_layout = False
+
+
+class TrendSeries:
+    """一个关键词预先计算好的趋势序列"""
+
+    __slots__ = ('keyword', 'months', 'volumes', 'index')
+
+    def __init__(self, keyword: str, months: List[str], volumes: np.ndarray, index: np.ndarray):
+        self.keyword = keyword
+        self.months = months
+        self.volumes = volumes
+        self.index = index
+
+
+class TrendSeriesStore:
+    """按关键词保存预先计算的趋势序列，结果按批到达时一次性计算整批的搜索量矩阵和指数"""
+
+    def __init__(self):
+        self._series: Dict[str, TrendSeries] = {}
+
+    def __len__(self) -> int:
+        return len(self._series)
+
+    def add_batch(self, ideas: Iterable) -> None:
+        """
+        为一批关键词创意计算趋势序列
+
+        Args:
+            ideas: 关键词创意，KeywordIdeaBatch直接使用附带的搜索量矩阵
+        """
+        if isinstance(ideas, KeywordIdeaBatch):
+            months, matrix = ideas.matrix
+        else:
+            ideas = list(ideas)
+            months, matrix = volumes_matrix(idea.monthly_searches for idea in ideas)
+        if not ideas:
+            return
+        index = seasonality_index(matrix) * 100
+        present = ~np.isnan(matrix)
+        for row, idea in enumerate(ideas):
+            mask = present[row]
+            self._series[normalize_keyword(idea.text)] = TrendSeries(
+                idea.text, [month for month, keep in zip(months, mask) if keep], matrix[row, mask], index[row, mask]
+            )
+
+    def get(self, keyword: str) -> Optional[TrendSeries]:
+        """关键词的趋势序列，不存在时返回None"""
+        return self._series.get(normalize_keyword(keyword))
+
+    def clear(self) -> None:
+        self._series = {}
+
+
+class ComparisonChart:
+    """叠加多个关键词趋势的对比图
+
+    折线都是animated artist。缓存的背景包含当前全部折线，加入折线时若坐标轴不变，
+    只需恢复背景、绘制新折线并blit，开销与已有折线数量无关。关键词较多时图内图例的布局开销很大，
+    因此不绘制图例，由调用方通过 color_of 获取颜色后在界面中列出关键词。
+    """
+
+    def __init__(self, figure, canvas, xlabel: str = '月份'):
+        """
+        Args:
+            figure: matplotlib Figure
+            canvas: figure对应的画布
+            xlabel: 横轴标签
+        """
+        import matplotlib
+
+        self.figure = figure
+        self.canvas = canvas
+        self.ax = figure.axes[0] if figure.axes else figure.add_subplot(111)
+        self.ax.set_xlabel(xlabel)
+        self.ax.tick_params(axis='x', rotation=45)
+        self.ax.set_ylim(0, 1)
+        self.colors = matplotlib.colormaps['tab20'].colors
+        self.mode = COMPARE_MODE_VOLUME
+        self.months: List[str] = []
+        self.series: Dict[str, TrendSeries] = {}
+        self.lines: Dict[str, object] = {}
+        self.full_draws = 0
+        self.blits = 0
+        self._background = None
+        self._needs_layout = True
+        self._update_ylabel()
+
+        canvas.mpl_connect('draw_event', self._on_draw)
+        canvas.mpl_connect('resize_event', self._on_resize)
+
+    def __len__(self) -> int:
+        return len(self.series)
+
+    def __contains__(self, keyword: str) -> bool:
+        return normalize_keyword(keyword) in self.series
+
+    def add(self, series: TrendSeries) -> None:
+        """加入一个关键词的趋势"""
+        self.add_many([series])
+
+    def add_many(self, series_list: Iterable[TrendSeries]) -> None:
+        """
+        批量加入关键词趋势，全部加入后只绘制一次
+
+        Args:
+            series_list: 预先计算好的趋势序列，已在图中的关键词会被跳过
+        """
+        added = []
+        for series in series_list:
+            key = normalize_keyword(series.keyword)
+            if key in self.series:
+                continue
+            self.series[key] = series
+            added.append(key)
+        if not added:
+            return
+
+        needs_full_draw = self._merge_months(self.series[key] for key in added)
+        for key in added:
+            series = self.series[key]
+            color = self.colors[(len(self.lines)) % len(self.colors)]
+            linestyle = '-' if len(self.lines) < len(self.colors) else '--'
+            line, = self.ax.plot(self._positions(series), self._values(series), marker='o', markersize=3,
+                                 color=color, linestyle=linestyle, label=series.keyword, animated=True)
+            self.lines[key] = line
+        needs_full_draw = self._update_ylim() or needs_full_draw
+        if needs_full_draw or self._background is None:
+            self.redraw()
+            return
+
+        # 背景中已有之前的折线，只绘制新加入的折线
+        self.canvas.restore_region(self._background)
+        for key in added:
+            self.ax.draw_artist(self.lines[key])
+        self.canvas.blit(self.figure.bbox)
+        self._background = self.canvas.copy_from_bbox(self.figure.bbox)
+        self.blits += 1
+
+    def color_of(self, keyword: str):
+        """关键词折线的颜色（matplotlib颜色），不在图中时返回None"""
+        line = self.lines.get(normalize_keyword(keyword))
+        return line.get_color() if line is not None else None
+
+    def remove(self, keyword: str) -> None:
+        """移除一个关键词的趋势"""
+        self.remove_many([keyword])
+
+    def remove_many(self, keywords: Iterable[str]) -> None:
+        """
+        批量移除关键词趋势，全部移除后整图重绘一次
+
+        Args:
+            keywords: 关键词，不在图中的关键词会被跳过
+        """
+        removed = False
+        for keyword in keywords:
+            key = normalize_keyword(keyword)
+            if key not in self.series:
+                continue
+            del self.series[key]
+            self.lines.pop(key).remove()
+            removed = True
+        if removed:
+            self._update_ylim()
+            self.redraw()
+
+    def clear(self) -> None:
+        """移除全部趋势"""
+        for line in self.lines.values():
+            line.remove()
+        self.series = {}
+        self.lines = {}
+        self._update_ylim()
+        self.redraw()
+
+    def set_mode(self, mode: str) -> None:
+        """
+        切换显示模式，只替换各折线的纵坐标数据
+
+        Args:
+            mode: COMPARE_MODE_VOLUME（搜索量）或 COMPARE_MODE_INDEX（归一化指数，100为月均）
+        """
+        if mode not in (COMPARE_MODE_VOLUME, COMPARE_MODE_INDEX):
+            raise ValueError(f"未知的显示模式: {mode}")
+        if mode == self.mode:
+            return
+        self.mode = mode
+        for key, line in self.lines.items():
+            line.set_ydata(self._values(self.series[key]))
+        self._update_ylabel()
+        self._update_ylim(force=True)
+        self.redraw()
+
+    def redraw(self) -> None:
+        """整图重绘，必要时重新计算布局，绘制完成后由draw_event回调缓存背景"""
+        if self._needs_layout:
+            self.figure.tight_layout()
+            self._needs_layout = False
+        self.full_draws += 1
+        self.canvas.draw()
+
+    def _values(self, series: TrendSeries) -> np.ndarray:
+        return series.index if self.mode == COMPARE_MODE_INDEX else series.volumes
+
+    def _positions(self, series: TrendSeries) -> np.ndarray:
+        positions = {month: i for i, month in enumerate(self.months)}
+        return np.fromiter((positions[month] for month in series.months), dtype=np.float64,
+                           count=len(series.months))
+
+    def _merge_months(self, series_list: Iterable[TrendSeries]) -> bool:
+        """合并新序列的月份，出现新月份时重新设置横轴并更新已有折线的横坐标，返回是否需要整图重绘"""
+        new_months = {month for series in series_list for month in series.months}
+        if new_months.issubset(self.months):
+            return False
+        self.months = sorted(new_months.union(self.months))
+        self.ax.set_xticks(range(len(self.months)))
+        self.ax.set_xticklabels(self.months)
+        self.ax.set_xlim(-0.5, max(len(self.months) - 0.5, 0.5))
+        for key, line in self.lines.items():
+            line.set_xdata(self._positions(self.series[key]))
+        return True
+
+    def _update_ylim(self, force: bool = False) -> bool:
+        """按当前模式的最大值调整纵轴上限，返回是否发生变化"""
+        maximum = 0.0
+        for series in self.series.values():
+            values = self._values(series)
+            finite = values[np.isfinite(values)]
+            if finite.size:
+                maximum = max(maximum, float(finite.max()))
+        top = nice_upper_limit(maximum)
+        if not force and self.ax.get_ylim() == (0.0, top):
+            return False
+        self.ax.set_ylim(0, top)
+        return True
+
+    def _update_ylabel(self) -> None:
+        self.ax.set_ylabel('指数（月均=100）' if self.mode == COMPARE_MODE_INDEX else '搜索量')
+
+    def _on_draw(self, event) -> None:
+        # 整图绘制后补画全部折线，再缓存包含折线的背景
+        for line in self.lines.values():
+            self.ax.draw_artist(line)
+        self._background = self.canvas.copy_from_bbox(self.figure.bbox)
+
+    def _on_resize(self, event) -> None:
+        self._background = None
+        self.figure.tight_layout()
+        self._needs_layout = False
+
+
+def run_benchmark(updates: int = 200, months: int = 12) -> None:
+    """
+    使用Agg后端对比每次整图重绘与增量更新的耗时
+
+    Args:
+        updates: 切换关键词的次数
+        months: 月份数量
+    """
+    import time
+
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    rng = np.random.default_rng(0)
+    month_labels = [f"{2024 + (i // 12)}-{(i % 12) + 1:02d}" for i in range(months)]
+    # 搜索量量级相近的关键词，模拟在结果表格中逐行浏览
+    series = rng.integers(1_000, 9_000, size=(updates, months)).astype(np.float64)
+
+    figure = Figure(figsize=(6, 3), dpi=100)
+    canvas = FigureCanvasAgg(figure)
+    ax = figure.add_subplot(111)
+    start = time.perf_counter()
+    for volumes in series:
+        ax.clear()
+        ax.plot(month_labels, volumes, marker='o')
+        ax.set_xlabel('月份')
+        ax.set_ylabel('搜索量')
+        ax.tick_params(axis='x', rotation=45)
+        figure.tight_layout()
+        canvas.draw()
+    full_time = (time.perf_counter() - start) / updates
+
+    figure = Figure(figsize=(6, 3), dpi=100)
+    canvas = FigureCanvasAgg(figure)
+    chart = TrendChart(figure, canvas)
+    start = time.perf_counter()
+    for volumes in series:
+        chart.update(month_labels, volumes)
+    incremental_time = (time.perf_counter() - start) / updates
+
+    print(f"切换 {updates} 次关键词，每个 {months} 个月")
+    print(f"  整图重绘: 每次 {full_time * 1000:7.2f} ms")
+    print(f"  增量更新: 每次 {incremental_time * 1000:7.2f} ms  "
+          f"({full_time / incremental_time:.1f}x，整图重绘 {chart.full_draws} 次，blit {chart.blits} 次)")
+
+    # 对比图：逐个加入30个关键词，再切换到指数视图
+    from keyword_table import build_synthetic_ideas
+
+    store = TrendSeriesStore()
+    ideas = build_synthetic_ideas(30, months)
+    store.add_batch(ideas)
+    figure = Figure(figsize=(6, 3), dpi=100)
+    canvas = FigureCanvasAgg(figure)
+    comparison = ComparisonChart(figure, canvas)
+    add_times = []
+    for idea in ideas:
+        start = time.perf_counter()
+        comparison.add(store.get(idea.text))
+        add_times.append(time.perf_counter() - start)
+    start = time.perf_counter()
+    comparison.set_mode(COMPARE_MODE_INDEX)
+    mode_time = time.perf_counter() - start
+
+    print(f"对比图逐个加入 {len(ideas)} 个关键词")
+    print(f"  第1个: {add_times[0] * 1000:7.2f} ms，第{len(ideas)}个: {add_times[-1] * 1000:7.2f} ms，"
+          f"平均 {sum(add_times) / len(add_times) * 1000:7.2f} ms（整图重绘 {comparison.full_draws} 次，"
+          f"blit {comparison.blits} 次）")
+    print(f"  切换到指数视图: {mode_time * 1000:7.2f} ms")
+
+
+if __name__ == "__main__":
+    import sys
+
+    run_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 200)
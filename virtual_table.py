@@ -0,0 +1,408 @@
+"""
+虚拟化的结果表格
+
+VirtualTreeview 只为可见窗口内的行创建Treeview项目，滚动时复用这些项目并改写其内容，
+因此插入和滚动的开销只取决于窗口高度，与结果总数无关。表格数据保存在调用方提供的序列中，
+通过 formatter 将一行数据转换为各列的显示值。
+
+行有三种标识：
+    行下标      数据在 rows 序列中的下标
+    显示位置    行在当前显示顺序（order）中的位置
+    项目ID      Treeview中可见项目的ID，滚动后会指向其他行
+
+运行本模块可对比普通Treeview与虚拟表格在大数据量下的耗时（需要图形界面）：
+
+    python virtual_table.py [行数]
+"""
+import tkinter as tk
+from tkinter import ttk
+from typing import Callable, Dict, List, Optional, Sequence
+
+# 默认行高（像素）
+DEFAULT_ROW_HEIGHT = 30
+# 尚未测量到表头高度时使用的估计值（像素）
+DEFAULT_HEADING_HEIGHT = 25
+# 鼠标滚轮每格滚动的行数
+WHEEL_SCROLL_ROWS = 3
+
+
+class VirtualTreeview(ttk.Frame):
+    """只渲染可见行的Treeview
+
+    选择状态按行下标记录，行滚出窗口后再滚回时仍保持选中。选中的行发生变化时，
+    在本组件上触发 <<RowSelect>> 事件；显示窗口滚动时触发 <<ViewScrolled>> 事件。
+    """
+
+    def __init__(self, master, columns: Sequence[str], formatter: Callable[[object], Sequence],
+                 row_height: int = DEFAULT_ROW_HEIGHT, style: str = 'Custom.Treeview', height: int = 20,
+                 **kwargs):
+        """
+        Args:
+            master: 父组件
+            columns: 列名
+            formatter: 将一行数据转换为各列显示值的函数
+            row_height: 行高（像素）
+            style: Treeview样式名，行高会写入该样式
+            height: 初始可见行数，组件实际大小确定后按像素高度重新计算
+        """
+        super().__init__(master, **kwargs)
+        self.formatter = formatter
+        self.row_height = row_height
+        self.rows: Sequence = []
+        self.order: Optional[List[int]] = None
+        self.offset = 0
+        self._row_count = 0
+        self.visible_count = height
+        self._heading_height = DEFAULT_HEADING_HEIGHT
+        self._positions: Optional[Dict[int, int]] = None
+        self._items: List[str] = []
+        self._item_rows: Dict[str, int] = {}
+        self._selected_rows = set()
+        self._cursor: Optional[int] = None
+
+        ttk.Style().configure(style, rowheight=row_height)
+        self.tree = ttk.Treeview(self, columns=columns, show='headings', height=height, style=style)
+
+        # 垂直滚动条由本组件驱动，表示的是全部行而不是Treeview中的项目
+        self.vsb = ttk.Scrollbar(self, orient=tk.VERTICAL, command=self.yview)
+        self.hsb = ttk.Scrollbar(self, orient=tk.HORIZONTAL, command=self.tree.xview)
+        self.tree.configure(xscrollcommand=self.hsb.set)
+
+        self.grid_rowconfigure(0, weight=1)
+        self.grid_columnconfigure(0, weight=1)
+        self.tree.grid(row=0, column=0, sticky='nsew')
+        self.vsb.grid(row=0, column=1, sticky='ns')
+        self.hsb.grid(row=1, column=0, sticky='ew')
+
+        self.tree.bind('<Configure>', self._on_configure)
+        self.tree.bind('<<TreeviewSelect>>', self._on_tree_select)
+        self.tree.bind('<MouseWheel>', self._on_mouse_wheel)
+        self.tree.bind('<Button-4>', lambda event: self._scroll_by(-WHEEL_SCROLL_ROWS))
+        self.tree.bind('<Button-5>', lambda event: self._scroll_by(WHEEL_SCROLL_ROWS))
+        self.tree.bind('<Up>', lambda event: self._move_cursor(-1))
+        self.tree.bind('<Down>', lambda event: self._move_cursor(1))
+        self.tree.bind('<Prior>', lambda event: self._move_cursor(-self.visible_count))
+        self.tree.bind('<Next>', lambda event: self._move_cursor(self.visible_count))
+        self.tree.bind('<Home>', lambda event: self._move_cursor(-len(self)))
+        self.tree.bind('<End>', lambda event: self._move_cursor(len(self)))
+
+    def __len__(self) -> int:
+        """当前显示的行数"""
+        return len(self.order) if self.order is not None else len(self.rows)
+
+    def set_rows(self, rows: Sequence, order: Optional[Sequence[int]] = None) -> None:
+        """
+        替换表格数据，清空选择并回到顶部
+
+        Args:
+            rows: 行数据序列，组件只保存引用，追加数据后调用rows_changed即可
+            order: 显示顺序（行下标序列），为None时按rows的顺序显示
+        """
+        self.rows = rows
+        self._row_count = len(rows)
+        self.order = list(order) if order is not None else None
+        self._positions = None
+        self._selected_rows = set()
+        self._cursor = None
+        self.offset = 0
+        self.refresh()
+
+    def rows_changed(self, new_rows: Optional[Sequence[int]] = None) -> None:
+        """
+        rows序列追加了数据时调用，新行排在当前显示顺序的末尾
+
+        Args:
+            new_rows: 要显示的新行下标（用于筛选），为None时显示全部新行
+        """
+        if self.order is not None and self._row_count < len(self.rows):
+            self.order.extend(range(self._row_count, len(self.rows)) if new_rows is None else new_rows)
+            self._positions = None
+        self._row_count = len(self.rows)
+        self.refresh()
+
+    def set_order(self, order: Optional[Sequence[int]], keep_position: bool = False) -> None:
+        """
+        设置显示顺序（用于排序和筛选），保持选择不变并回到顶部
+
+        Args:
+            order: 行下标序列，可以只包含部分行；为None时按rows的顺序显示全部行。
+                   顺序按当前的全部行计算，之后追加的行才由rows_changed处理
+            keep_position: 为True时保持滚动位置（用于追加数据后重新排序），否则回到顶部
+        """
+        self.order = list(order) if order is not None else None
+        self._row_count = len(self.rows)
+        self._positions = None
+        self._cursor = None
+        if not keep_position:
+            self.offset = 0
+        self.refresh()
+
+    def row_index_at(self, position: int) -> int:
+        """显示位置对应的行下标"""
+        return self.order[position] if self.order is not None else position
+
+    def position_of(self, row_index: int) -> Optional[int]:
+        """
+        行下标对应的显示位置
+
+        Returns:
+            Optional[int]: 显示位置，该行不在当前显示顺序中时返回None
+        """
+        if self.order is None:
+            return row_index if 0 <= row_index < len(self.rows) else None
+        if self._positions is None:
+            self._positions = {row: position for position, row in enumerate(self.order)}
+        return self._positions.get(row_index)
+
+    def row_index_for_item(self, item_id: str) -> Optional[int]:
+        """可见项目当前对应的行下标，项目不存在时返回None"""
+        return self._item_rows.get(item_id)
+
+    def row_for_item(self, item_id: str):
+        """可见项目当前对应的行数据，项目不存在时返回None"""
+        row_index = self._item_rows.get(item_id)
+        return self.rows[row_index] if row_index is not None else None
+
+    def item_for_row(self, row_index: int) -> Optional[str]:
+        """行当前对应的可见项目ID，该行不在可见窗口内时返回None"""
+        position = self.position_of(row_index)
+        if position is None or not self.offset <= position < self.offset + len(self._items):
+            return None
+        return self._items[position - self.offset]
+
+    def selected_rows(self) -> list:
+        """选中的行数据，按显示顺序排列"""
+        self._sync_selection()
+        rows = [row_index for row_index in self._selected_rows if self.position_of(row_index) is not None]
+        rows.sort(key=self.position_of)
+        return [self.rows[row_index] for row_index in rows]
+
+    def select_row(self, row_index: int) -> None:
+        """选中一行（取消其他选择）并滚动到该行"""
+        position = self.position_of(row_index)
+        if position is None:
+            return
+        self._sync_selection()
+        self._selected_rows = {row_index}
+        self._cursor = position
+        self._apply_selection()
+        self.see(position)
+        self.refresh()
+        self.event_generate('<<RowSelect>>')
+
+    def see(self, position: int) -> None:
+        """滚动使某个显示位置可见"""
+        if position < self.offset:
+            self.scroll_to(position)
+        elif position >= self.offset + self.visible_count:
+            self.scroll_to(position - self.visible_count + 1)
+
+    def yview(self, *args):
+        """垂直滚动条的回调，参数格式与Treeview.yview相同"""
+        total = len(self)
+        if not args:
+            return self._view_fractions()
+        if args[0] == 'moveto':
+            self.scroll_to(int(float(args[1]) * total))
+        elif args[0] == 'scroll':
+            step = self.visible_count if args[2] == 'pages' else 1
+            self._scroll_by(int(args[1]) * step)
+
+    def scroll_to(self, position: int) -> None:
+        """
+        将显示窗口的第一行移动到指定的显示位置
+
+        Args:
+            position: 显示位置，超出范围时自动截断
+        """
+        position = max(0, min(position, len(self) - self.visible_count))
+        if position == self.offset:
+            return
+        # 先记录当前窗口中用户的选择，再改写项目内容
+        self._sync_selection()
+        self.offset = position
+        self.refresh()
+        self.event_generate('<<ViewScrolled>>')
+
+    def refresh(self) -> None:
+        """按当前数据、顺序和窗口位置重新渲染可见的项目"""
+        self._sync_selection()
+        total = len(self)
+        self.offset = max(0, min(self.offset, total - self.visible_count))
+        count = max(0, min(self.visible_count, total - self.offset))
+
+        # 项目数量只随窗口高度变化，滚动时复用已有项目
+        while len(self._items) < count:
+            self._items.append(self.tree.insert('', tk.END))
+        if len(self._items) > count:
+            self.tree.delete(*self._items[count:])
+            del self._items[count:]
+
+        self._item_rows = {}
+        for i, item_id in enumerate(self._items):
+            row_index = self.row_index_at(self.offset + i)
+            self._item_rows[item_id] = row_index
+            self.tree.item(item_id, values=self.formatter(self.rows[row_index]))
+
+        self._apply_selection()
+        if self._cursor is not None and self.offset <= self._cursor < self.offset + count:
+            self.tree.focus(self._items[self._cursor - self.offset])
+        # 项目数量不超过窗口高度，Treeview自身不应发生滚动
+        self.tree.yview_moveto(0)
+        self.vsb.set(*self._view_fractions())
+        self._measure_heading()
+
+    def refresh_row(self, row_index: int) -> None:
+        """某一行的数据发生变化时调用，该行在可见窗口内时只重新渲染这一行"""
+        item_id = self.item_for_row(row_index)
+        if item_id is not None:
+            self.tree.item(item_id, values=self.formatter(self.rows[row_index]))
+
+    def clear(self) -> None:
+        """清空表格"""
+        self.set_rows([])
+
+    def _view_fractions(self):
+        """可见窗口在全部行中的位置（0到1之间的起止比例）"""
+        total = len(self)
+        if total == 0:
+            return 0.0, 1.0
+        return self.offset / total, min(1.0, (self.offset + self.visible_count) / total)
+
+    def _apply_selection(self) -> None:
+        """将按行下标记录的选择应用到可见窗口中的项目"""
+        self.tree.selection_set([item_id for item_id, row_index in self._item_rows.items()
+                                 if row_index in self._selected_rows])
+
+    def _sync_selection(self) -> None:
+        """将可见窗口中的Treeview选择同步到按行下标记录的选择，发生变化时触发<<RowSelect>>"""
+        if not self._item_rows:
+            return
+        selected = {self._item_rows[item_id] for item_id in self.tree.selection() if item_id in self._item_rows}
+        visible = set(self._item_rows.values())
+        new_selection = (self._selected_rows - visible) | selected
+        if new_selection != self._selected_rows:
+            self._selected_rows = new_selection
+            focus = self.tree.focus()
+            if focus in self._item_rows:
+                self._cursor = self.position_of(self._item_rows[focus])
+            self.event_generate('<<RowSelect>>')
+
+    def _measure_heading(self) -> None:
+        """根据第一个项目的位置测量表头高度，高度变化时重新计算可见行数"""
+        if not self._items:
+            return
+        bbox = self.tree.bbox(self._items[0])
+        if bbox and bbox[1] != self._heading_height:
+            self._heading_height = bbox[1]
+            self._resize(self.tree.winfo_height())
+
+    def _resize(self, height: int) -> None:
+        """根据Treeview的像素高度重新计算可见行数"""
+        if height <= 1:
+            return
+        visible_count = max(1, (height - self._heading_height) // self.row_height)
+        if visible_count != self.visible_count:
+            self.visible_count = visible_count
+            self.refresh()
+
+    def _on_configure(self, event) -> None:
+        self._resize(event.height)
+
+    def _on_tree_select(self, event) -> None:
+        self._sync_selection()
+
+    def _on_mouse_wheel(self, event):
+        # Windows上每格为120，macOS上为较小的整数
+        delta = event.delta // 120 if abs(event.delta) >= 120 else event.delta
+        self._scroll_by(-delta * WHEEL_SCROLL_ROWS)
+        return "break"
+
+    def _scroll_by(self, rows: int):
+        self.scroll_to(self.offset + rows)
+        return "break"
+
+    def _move_cursor(self, delta: int):
+        """键盘移动选中行，必要时滚动窗口"""
+        total = len(self)
+        if total == 0:
+            return "break"
+        if self._cursor is None:
+            position = self.offset
+        else:
+            position = max(0, min(self._cursor + delta, total - 1))
+        self.select_row(self.row_index_at(position))
+        return "break"
+
+
+def run_benchmark(count: int = 50_000, scroll_steps: int = 200) -> None:
+    """
+    对比普通Treeview逐行插入与虚拟表格的插入和滚动耗时
+
+    Args:
+        count: 行数
+        scroll_steps: 随机滚动的次数
+    """
+    import random
+    import time
+
+    columns = ('keyword', 'avg_monthly_searches', 'competition', 'competition_index',
+               'recent_growth', 'growth', 'low_cpc', 'high_cpc', 'kgr')
+    rng = random.Random(0)
+    rows = [
+        (f"keyword {i}", rng.randint(0, 100_000), rng.choice(['LOW', 'MEDIUM', 'HIGH']), rng.randint(0, 100),
+         rng.uniform(-50, 50), rng.uniform(-100, 100), rng.random(), rng.random() * 5)
+        for i in range(count)
+    ]
+
+    def formatter(row):
+        return (row[0], f"{row[1]:,}", row[2], row[3], f"{row[4]:.1f}%", f"{row[5]:.1f}%",
+                f"${row[6]:.2f}", f"${row[7]:.2f}", "点击计算")
+
+    positions = [rng.random() for _ in range(scroll_steps)]
+    root = tk.Tk()
+    root.geometry('1200x800')
+
+    try:
+        plain = ttk.Treeview(root, columns=columns, show='headings', height=20)
+        plain.pack(fill=tk.BOTH, expand=True)
+        root.update()
+        start = time.perf_counter()
+        for row in rows:
+            plain.insert('', tk.END, values=formatter(row))
+        root.update_idletasks()
+        plain_insert = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for position in positions:
+            plain.yview_moveto(position)
+            root.update_idletasks()
+        plain_scroll = (time.perf_counter() - start) / scroll_steps
+        plain.destroy()
+
+        view = VirtualTreeview(root, columns, formatter)
+        view.pack(fill=tk.BOTH, expand=True)
+        root.update()
+        start = time.perf_counter()
+        view.set_rows(rows)
+        root.update_idletasks()
+        virtual_insert = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for position in positions:
+            view.yview('moveto', position)
+            root.update_idletasks()
+        virtual_scroll = (time.perf_counter() - start) / scroll_steps
+
+        print(f"{count:,} 行（虚拟表格可见 {view.visible_count} 行）")
+        print(f"  普通Treeview:  插入 {plain_insert * 1000:9.1f} ms  每次滚动 {plain_scroll * 1000:7.2f} ms")
+        print(f"  虚拟表格:      插入 {virtual_insert * 1000:9.1f} ms  每次滚动 {virtual_scroll * 1000:7.2f} ms")
+    finally:
+        root.destroy()
+
+
+if __name__ == "__main__":
+    import sys
+
+    for size in [int(arg) for arg in sys.argv[1:]] or [10_000, 50_000]:
+        run_benchmark(size)